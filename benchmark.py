@@ -0,0 +1,1851 @@
+"""
+Micro-benchmarks for the ScholAI MCP server.
+
+Usage:
+    python benchmark.py            # run every benchmark
+    python benchmark.py ccf        # run a single benchmark
+    python benchmark.py suite --save-baseline base.json   # every tool, offline
+    python benchmark.py suite --baseline base.json --check
+    python benchmark.py --record-fixtures fixtures/ --record-query "graph neural network"
+    python benchmark.py suite --fixtures fixtures/        # replay recorded pages and PDFs
+"""
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import math
+import os
+import pickle
+import platform
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pymupdf as fitz
+import yaml
+
+import main
+
+WORDS = (
+    "learning graph neural network diffusion model language retrieval agent "
+    "transformer reinforcement policy vision robust efficient sparse attention "
+    "quantum optimization federated privacy benchmark dataset scaling reasoning"
+).split()
+VENUES = ["ICML", "NeurIPS", "ICLR", "CVPR", "ACL", "AAAI", "IJCAI", "KDD", "WWW", "EMNLP"]
+
+
+def measure(func, repeat: int = 1000) -> dict:
+    """Run func `repeat` times and return per-call latency statistics in microseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "calls": repeat,
+        "mean_us": round(statistics.fmean(samples), 2),
+        "p50_us": round(samples[len(samples) // 2], 2),
+        "p95_us": round(samples[int(len(samples) * 0.95) - 1], 2),
+    }
+
+
+async def measure_async(func, repeat: int = 20) -> dict:
+    """Async counterpart of measure(), reporting milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - start) * 1e3)
+    samples.sort()
+    return {
+        "calls": repeat,
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[max(int(len(samples) * 0.95) - 1, 0)], 3),
+    }
+
+
+def make_search_page(num_papers: int, venue: bool, seed: int = 0) -> str:
+    """Build a papers.cool-style search result page with `num_papers` entries."""
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(num_papers):
+        paper_id = f"2406.{seed:02d}{i:04d}"
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 10))).title()
+        abstract = " ".join(rng.choice(WORDS) for _ in range(rng.randint(80, 160)))
+        authors = ", ".join(
+            f'<a class="author notranslate" href="#">{rng.choice(WORDS).title()} {chr(65 + j)}.</a>'
+            for j in range(rng.randint(1, 6))
+        )
+        if venue:
+            name = f"{rng.choice(VENUES)}.{rng.randint(2015, 2025)}"
+            pdf = f"/pdf?url=https://openreview.net/pdf?id={paper_id}&amp;t=1"
+            meta = (
+                '<p class="metainfo subjects"><strong>Subject</strong>: '
+                f'<a class="subject-1" href="/venue/{name}">{name}</a> - '
+                '<a class="subject-2" href="#">Poster</a></p>'
+            )
+        else:
+            pdf = f"https://arxiv.org/pdf/{paper_id}"
+            meta = (
+                f'<p class="metainfo date">Publish: 2024-{rng.randint(1, 12):02d}-'
+                f"{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:00:00 UTC</p>"
+            )
+        blocks.append(
+            f"""<div id="{paper_id}" class="panel paper" keywords="{title.lower()}">
+<h2 class="title">
+<a class="title-pdf notranslate" onclick="togglePdf('{paper_id}', '{pdf}', this)">[PDF<sup>{i}</sup>]</a>
+<a id="title-{paper_id}" class="title-link notranslate" href="/arxiv/{paper_id}" target="_blank">{title}</a>
+</h2>
+<p id="authors-{paper_id}" class="metainfo authors notranslate"><strong>Authors</strong>: {authors}</p>
+<p id="summary-{paper_id}" class="summary notranslate">{abstract}</p>
+{meta}
+</div>"""
+        )
+    return (
+        "<!DOCTYPE html><html><head><title>Cool Papers</title></head><body>"
+        '<div class="papers">' + "\n".join(blocks) + "</div></body></html>"
+    )
+
+
+def make_pdf(num_pages: int, chars_per_page: int = 3000, seed: int = 0) -> bytes:
+    """Build an in-memory PDF of `num_pages` text pages."""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_num in range(num_pages):
+        page = doc.new_page()
+        text = " ".join(rng.choice(WORDS) for _ in range(chars_per_page // 8))
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), f"{page_num + 1}. {text}", fontsize=8)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+class StubServer:
+    """
+    Local stand-in for papers.cool, PDF hosts and the LlamaParse API.
+
+    `handshake_ms` delays every new TCP connection to model TCP+TLS setup cost.
+    Each LlamaParse upload stays PENDING for a random duration in `parse_seconds`
+    plus `parse_seconds_per_page` for every page of the uploaded PDF, then ends
+    in SUCCESS, or in ERROR with `parse_error` as the message when it is set.
+    Unknown job ids get a 404, like the real status endpoint.
+    `pages` replaces the synthetic search pages and `pdfs` are served by name at
+    /pdf/fixture/<name>, so recorded fixtures can be replayed.
+    """
+
+    def __init__(
+        self,
+        handshake_ms: float = 0.0,
+        num_papers: int = 1000,
+        pdf_pages: int = 20,
+        parse_seconds: tuple[float, float] = (0.0, 0.0),
+        parse_seconds_per_page: float = 0.0,
+        pages: dict[str, bytes] = None,
+        pdfs: dict[str, bytes] = None,
+        parse_error: str = None,
+    ):
+        self.handshake_ms = handshake_ms
+        self.parse_error = parse_error
+        self.parse_seconds = parse_seconds
+        self.parse_seconds_per_page = parse_seconds_per_page
+        self.jobs = {}
+        self.uploads = []
+        self.rng = random.Random(0)
+        self.pages = pages or {
+            "arxiv": make_search_page(num_papers, venue=False).encode(),
+            "venue": make_search_page(num_papers, venue=True, seed=1).encode(),
+        }
+        self.pdfs = pdfs or {}
+        self.pdf = make_pdf(pdf_pages)
+        self.large_pdf = b""
+        self.hits = {}
+        # 每个带 Range 的 PDF 请求：(路径, Range, If-Range)
+        self.range_requests = []
+        self.connections = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                stub.connections += 1
+                if stub.handshake_ms:
+                    time.sleep(stub.handshake_ms / 1000)
+                super().setup()
+
+            def log_message(self, *args):
+                pass
+
+            def send_body(self, body: bytes, content_type: str, status: int = 200):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_pdf(self, path: str):
+                delay = parse_qs(urlparse(self.path).query).get("delay")
+                if delay:
+                    time.sleep(float(delay[0]))
+                if path.startswith("/pdf/fixture/"):
+                    body = stub.pdfs[path.rsplit("/", 1)[1]]
+                elif path.startswith("/pdf/large"):
+                    body = stub.large_pdf
+                elif path.startswith("/pdf/changing") and stub.hits[path] > 1:
+                    # 第一次请求中断后服务器上的文件被替换
+                    body = stub.pdf[::-1]
+                else:
+                    body = stub.pdf
+                etag = f'"{hashlib.md5(body).hexdigest()}"'
+                start = 0
+                range_header = self.headers.get("Range")
+                if range_header:
+                    stub.range_requests.append((path, range_header, self.headers.get("If-Range")))
+                # /pdf/ignore-range 模拟不支持 Range 的服务器：总是返回 200 和完整内容
+                if (
+                    range_header
+                    and self.headers.get("If-Range", etag) == etag
+                    and not path.startswith("/pdf/ignore-range")
+                ):
+                    start = int(range_header.split("=")[1].split("-")[0])
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", "application/pdf")
+                self.send_header("Content-Length", str(len(body) - start))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                if path.startswith(("/pdf/flaky", "/pdf/changing", "/pdf/ignore-range")) and stub.hits[path] == 1:
+                    # 第一次请求只发送一半内容后断开连接
+                    self.wfile.write(body[start : len(body) // 2])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+                self.wfile.write(body[start:])
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                stub.hits[url.path] = stub.hits.get(url.path, 0) + 1
+                if url.path.endswith("/search"):
+                    self.send_body(stub.pages[url.path.strip("/").split("/")[0]], "text/html")
+                elif url.path.startswith("/pdf/"):
+                    self.send_pdf(url.path)
+                elif url.path.startswith("/api/v1/parsing/job/"):
+                    job_id = url.path.rstrip("/").split("/")[5]
+                    if job_id not in stub.jobs:
+                        self.send_body(b'{"detail": "Job not found"}', "application/json", status=404)
+                        return
+                    ready_at, page_count, error = stub.jobs[job_id]
+                    if url.path.endswith("/result/markdown"):
+                        body = {"markdown": f"# Job {job_id}"}
+                    elif url.path.endswith("/result/json"):
+                        body = {
+                            "pages": [
+                                {"page": n + 1, "md": f"# Job {job_id} page {n + 1}"}
+                                for n in range(page_count)
+                            ]
+                        }
+                    elif time.monotonic() < ready_at:
+                        body = {"id": job_id, "status": "PENDING"}
+                    elif error:
+                        body = {"id": job_id, "status": "ERROR", "error_message": error}
+                    else:
+                        body = {"id": job_id, "status": "SUCCESS"}
+                    self.send_body(json.dumps(body).encode(), "application/json")
+                else:
+                    self.send_body(b"not found", "text/plain", status=404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = self.rfile.read(length)
+                url = urlparse(self.path)
+                stub.hits[url.path] = stub.hits.get(url.path, 0) + 1
+                # 与 LlamaParse 一致，任务 ID 为 UUID
+                job_id = str(uuid.UUID(int=stub.hits[url.path]))
+                # 从 multipart 请求体中取出 PDF 以得到页数
+                pdf = payload[payload.find(b"%PDF") : payload.rfind(b"%%EOF") + 5]
+                with fitz.open(stream=pdf, filetype="pdf") as doc:
+                    page_count = len(doc)
+                stub.uploads.append({"bytes": len(pdf), "pages": page_count})
+                duration = stub.rng.uniform(*stub.parse_seconds) + stub.parse_seconds_per_page * page_count
+                stub.jobs[job_id] = (time.monotonic() + duration, page_count, stub.parse_error)
+                body = {"id": job_id, "status": "PENDING"}
+                self.send_body(json.dumps(body).encode(), "application/json")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self._saved = (main.PAPERS_COOL_URL, main.LLAMAPARSE_API_URL)
+        main.PAPERS_COOL_URL = main.LLAMAPARSE_API_URL = self.url
+        return self
+
+    def __exit__(self, *exc):
+        main.PAPERS_COOL_URL, main.LLAMAPARSE_API_URL = self._saved
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def bench_ccf(args) -> dict:
+    """Per-lookup cost of get_ccf_rank before (YAML parse per call) and after (compiled index)."""
+    venues = ["NeurIPS.2024", "ICML", "Proceedings of the AAAI Conference", "unknown"]
+
+    def legacy_lookup():
+        with open(main.CCF_RANK_FILE, "r", encoding="utf-8") as f:
+            yaml_data = yaml.safe_load(f)
+        ccf_rank_map = {}
+        for venue in yaml_data["venues"]:
+            if venue.get("abbr"):
+                ccf_rank_map[venue["abbr"].lower()] = venue.get("rank")
+            if venue.get("name"):
+                ccf_rank_map[venue["name"].lower()] = venue.get("rank")
+        return ccf_rank_map.get(venues[0].lower())
+
+    index_lookups = iter(range(10**9))
+
+    def indexed_lookup():
+        return main.lookup_ccf_rank(venues[next(index_lookups) % len(venues)])
+
+    main._ccf_index_file().unlink(missing_ok=True)
+    main._ccf_index.update(map={}, names={}, key=None, checked_at=0.0)
+    start = time.perf_counter()
+    main._refresh_ccf_index()
+    cold_build_ms = (time.perf_counter() - start) * 1e3
+
+    main._ccf_index.update(map={}, names={}, key=None, checked_at=0.0)
+    start = time.perf_counter()
+    main._refresh_ccf_index()
+    sidecar_load_ms = (time.perf_counter() - start) * 1e3
+
+    return {
+        "legacy_yaml_per_lookup": measure(legacy_lookup, repeat=max(args.repeat // 100, 5)),
+        "compiled_index_per_lookup": measure(indexed_lookup, repeat=args.repeat * 10),
+        "cold_build_ms": round(cold_build_ms, 2),
+        "sidecar_load_ms": round(sidecar_load_ms, 2),
+    }
+
+
+def bench_http(args) -> dict:
+    """Latency of a search + download + poll sequence with per-call clients vs the pooled registry."""
+    with StubServer(handshake_ms=args.handshake_ms) as stub:
+        pdf_url = f"{stub.url}/pdf/paper.pdf"
+        job_url = f"{stub.url}/api/v1/parsing/job/job-1"
+
+        async def per_call_clients():
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                response = await client.get(f"{stub.url}/arxiv/search?query=graph&show=1000")
+                response.raise_for_status()
+            async with httpx.AsyncClient(timeout=60.0) as client:
+                (await client.get(pdf_url)).raise_for_status()
+            for _ in range(3):
+                async with httpx.AsyncClient(timeout=60.0) as client:
+                    (await client.get(job_url)).raise_for_status()
+
+        async def pooled_clients():
+            response = await main.get_http_client(stub.url).get(
+                f"{stub.url}/arxiv/search", params={"query": "graph", "show": 1000}
+            )
+            response.raise_for_status()
+            (await main.get_http_client(pdf_url).get(pdf_url)).raise_for_status()
+            for _ in range(3):
+                await main.get_job_status("job-1", "token")
+
+        async def run_both():
+            stub.connections = 0
+            before = await measure_async(per_call_clients, repeat=args.repeat // 50 or 1)
+            before["connections"] = stub.connections
+            stub.connections = 0
+            after = await measure_async(pooled_clients, repeat=args.repeat // 50 or 1)
+            after["connections"] = stub.connections
+            await main.close_http_clients()
+            return {"per_call_clients": before, "pooled_clients": after}
+
+        return {"handshake_ms": args.handshake_ms, **asyncio.run(run_both())}
+
+
+def load_search_fixtures(args) -> list[tuple[str, str, bool]]:
+    """
+    Saved papers.cool pages from --fixtures (files named *arxiv*.html / *venue*.html),
+    or synthetic 1000-paper pages when no fixture directory is given.
+    """
+    if args.fixtures:
+        return [
+            (path.name, path.read_text(encoding="utf-8"), "venue" in path.name)
+            for path in sorted(Path(args.fixtures).glob("*.html"))
+        ]
+    return [
+        ("synthetic-arxiv", make_search_page(1000, venue=False), False),
+        ("synthetic-venue", make_search_page(1000, venue=True, seed=1), True),
+    ]
+
+
+def load_pdf_fixtures(args) -> dict[str, bytes]:
+    """Saved PDFs from --fixtures, or synthetic 4, 20 and 120 page papers when none are given."""
+    if args.fixtures:
+        pdfs = {path.name: path.read_bytes() for path in sorted(Path(args.fixtures).glob("*.pdf"))}
+        if pdfs:
+            return pdfs
+    return {
+        "synthetic-4p.pdf": make_pdf(4),
+        "synthetic-20p.pdf": make_pdf(20, seed=1),
+        "synthetic-120p.pdf": make_pdf(120, seed=2),
+    }
+
+
+def record_fixtures(args) -> dict:
+    """
+    Save live papers.cool search pages and a few arXiv PDFs into --record-fixtures,
+    in the layout that --fixtures replays.
+    """
+    directory = Path(args.record_fixtures)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    async def record() -> dict:
+        saved = []
+        pdf_urls = []
+        for query in args.record_query or ["graph neural network"]:
+            slug = "-".join(re.findall(r"\w+", query.lower()))
+            for endpoint in ("arxiv", "venue"):
+                response = await main.get_http_client(main.PAPERS_COOL_URL).get(
+                    f"{main.PAPERS_COOL_URL}/{endpoint}/search", params={"query": query, "show": 1000}
+                )
+                response.raise_for_status()
+                path = directory / f"{endpoint}-{slug}.html"
+                path.write_text(response.text, encoding="utf-8")
+                saved.append(path.name)
+                if endpoint == "arxiv":
+                    papers = main.parse_papers_html(response.text, venue=False)
+                    pdf_urls += [paper.pdf_url for paper in papers if isinstance(paper, main.Paper) and paper.pdf_url]
+        for i, pdf_url in enumerate(pdf_urls[: args.record_pdfs]):
+            response = await main.get_http_client(pdf_url).get(pdf_url)
+            response.raise_for_status()
+            path = directory / f"paper-{i}.pdf"
+            path.write_bytes(response.content)
+            saved.append(path.name)
+        await main.close_http_clients()
+        return {"directory": str(directory), "files": saved}
+
+    return asyncio.run(record())
+
+
+def bench_parse(args) -> dict:
+    """Parse time of each HTML backend, and whether its output is identical to the bs4 reference."""
+    results = {}
+    for name, html, venue in load_search_fixtures(args):
+        reference = json.dumps(main.papers_to_dicts(main.parse_papers_html(html, venue, backend="bs4")))
+        page = {"bytes": len(html), "papers": len(json.loads(reference))}
+        for backend in main.HTML_PARSER_BACKENDS:
+            stats = measure(
+                lambda: main.parse_papers_html(html, venue, backend=backend),
+                repeat=max(args.repeat // 200, 3),
+            )
+            output = json.dumps(main.papers_to_dicts(main.parse_papers_html(html, venue, backend=backend)))
+            page[backend] = {
+                "mean_ms": round(stats["mean_us"] / 1000, 2),
+                "p50_ms": round(stats["p50_us"] / 1000, 2),
+                "identical": output == reference,
+            }
+            if args.check and output != reference:
+                raise SystemExit(f"{backend} output differs from bs4 on {name}")
+        results[name] = page
+    return results
+
+
+def bench_stream(args) -> dict:
+    """Latency and peak Python memory of a 10-result arXiv search: buffered parse vs streaming with early stop."""
+    limit = 10
+
+    async def buffered():
+        papers = await main._fetch_search_page("arxiv", "graph")
+        return papers[:limit]
+
+    async def streamed():
+        papers, _ = await main._stream_search_page("arxiv", "graph", limit)
+        return papers[:limit]
+
+    async def profile(func) -> dict:
+        tracemalloc.start()
+        stats = await measure_async(func, repeat=max(args.repeat // 100, 3))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats["peak_mib"] = round(peak / 2**20, 2)
+        return stats
+
+    async def run_both():
+        results = {"buffered": await profile(buffered), "streamed": await profile(streamed)}
+        results["identical"] = await buffered() == await streamed()
+        await main.close_http_clients()
+        return results
+
+    with StubServer():
+        return {"num_results": limit, "parser": main.html_parser_backend(), **asyncio.run(run_both())}
+
+
+def bench_concurrency(args) -> dict:
+    """get_ccf_rank latency while a 300-page PDF is read: on the event loop vs via the executor layer."""
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = Path(tmp) / "long.pdf"
+        pdf_path.write_bytes(make_pdf(300))
+
+        async def blocking_read():
+            # 旧实现：直接在事件循环中提取文本
+            await asyncio.sleep(0)
+            return main.extract_pdf_text(str(pdf_path))
+
+        async def probe_while(read) -> dict:
+            task = asyncio.create_task(read())
+            samples = []
+            while not task.done():
+                start = time.perf_counter()
+                await main.get_ccf_rank("NeurIPS.2024")
+                samples.append((time.perf_counter() - start) * 1e3)
+                await asyncio.sleep(0.005)
+            await task
+            samples.sort()
+            return {
+                "probes": len(samples),
+                "p50_ms": round(samples[len(samples) // 2], 3),
+                "max_ms": round(samples[-1], 3),
+            }
+
+        async def run_both():
+            # 预热进程池，避免把工作进程的启动时间计入结果
+            await main.read_paper(str(pdf_path))
+            results = {
+                "on_event_loop": await probe_while(blocking_read),
+                "executor": await probe_while(lambda: main.read_paper(str(pdf_path))),
+            }
+            main.shutdown_executors()
+            return results
+
+        return asyncio.run(run_both())
+
+
+def bench_pdf(args) -> dict:
+    """Whole-document text extraction of a 500-page PDF: serial vs page-sharded worker processes."""
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = str(Path(tmp) / "proceedings.pdf")
+        Path(pdf_path).write_bytes(make_pdf(500))
+
+        start = time.perf_counter()
+        serial_text = main.extract_pdf_text(pdf_path)
+        serial_ms = (time.perf_counter() - start) * 1e3
+
+        async def sharded() -> dict:
+            main.PROCESS_POOL_WORKERS = main.PDF_SHARD_WORKERS = args.workers
+            # 预热进程池
+            await asyncio.gather(*(main.run_in_process(main.pdf_page_count, pdf_path) for _ in range(args.workers)))
+            start = time.perf_counter()
+            text = await main.read_pdf_text(pdf_path)
+            elapsed_ms = (time.perf_counter() - start) * 1e3
+            main.shutdown_executors()
+            return {"ms": round(elapsed_ms, 1), "identical": text == serial_text}
+
+        return {
+            "pages": 500,
+            "workers": args.workers,
+            "serial_ms": round(serial_ms, 1),
+            "sharded": asyncio.run(sharded()),
+        }
+
+
+def bench_download(args) -> dict:
+    """Peak memory of a large download (buffered vs streamed), Range resume, dedupe and coalescing."""
+    with tempfile.TemporaryDirectory() as tmp, StubServer() as stub:
+        stub.large_pdf = b"%PDF-1.4\n" + os.urandom(args.download_mib * 2**20)
+        main.DATA_DIR = Path(tmp)
+        main.DOWNLOAD_MANIFEST = main.DATA_DIR / ".manifest.json"
+
+        async def buffered():
+            response = await main.get_http_client(stub.url).get(f"{stub.url}/pdf/large-buffered")
+            (main.DATA_DIR / "buffered.pdf").write_bytes(response.content)
+
+        async def streamed():
+            await main.download_pdf("streamed", f"{stub.url}/pdf/large-streamed")
+
+        async def profile(func) -> dict:
+            tracemalloc.start()
+            start = time.perf_counter()
+            await func()
+            elapsed_ms = (time.perf_counter() - start) * 1e3
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return {"ms": round(elapsed_ms, 1), "peak_mib": round(peak / 2**20, 2)}
+
+        async def run_all() -> dict:
+            results = {
+                "size_mib": args.download_mib,
+                "buffered": await profile(buffered),
+                "streamed": await profile(streamed),
+            }
+
+            # 中断后的续传由重试完成，基准中不等待退避
+            main.DOWNLOAD_BACKOFF = 0.0
+            flaky = await main.download_pdf_with_retry("flaky", f"{stub.url}/pdf/flaky")
+            results["resumed_identical"] = (main.DATA_DIR / flaky).read_bytes() == stub.pdf
+            results["resume_requests"] = stub.hits["/pdf/flaky"]
+
+            changing = await main.download_pdf_with_retry("changing", f"{stub.url}/pdf/changing")
+            results["changed_during_resume_is_new_version"] = (
+                main.DATA_DIR / changing
+            ).read_bytes() == stub.pdf[::-1]
+
+            await main.download_pdf("again", f"{stub.url}/pdf/flaky")
+            results["requests_after_repeat"] = stub.hits["/pdf/flaky"]
+
+            await asyncio.gather(
+                *(main.download_pdf(f"same-{i}", f"{stub.url}/pdf/coalesced") for i in range(8))
+            )
+            results["coalesced_requests_for_8_calls"] = stub.hits["/pdf/coalesced"]
+
+            await main.close_http_clients()
+            main.shutdown_executors()
+            return results
+
+        return asyncio.run(run_all())
+
+
+def bench_bulk_download(args) -> dict:
+    """Wall-clock time for 12 slow (200 ms) PDFs: sequential download_paper_pdf calls vs one download_papers call."""
+    with tempfile.TemporaryDirectory() as tmp, StubServer() as stub:
+        main.DATA_DIR = Path(tmp)
+        main.DOWNLOAD_MANIFEST = main.DATA_DIR / ".manifest.json"
+        papers = [
+            {"title": f"{kind} {i}", "pdf_url": f"{stub.url}/pdf/{kind}-{i}?delay=0.2"}
+            for kind in ("sequential", "bulk")
+            for i in range(12)
+        ]
+
+        async def run_both() -> dict:
+            start = time.perf_counter()
+            for paper in papers[:12]:
+                await main.download_paper_pdf(paper["title"], paper["pdf_url"])
+            sequential_s = time.perf_counter() - start
+
+            report = await main.download_papers(papers[12:])
+            await main.close_http_clients()
+            main.shutdown_executors()
+            return {
+                "files": 12,
+                "sequential_s": round(sequential_s, 3),
+                "download_papers_s": report["seconds"],
+                "downloaded": report["downloaded"],
+                "failed": report["failed"],
+            }
+
+        return asyncio.run(run_both())
+
+
+def bench_local_index(args) -> dict:
+    """Query latency of search_local over 100k indexed papers vs a linear keyword scan of the same papers."""
+    rng = random.Random(0)
+    # 类 Zipf 分布的词表，避免每篇论文都命中所有查询词
+    vocabulary = WORDS + [f"term{i}" for i in range(20000)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    papers = [
+        main.Paper(
+            title=f"{' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=8))} {i}",
+            pdf_url=f"https://papers.cool/pdf/{i}",
+            first_author=f"Author {rng.randrange(5000)}",
+            abstract=" ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=60)),
+            subjects=[f"{rng.choice(VENUES)}.{rng.randrange(2015, 2025)}"],
+            publication_time=rng.randrange(2015, 2025),
+        )
+        for i in range(args.index_papers)
+    ]
+    queries = [" ".join(rng.sample(vocabulary[:2000], 3)) for _ in range(50)]
+    query_iter = iter(range(10**9))
+
+    def next_query() -> str:
+        return queries[next(query_iter) % len(queries)]
+
+    def linear_scan():
+        tokens = next_query().split()
+        hits = [
+            paper
+            for paper in papers
+            if any(t in paper.title or t in paper.abstract for t in tokens)
+        ]
+        return hits[:20]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        main.PAPER_INDEX_PATH = Path(tmp) / "papers.sqlite3"
+        main._paper_index_db["conn"] = None
+        start = time.perf_counter()
+        for i in range(0, len(papers), 5000):
+            main.index_papers("venue", papers[i : i + 5000])
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        main.index_papers("venue", papers[:5000])
+        reindex_unchanged_ms = (time.perf_counter() - start) * 1e3
+
+        result = {
+            "papers": len(papers),
+            "build_s": round(build_s, 2),
+            "reindex_5000_unchanged_ms": round(reindex_unchanged_ms, 2),
+            "linear_scan": measure(linear_scan, repeat=max(args.repeat // 100, 5)),
+            "fts5_search": measure(
+                lambda: main.search_paper_index(next_query(), 20), repeat=max(args.repeat // 10, 20)
+            ),
+            "fts5_search_year_range": measure(
+                lambda: main.search_paper_index(next_query(), 20, "venue", 2020, 2022),
+                repeat=max(args.repeat // 10, 20),
+            ),
+        }
+        main._paper_index_db["conn"].close()
+        main._paper_index_db["conn"] = None
+        return result
+
+
+def bench_papers(args) -> dict:
+    """Memory, sort and transfer cost of 16 cached 1000-paper venue pages: plain dicts vs slotted Paper records."""
+    pages = 16
+    dumped = [
+        json.dumps(main.papers_to_dicts(main.parse_papers_html(make_search_page(1000, venue=True, seed=seed), True)))
+        for seed in range(pages)
+    ]
+
+    def traced_size(build) -> tuple[list, float]:
+        tracemalloc.start()
+        value = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return value, round(size / 2**20, 2)
+
+    # 各自从 JSON 重新构建，字符串互不共享，和旧版每次解析/读盘得到的字典一致
+    dict_pages, dict_mib = traced_size(lambda: [json.loads(page) for page in dumped])
+    paper_pages, paper_mib = traced_size(
+        lambda: [[main.Paper.from_dict(paper) for paper in json.loads(page)] for page in dumped]
+    )
+    repeat = max(args.repeat // 50, 5)
+    return {
+        "papers": pages * 1000,
+        "dicts_mib": dict_mib,
+        "papers_mib": paper_mib,
+        "sort_by_date": {
+            "dict_get": measure(
+                lambda: [sorted(page, key=lambda x: x.get("publication_time", 0), reverse=True) for page in dict_pages],
+                repeat=repeat,
+            ),
+            "precomputed_key": measure(
+                lambda: [sorted(page, key=main._PAPER_SORT_KEY, reverse=True) for page in paper_pages],
+                repeat=repeat,
+            ),
+        },
+        "to_dict_100_papers": measure(lambda: main.papers_to_dicts(paper_pages[0][:100]), repeat=args.repeat),
+        "process_pool_pickle_kib": {
+            "dicts": round(len(pickle.dumps(dict_pages[0])) / 1024, 1),
+            "papers": round(len(pickle.dumps(paper_pages[0])) / 1024, 1),
+        },
+        "identical": [main.papers_to_dicts(page) for page in paper_pages] == dict_pages,
+    }
+
+
+def bench_passages(args) -> dict:
+    """Finding one topic in 10 downloaded 20-page papers: read_paper on every file vs search_papers_content."""
+    with tempfile.TemporaryDirectory() as tmp:
+        main.DATA_DIR = Path(tmp) / "data"
+        main.DATA_DIR.mkdir()
+        main.TEXT_CACHE_DIR = Path(tmp) / "text"
+        main.PASSAGE_INDEX_PATH = Path(tmp) / "passages.sqlite3"
+        main._passage_index_db["conn"] = None
+        for i in range(10):
+            (main.DATA_DIR / f"paper_{i}.pdf").write_bytes(make_pdf(20, seed=i))
+        query = "federated privacy benchmark"
+
+        async def run_both() -> dict:
+            async def read_all() -> int:
+                chars = 0
+                for file in sorted(main.DATA_DIR.iterdir()):
+                    chars += len(json.dumps(await main.read_paper(file.name)))
+                return chars
+
+            read_chars = await read_all()  # 预热文本缓存
+            read_stats = await measure_async(read_all, repeat=5)
+
+            start = time.perf_counter()
+            await main.search_papers_content(query)
+            cold_index_ms = (time.perf_counter() - start) * 1e3
+
+            passages = await main.search_papers_content(query)
+            search_stats = await measure_async(
+                lambda: main.search_papers_content(query), repeat=max(args.repeat // 50, 10)
+            )
+
+            touched = main.DATA_DIR / "paper_0.pdf"
+            os.utime(touched)
+            start = time.perf_counter()
+            touched_stats = await main.refresh_passage_index()
+            touched_ms = (time.perf_counter() - start) * 1e3
+
+            (main.DATA_DIR / "paper_1.pdf").write_bytes(make_pdf(20, seed=99))
+            start = time.perf_counter()
+            changed_stats = await main.refresh_passage_index()
+            changed_ms = (time.perf_counter() - start) * 1e3
+
+            main.shutdown_executors()
+            main._passage_index_db["conn"].close()
+            main._passage_index_db["conn"] = None
+            return {
+                "read_paper_all_files": {**read_stats, "chars_returned": read_chars},
+                "search_papers_content": {
+                    **search_stats,
+                    "chars_returned": len(json.dumps(passages)),
+                    "cold_index_ms": round(cold_index_ms, 1),
+                },
+                "refresh_after_touch": {"ms": round(touched_ms, 1), **touched_stats},
+                "refresh_after_change": {"ms": round(changed_ms, 1), **changed_stats},
+            }
+
+        return asyncio.run(run_both())
+
+
+def bench_read_slice(args) -> dict:
+    """Payload and latency of read_paper on a 40-page PDF: whole document vs a 2-page slice and cursor continuation."""
+    with tempfile.TemporaryDirectory() as tmp:
+        main.TEXT_CACHE_DIR = Path(tmp) / "text"
+        pdf_path = str(Path(tmp) / "paper.pdf")
+        Path(pdf_path).write_bytes(make_pdf(40))
+
+        async def run_all() -> dict:
+            start = time.perf_counter()
+            full = await main.read_paper(pdf_path)
+            full_ms = (time.perf_counter() - start) * 1e3
+
+            start = time.perf_counter()
+            first = await main.read_paper(pdf_path, pages="1-2")
+            first_slice_ms = (time.perf_counter() - start) * 1e3
+
+            page_stats = await measure_async(
+                lambda: main.read_paper(pdf_path, pages="5-6"), repeat=max(args.repeat // 50, 10)
+            )
+
+            chunk = await main.read_paper(pdf_path, max_chars=4000)
+            cursor = {"value": chunk["next_cursor"]}
+
+            async def continue_reading():
+                result = await main.read_paper(pdf_path, cursor=cursor["value"])
+                cursor["value"] = result["next_cursor"] or chunk["next_cursor"]
+
+            cursor_stats = await measure_async(continue_reading, repeat=max(args.repeat // 50, 10))
+            main.shutdown_executors()
+            return {
+                "whole_document": {"ms": round(full_ms, 1), "payload_bytes": len(json.dumps(full))},
+                "pages_1_2": {
+                    "first_call_ms": round(first_slice_ms, 1),
+                    "payload_bytes": len(json.dumps(first)),
+                },
+                "pages_5_6_cached_handle": page_stats,
+                "cursor_4000_chars": cursor_stats,
+            }
+
+        return asyncio.run(run_all())
+
+
+def bench_llamaparse(args) -> dict:
+    """Parsing 4 PDFs whose jobs take 0.5-3 s: legacy sequential 5 s polling vs the concurrent job manager."""
+    with tempfile.TemporaryDirectory() as tmp, StubServer(parse_seconds=(0.5, 3.0)) as stub:
+        main.TEXT_CACHE_DIR = Path(tmp) / "text"
+        paths = []
+        for i in range(4):
+            paths.append(Path(tmp) / f"paper_{i}.pdf")
+            paths[-1].write_bytes(make_pdf(5, seed=i))
+        token = "benchmark"
+
+        def status_polls() -> int:
+            return sum(
+                count
+                for path, count in stub.hits.items()
+                if path.startswith("/api/v1/parsing/job/") and not path.endswith("/markdown")
+            )
+
+        async def legacy_read(pdf_path: Path) -> str:
+            job_id = (await main.upload_file_to_llamaparse(pdf_path, token)).get("id")
+            status = (await main.get_job_status(job_id, token)).json().get("status")
+            while status not in {"SUCCESS", "ERROR"}:
+                await asyncio.sleep(5)
+                status = (await main.get_job_status(job_id, token)).json().get("status")
+            return (await main.get_job_result_markdown(job_id, token)).get("markdown", "")
+
+        async def run_both() -> dict:
+            start = time.perf_counter()
+            for path in paths:
+                await legacy_read(path)
+            legacy_s = time.perf_counter() - start
+            legacy_polls = status_polls()
+
+            main.TEXT_CACHE_DIR = Path(tmp) / "text-manager"
+            stub.hits.clear()
+            os.environ["LLAMAINDEX_API_KEY"] = token
+            try:
+                start = time.perf_counter()
+                handles = await main.submit_parse([str(path) for path in paths])
+                submit_ms = (time.perf_counter() - start) * 1e3
+                results = await asyncio.gather(
+                    *(main.get_parse_result(handle["job_id"], wait_seconds=60) for handle in handles)
+                )
+                manager_s = time.perf_counter() - start
+            finally:
+                del os.environ["LLAMAINDEX_API_KEY"]
+            manager_polls = status_polls()
+            await main.close_http_clients()
+            main.shutdown_executors()
+            return {
+                "pdfs": len(paths),
+                "legacy_sequential": {"s": round(legacy_s, 2), "status_polls": legacy_polls},
+                "job_manager": {
+                    "s": round(manager_s, 2),
+                    "submit_returned_ms": round(submit_ms, 1),
+                    "status_polls": manager_polls,
+                    "all_succeeded": all(result["status"] == "SUCCESS" for result in results),
+                },
+            }
+
+        return asyncio.run(run_both())
+
+
+def make_mixed_pdf(num_pages: int, hard_pages: dict[int, str], seed: int = 0) -> bytes:
+    """Text PDF in which the 0-based `hard_pages` get a table caption, an image or a vector chart."""
+    doc = fitz.open(stream=make_pdf(num_pages, seed=seed), filetype="pdf")
+    for page_num, kind in hard_pages.items():
+        page = doc[page_num]
+        if kind == "table":
+            page.insert_text((50, 40), "Table 2: Results on the benchmark datasets.", fontsize=8)
+        elif kind == "image":
+            pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 256, 256), False)
+            pixmap.clear_with(128)
+            # 接近整页的图片（扫描页或整页插图）
+            page.insert_image(fitz.Rect(50, 100, 550, 800), pixmap=pixmap)
+        else:
+            rng = random.Random(page_num)
+            for _ in range(60):
+                page.draw_line((rng.uniform(50, 550), rng.uniform(400, 800)), (rng.uniform(50, 550), rng.uniform(400, 800)))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def bench_hybrid(args) -> dict:
+    """Reading a 30-page paper with 4 hard pages via LlamaParse: whole-document upload vs hybrid routing."""
+    hard_pages = {2: "table", 7: "image", 14: "chart", 21: "table"}
+    with tempfile.TemporaryDirectory() as tmp, StubServer(parse_seconds_per_page=0.1) as stub:
+        pdf_path = Path(tmp) / "paper.pdf"
+        pdf_path.write_bytes(make_mixed_pdf(30, hard_pages))
+        token = "benchmark"
+
+        async def read(hybrid: bool) -> dict:
+            main.TEXT_CACHE_DIR = Path(tmp) / f"text-{hybrid}"
+            main.LLAMAPARSE_HYBRID = hybrid
+            main.LLAMAPARSE_POLL_INITIAL = 0.2
+            stub.uploads.clear()
+            start = time.perf_counter()
+            text = await main.read_paper_with_llamaindex(str(pdf_path))
+            elapsed = time.perf_counter() - start
+            return {
+                "s": round(elapsed, 2),
+                "uploaded_pages": sum(upload["pages"] for upload in stub.uploads),
+                "uploaded_bytes": sum(upload["bytes"] for upload in stub.uploads),
+                "chars": len(text),
+                "text": text,
+            }
+
+        async def run_both() -> dict:
+            os.environ["LLAMAINDEX_API_KEY"] = token
+            try:
+                # 预热进程池
+                await main.run_in_process(main.pdf_page_count, str(pdf_path))
+                whole = await read(False)
+                hybrid = await read(True)
+            finally:
+                del os.environ["LLAMAINDEX_API_KEY"]
+            await main.close_http_clients()
+            main.shutdown_executors()
+            text = hybrid.pop("text")
+            whole.pop("text")
+            # 远程页面应按原页码顺序拼回
+            positions = [text.find(f"page {n + 1}") for n in range(len(hard_pages))]
+            hybrid["stitched_in_order"] = -1 not in positions and positions == sorted(positions)
+            return {"pages": 30, "hard_pages": len(hard_pages), "whole_document": whole, "hybrid": hybrid}
+
+        return asyncio.run(run_both())
+
+
+def bench_coalesce(args) -> dict:
+    """N concurrent identical search_on_venue, download_paper_pdf and read_paper calls: upstream work must happen once."""
+    calls = args.concurrency
+    with tempfile.TemporaryDirectory() as tmp, StubServer() as stub:
+        main.CACHE_DIR = Path(tmp)
+        main.TEXT_CACHE_DIR = main.CACHE_DIR / "text"
+        main.PAPER_INDEX_PATH = main.CACHE_DIR / "papers.sqlite3"
+        main._search_cache_db["conn"] = None
+        main._paper_index_db["conn"] = None
+        main._search_cache_memory.clear()
+        main.DATA_DIR = Path(tmp) / "data"
+        main.DOWNLOAD_MANIFEST = main.DATA_DIR / ".manifest.json"
+        pdf_url = f"{stub.url}/pdf/shared?delay=0.2"
+
+        extractions = []
+        read_pdf_text = main.read_pdf_text
+
+        async def counting_read_pdf_text(pdf_path):
+            extractions.append(pdf_path)
+            return await read_pdf_text(pdf_path)
+
+        async def run_all() -> dict:
+            main.read_pdf_text = counting_read_pdf_text
+            try:
+                start = time.perf_counter()
+                searches = await asyncio.gather(
+                    *(main.search_on_venue(f"  Graph   Learning{' ' * i}", 20) for i in range(calls))
+                )
+                search_ms = (time.perf_counter() - start) * 1e3
+
+                start = time.perf_counter()
+                files = await asyncio.gather(
+                    *(main.download_paper_pdf("Shared paper", pdf_url) for _ in range(calls))
+                )
+                download_ms = (time.perf_counter() - start) * 1e3
+
+                start = time.perf_counter()
+                texts = await asyncio.gather(
+                    *(main.read_paper(files[0]) for _ in range(calls))
+                )
+                read_ms = (time.perf_counter() - start) * 1e3
+            finally:
+                main.read_pdf_text = read_pdf_text
+            await asyncio.gather(*main._paper_index_tasks)
+            await main.close_http_clients()
+            main.shutdown_executors()
+
+            result = {
+                "concurrent_calls": calls,
+                "search": {"ms": round(search_ms, 1), "upstream_requests": stub.hits.get("/venue/search", 0)},
+                "download": {"ms": round(download_ms, 1), "upstream_requests": stub.hits.get("/pdf/shared", 0)},
+                "read": {"ms": round(read_ms, 1), "extractions": len(extractions)},
+                "counters": main.single_flight_info(),
+                "identical_results": all(r == searches[0] for r in searches)
+                and len(set(files)) == 1
+                and all(t == texts[0] for t in texts),
+            }
+            if args.check and (
+                result["search"]["upstream_requests"] != 1
+                or result["download"]["upstream_requests"] != 1
+                or result["read"]["extractions"] != 1
+                or not result["identical_results"]
+            ):
+                raise SystemExit(f"coalescing check failed: {json.dumps(result)}")
+            return result
+
+        return asyncio.run(run_all())
+
+
+def bench_tracing(args) -> dict:
+    """Per-call cost of tool tracing on get_ccf_rank: untraced vs traced vs traced with a JSONL trace file."""
+    repeat = args.repeat * 10
+    venues = ["NeurIPS", "Proceedings of the ACM SIGMOD Conference", "Unknown Workshop"]
+    traced = main.get_ccf_rank
+    untraced = getattr(traced, "__wrapped__", traced)
+
+    async def per_call_us(func) -> float:
+        start = time.perf_counter()
+        for i in range(repeat):
+            await func(venues[i % len(venues)])
+        return (time.perf_counter() - start) / repeat * 1e6
+
+    async def run_all(trace_path: str) -> dict:
+        await untraced(venues[0])
+        result = {
+            "calls": repeat,
+            "untraced_us": round(await per_call_us(untraced), 2),
+            "traced_us": round(await per_call_us(traced), 2),
+        }
+        trace_file = main.TRACE_FILE
+        main.TRACE_FILE = trace_path
+        try:
+            result["traced_to_file_us"] = round(await per_call_us(traced), 2)
+        finally:
+            main.TRACE_FILE = trace_file
+            if main._trace_file["handle"] is not None:
+                main._trace_file["handle"].close()
+                main._trace_file["handle"] = None
+        return result
+
+    with tempfile.TemporaryDirectory() as tmp:
+        result = asyncio.run(run_all(str(Path(tmp) / "trace.jsonl")))
+
+    # stage()/mark() 在追踪之外（或 SCHOLAI_METRICS=0）时只是一次 ContextVar 读取
+    start = time.perf_counter()
+    for _ in range(repeat):
+        with main.stage("noop"):
+            pass
+        main.mark("noop")
+    result["stage_and_mark_outside_trace_ns"] = round((time.perf_counter() - start) / repeat * 1e9)
+    result["overhead_us"] = round(result["traced_us"] - result["untraced_us"], 2)
+    result["metrics_enabled"] = main.METRICS_ENABLED
+    return result
+
+
+def bench_payload(args) -> dict:
+    """
+    Response size and end-to-end latency (tool call plus FastMCP serialization) of
+    search_on_venue for 100 papers: every field vs server-side filters, field
+    projection, abstract truncation and a byte budget.
+    """
+    variants = {
+        "all_fields": {},
+        "titles_and_pdf_urls": {"fields": ["title", "pdf_url"]},
+        "abstract_200_chars": {"abstract_chars": 200},
+        "years_2022_2025_icml_neurips": {"year_from": 2022, "year_to": 2025, "venues": ["ICML", "NeurIPS"]},
+        "max_bytes_16k": {"max_bytes": 16384},
+    }
+    repeat = max(args.repeat // 20, 10)
+    with tempfile.TemporaryDirectory() as tmp, StubServer():
+        main.CACHE_DIR = Path(tmp)
+        main._search_cache_db["conn"] = None
+        main._search_cache_memory.clear()
+
+        async def run_all() -> dict:
+            result = {}
+            for name, options in variants.items():
+                arguments = {"query": "graph learning", "num_results": 100, **options}
+                content = await main.mcp.call_tool("search_on_venue", arguments)
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    content = await main.mcp.call_tool("search_on_venue", arguments)
+                payload = sum(len(block.text.encode("utf-8")) for block in content)
+                result[name] = {
+                    "papers": sum(1 for block in content if '"title"' in block.text),
+                    "payload_bytes": payload,
+                    # 约 4 字节一个 token 的粗略估计
+                    "approx_tokens": payload // 4,
+                    "ms": round((time.perf_counter() - start) / repeat * 1e3, 2),
+                }
+            main.shutdown_executors()
+            return result
+
+        return asyncio.run(run_all())
+
+
+def bench_rerank(args) -> dict:
+    """
+    BM25 re-ranking of --rerank-papers search results (150-word abstracts) to the
+    top 20: index build, then cached-index queries with NumPy and pure Python.
+    """
+    rng = random.Random(0)
+    vocabulary = WORDS + [f"term{i}" for i in range(5000)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    papers = [
+        main.Paper(
+            title=" ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=10)),
+            pdf_url=f"https://papers.cool/pdf/{i}",
+            abstract=" ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=150)),
+            subjects=[f"{rng.choice(VENUES)}.{rng.randrange(2015, 2025)}"],
+            publication_time=rng.randrange(2015, 2025),
+        )
+        for i in range(args.rerank_papers)
+    ]
+    queries = [" ".join(rng.sample(vocabulary[:500], 3)) for _ in range(50)]
+    concepts = [rng.sample(vocabulary[:500], 2) for _ in range(50)]
+    repeat = max(args.repeat // 10, 20)
+    backends = {"numpy": main.numpy, "python": None} if main.numpy is not None else {"python": None}
+
+    result = {"papers": len(papers), "top_k": 20}
+    rankings = {}
+    numpy_module = main.numpy
+    try:
+        for name, module in backends.items():
+            main.numpy = module
+            if module is not None:
+                module.load()
+            builds = []
+            for _ in range(5):
+                main._bm25_indexes.clear()
+                start = time.perf_counter()
+                main.bm25_index(papers)
+                builds.append((time.perf_counter() - start) * 1e3)
+            build_ms = statistics.median(builds)
+            start = time.perf_counter()
+            for i in range(repeat):
+                main.rerank_papers(papers, queries[i % 50], concepts[i % 50], 20)
+            query_ms = (time.perf_counter() - start) / repeat * 1e3
+            rankings[name] = [main.rerank_papers(papers, query, concept, 20) for query, concept in zip(queries, concepts)]
+            result[name] = {"index_build_ms": round(build_ms, 2), "cached_query_ms": round(query_ms, 3)}
+    finally:
+        main.numpy = numpy_module
+        main._bm25_indexes.clear()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        sorted(papers, key=main._PAPER_SORT_KEY, reverse=True)[:20]
+    result["datetime_sort_ms"] = round((time.perf_counter() - start) / repeat * 1e3, 3)
+    if len(rankings) == 2:
+        result["backends_identical"] = rankings["numpy"] == rankings["python"]
+        if args.check and not result["backends_identical"]:
+            raise SystemExit("rerank check failed: NumPy and pure Python rankings differ")
+    return result
+
+
+# 低于该差值（毫秒 / KiB）的变化视为噪声，不计为回归
+SUITE_NOISE_MS = 0.05
+SUITE_NOISE_KIB = 64
+
+
+async def run_suite_case(call, repeat: int) -> dict:
+    """
+    Time `repeat` sequential calls of `call(i)` after an untimed warm-up `call(-1)`,
+    then one more under tracemalloc for the peak Python allocation of a single call
+    (worker processes are not included).
+    """
+    await call(-1)
+    samples = []
+    errors = 0
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = await call(i)
+        samples.append((time.perf_counter() - start) * 1e3)
+        errors += main._result_error(result) is not None
+    tracemalloc.start()
+    try:
+        await call(repeat)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    total_s = sum(samples) / 1e3
+    samples.sort()
+    return {
+        "calls": repeat,
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[math.ceil(len(samples) * 0.95) - 1], 3),
+        "throughput_per_s": round(repeat / total_s, 1) if total_s else None,
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def compare_to_baseline(current: dict, baseline: dict, tolerance: float) -> dict:
+    """Per-case p50/p95/peak memory ratios against a stored suite result, flagging regressions."""
+    cases = {}
+    regressions = []
+    for name, case in current["cases"].items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            cases[name] = {"status": "new"}
+            continue
+        row = {}
+        for metric in ("p50_ms", "p95_ms", "peak_kib"):
+            row[metric] = {
+                "baseline": base[metric],
+                "current": case[metric],
+                "ratio": round(case[metric] / base[metric], 3) if base[metric] else None,
+            }
+        slower = (
+            case["p50_ms"] > base["p50_ms"] * (1 + tolerance)
+            and case["p50_ms"] - base["p50_ms"] > SUITE_NOISE_MS
+        )
+        heavier = (
+            case["peak_kib"] > base["peak_kib"] * (1 + tolerance)
+            and case["peak_kib"] - base["peak_kib"] > SUITE_NOISE_KIB
+        )
+        if slower or heavier:
+            row["status"] = "regression"
+            regressions.append(name)
+        elif case["p50_ms"] < base["p50_ms"] * (1 - tolerance) and base["p50_ms"] - case["p50_ms"] > SUITE_NOISE_MS:
+            row["status"] = "improvement"
+        else:
+            row["status"] = "unchanged"
+        cases[name] = row
+    return {
+        "tolerance": tolerance,
+        "same_environment": current["environment"] == baseline.get("environment"),
+        "regressions": regressions,
+        "missing": [name for name in baseline["cases"] if name not in current["cases"]],
+        "cases": cases,
+    }
+
+
+def bench_suite(args) -> dict:
+    """
+    Every MCP tool (plus the HTML parser and CCF loader) against recorded or synthetic
+    fixtures served offline: p50/p95 latency, throughput and peak memory per case.
+
+    --save-baseline stores the result; --baseline compares against a stored one and,
+    with --check, fails on regressions beyond --tolerance.
+    """
+    light = max(args.repeat // 10, 5)
+    heavy = max(args.repeat // 100, 3)
+    search_pages = {}
+    for name, html, venue in load_search_fixtures(args):
+        search_pages.setdefault("venue" if venue else "arxiv", (name, html))
+    search_pages.setdefault("arxiv", ("synthetic-arxiv", make_search_page(1000, venue=False)))
+    search_pages.setdefault("venue", ("synthetic-venue", make_search_page(1000, venue=True, seed=1)))
+    pdfs = load_pdf_fixtures(args)
+    token = "benchmark"
+    saved = {
+        name: getattr(main, name)
+        for name in (
+            "CACHE_DIR",
+            "TEXT_CACHE_DIR",
+            "PAPER_INDEX_PATH",
+            "PASSAGE_INDEX_PATH",
+            "DATA_DIR",
+            "DOWNLOAD_MANIFEST",
+            "LLAMAPARSE_POLL_INITIAL",
+        )
+    }
+
+    with tempfile.TemporaryDirectory() as tmp, StubServer(
+        pages={endpoint: html.encode() for endpoint, (_, html) in search_pages.items()},
+        pdfs=pdfs,
+    ) as stub:
+        root = Path(tmp)
+        for db in (main._search_cache_db, main._paper_index_db, main._passage_index_db):
+            if db["conn"] is not None:
+                db["conn"].close()
+                db["conn"] = None
+        main._search_cache_memory.clear()
+        main.CACHE_DIR = root / "cache"
+        main.PAPER_INDEX_PATH = main.CACHE_DIR / "papers.sqlite3"
+        main.PASSAGE_INDEX_PATH = main.CACHE_DIR / "passages.sqlite3"
+        main.DATA_DIR = root / "data"
+        main.DOWNLOAD_MANIFEST = main.DATA_DIR / ".manifest.json"
+        # 伪造的 LlamaParse 任务立即完成，只测客户端开销
+        main.LLAMAPARSE_POLL_INITIAL = 0.02
+        pdf_dir = root / "pdfs"
+        pdf_dir.mkdir()
+        for name, data in pdfs.items():
+            (pdf_dir / name).write_bytes(data)
+        # LlamaParse 任务按内容合并，每次调用使用不同的 PDF 才会真正上传
+        for i in range(-1, heavy + 1):
+            (pdf_dir / f"parse-{i}.pdf").write_bytes(make_pdf(4, seed=100 + i))
+            (pdf_dir / f"mixed-{i}.pdf").write_bytes(
+                make_mixed_pdf(12, {2: "table", 5: "image", 9: "chart"}, seed=200 + i)
+            )
+        text_caches = itertools.count()
+
+        def fresh_text_cache() -> None:
+            # 每次调用使用新的文本缓存目录，测量未命中缓存的提取
+            main.TEXT_CACHE_DIR = root / "text" / str(next(text_caches))
+
+        def uncached(func):
+            async def call(i):
+                fresh_text_cache()
+                return await func(i)
+
+            return call
+
+        async def call_sync(func, *call_args, **kwargs):
+            return func(*call_args, **kwargs)
+
+        venue_papers = []
+        parse_handles = []
+
+        async def submit(i):
+            handles = await main.submit_parse([str(pdf_dir / f"parse-{i}.pdf")])
+            parse_handles.append(handles[0].get("job_id"))
+            return handles[0]
+
+        async def ccf_cold(i):
+            main._ccf_index_file().unlink(missing_ok=True)
+            main._ccf_index.update(map={}, names={}, key=None, checked_at=0.0)
+            return await main.load_ccf_ranking()
+
+        cases = {
+            "extract_papers_from_html[arxiv]": (
+                lambda i: main.extract_papers_from_html(search_pages["arxiv"][1], venue=False),
+                heavy,
+            ),
+            "extract_papers_from_html[venue]": (
+                lambda i: main.extract_papers_from_html(search_pages["venue"][1], venue=True),
+                heavy,
+            ),
+            "load_ccf_ranking[cold]": (ccf_cold, heavy),
+            "load_ccf_ranking[warm]": (lambda i: main.load_ccf_ranking(), light),
+            "get_ccf_rank": (lambda i: main.get_ccf_rank(("NeurIPS", "ICDE", "Unknown Workshop")[i % 3]), light),
+            "search_on_arxiv[miss]": (lambda i: main.search_on_arxiv(f"graph learning {i}", 100), heavy),
+            "search_on_arxiv[hit]": (lambda i: main.search_on_arxiv("graph learning 0", 100), light),
+            "search_on_venue[miss]": (
+                lambda i: main.search_on_venue(f"graph learning {i}", 100, with_ccf_rank=True),
+                heavy,
+            ),
+            "search_on_venue[hit]": (
+                lambda i: main.search_on_venue("graph learning 0", 100, with_ccf_rank=True),
+                light,
+            ),
+            "search_on_venue[filtered]": (
+                lambda i: main.search_on_venue(
+                    "graph learning 0",
+                    100,
+                    year_from=2020,
+                    exclude_venues=["AAAI"],
+                    fields=["title", "pdf_url", "publication_time"],
+                    max_bytes=8192,
+                ),
+                light,
+            ),
+            "search_on_venue[rerank]": (
+                lambda i: main.search_on_venue(
+                    "graph learning 0",
+                    20,
+                    rerank=True,
+                    extracted_concepts=[("diffusion model", "sparse attention", "federated privacy")[i % 3]],
+                ),
+                light,
+            ),
+            "multi_search": (
+                lambda i: main.multi_search([f"diffusion model {i}", f"sparse attention {i}"], num_results=50),
+                heavy,
+            ),
+            "search_local": (lambda i: main.search_local(("graph", "diffusion", "privacy")[i % 3], 20), light),
+            "rank_papers": (lambda i: main.rank_papers(venue_papers, min_rank="B"), light),
+            "plan_for_paper_search": (
+                lambda i: call_sync(main.plan_for_paper_search, "recent work on graph diffusion", True),
+                light,
+            ),
+            "sequential_extract_academic_query": (
+                lambda i: call_sync(
+                    main.sequential_extract_academic_query,
+                    "Identify core concepts",
+                    1,
+                    3,
+                    True,
+                    extracted_concepts=["graph", "diffusion"],
+                ),
+                light,
+            ),
+            "download_paper_pdf": (
+                lambda i: main.download_paper_pdf(
+                    f"Suite paper {i}", f"{stub.url}/pdf/fixture/{next(iter(pdfs))}?n={i}"
+                ),
+                heavy,
+            ),
+            "download_papers": (
+                lambda i: main.download_papers(
+                    [
+                        {"title": f"Batch {i} {name}", "pdf_url": f"{stub.url}/pdf/fixture/{name}?n={i}"}
+                        for name in pdfs
+                    ]
+                ),
+                heavy,
+            ),
+            "list_downloaded_papers": (lambda i: main.list_downloaded_papers(), light),
+        }
+        for name in pdfs:
+            path = str(pdf_dir / name)
+            cases[f"read_paper[{name}]"] = (uncached(lambda i, path=path: main.read_paper(path)), heavy)
+            cases[f"read_paper[{name},cached]"] = (lambda i, path=path: main.read_paper(path), light)
+            cases[f"read_paper[{name},pages=1-2]"] = (
+                uncached(lambda i, path=path: main.read_paper(path, pages="1-2")),
+                light,
+            )
+        cases["search_papers_content"] = (
+            lambda i: main.search_papers_content(("attention", "privacy benchmark", "quantum")[i % 3]),
+            light,
+        )
+        llamaparse_cases = {
+            "read_paper[mixed-12p,llamaparse]": (
+                uncached(lambda i: main.read_paper(str(pdf_dir / f"mixed-{i}.pdf"))),
+                heavy,
+            ),
+            "submit_parse": (submit, heavy),
+            "get_parse_result": (lambda i: main.get_parse_result(parse_handles.pop(0), wait_seconds=30), heavy),
+        }
+        cases["get_cache_stats"] = (lambda i: main.get_cache_stats(), light)
+        cases["server_stats"] = (lambda i: main.server_stats(), light)
+
+        async def run_all() -> dict:
+            results = {}
+            for name, (call, repeat) in cases.items():
+                if name == "rank_papers":
+                    venue_papers[:] = await main.search_on_venue("graph learning 0", 100)
+                results[name] = await run_suite_case(call, repeat)
+            await asyncio.gather(*main._paper_index_tasks)
+            os.environ["LLAMAINDEX_API_KEY"] = token
+            try:
+                for name, (call, repeat) in llamaparse_cases.items():
+                    if name == "get_parse_result":
+                        # 先等所有任务完成，只测取结果本身，不受轮询时机影响
+                        await asyncio.gather(*(main.wait_parse_job(handle, 30) for handle in parse_handles))
+                    results[name] = await run_suite_case(call, repeat)
+            finally:
+                del os.environ["LLAMAINDEX_API_KEY"]
+            covered = {name.split("[")[0] for name in results}
+            tools = sorted(tool.name for tool in await main.mcp.list_tools())
+            await main.close_http_clients()
+            main.shutdown_executors()
+            return {
+                "cases": results,
+                "uncovered_tools": [tool for tool in tools if tool not in covered],
+            }
+
+        try:
+            result = asyncio.run(run_all())
+        finally:
+            for db in (main._search_cache_db, main._paper_index_db, main._passage_index_db):
+                if db["conn"] is not None:
+                    db["conn"].close()
+                    db["conn"] = None
+            main._search_cache_memory.clear()
+            for name, value in saved.items():
+                setattr(main, name, value)
+
+    result = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "html_parser": main.HTML_PARSER,
+            "fixtures": args.fixtures or "synthetic",
+            "search_pages": {endpoint: name for endpoint, (name, _) in search_pages.items()},
+            "repeat": args.repeat,
+        },
+        **result,
+    }
+    errors = {name: case["errors"] for name, case in result["cases"].items() if case["errors"]}
+    if args.check and (errors or result["uncovered_tools"]):
+        raise SystemExit(f"suite failed: errors={errors} uncovered={result['uncovered_tools']}")
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        result["comparison"] = compare_to_baseline(result, baseline.get("suite", baseline), args.tolerance)
+        if args.check and result["comparison"]["regressions"]:
+            raise SystemExit(f"regressions against {args.baseline}: {result['comparison']['regressions']}")
+    return result
+
+
+# 启动时不应导入的模块（首次使用时才导入）
+DEFERRED_MODULES = ("pymupdf", "fitz", "bs4", "yaml", "lxml.html", "selectolax.lexbor", "numpy")
+
+
+def stdio_first_tools_list(repo: Path) -> tuple[float, int]:
+    """Spawn `python main.py` like an MCP host and time initialize + tools/list; returns (ms, tool count)."""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=repo,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+
+    def send(message: dict) -> None:
+        process.stdin.write((json.dumps({"jsonrpc": "2.0", **message}) + "\n").encode())
+        process.stdin.flush()
+
+    def receive(request_id: int) -> dict:
+        for line in process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if message.get("id") == request_id:
+                return message
+        raise RuntimeError("server exited before responding")
+
+    try:
+        send(
+            {
+                "id": 1,
+                "method": "initialize",
+                "params": {
+                    "protocolVersion": "2025-03-26",
+                    "capabilities": {},
+                    "clientInfo": {"name": "benchmark", "version": "0"},
+                },
+            }
+        )
+        receive(1)
+        send({"method": "notifications/initialized"})
+        send({"id": 2, "method": "tools/list"})
+        tools = receive(2)["result"]["tools"]
+        elapsed_ms = (time.perf_counter() - start) * 1e3
+    finally:
+        process.stdin.close()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return elapsed_ms, len(tools)
+
+
+def bench_startup(args) -> dict:
+    """
+    Cold start of the stdio server: `python -X importtime -c "import main"` and the
+    time from process spawn to the first tools/list response, checked against
+    --startup-budget-ms with --check.
+    """
+    repo = Path(__file__).resolve().parent
+    profile = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=repo,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = {}
+    for line in profile.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line and "cumulative" not in line:
+            own, cumulative, name = line[len("import time:") :].split("|")
+            imports[name.strip()] = (int(own), int(cumulative))
+    slowest = sorted(
+        ((name, cumulative) for name, (_, cumulative) in imports.items() if "." not in name and name != "main"),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:8]
+
+    samples = []
+    tools = 0
+    for _ in range(args.startup_runs):
+        elapsed_ms, tools = stdio_first_tools_list(repo)
+        samples.append(elapsed_ms)
+    samples.sort()
+
+    result = {
+        "import_main_ms": round(imports["main"][1] / 1000, 1),
+        "main_module_own_ms": round(imports["main"][0] / 1000, 1),
+        "slowest_top_level_imports_ms": {name: round(cumulative / 1000, 1) for name, cumulative in slowest},
+        "deferred_modules_imported_at_startup": [name for name in DEFERRED_MODULES if name in imports],
+        "first_tools_list_ms": {
+            "runs": len(samples),
+            "p50": round(samples[len(samples) // 2], 1),
+            "max": round(samples[-1], 1),
+        },
+        "tools": tools,
+        "budget_ms": args.startup_budget_ms,
+    }
+    result["within_budget"] = result["first_tools_list_ms"]["p50"] <= args.startup_budget_ms
+    if args.check and (not result["within_budget"] or result["deferred_modules_imported_at_startup"]):
+        raise SystemExit(f"startup check failed: {json.dumps(result)}")
+    return result
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def call_http_tool(client: httpx.AsyncClient, url: str, name: str, arguments: dict, client_id: str) -> float:
+    """One stateless streamable-HTTP tools/call; returns the latency in ms."""
+    start = time.perf_counter()
+    response = await client.post(
+        url,
+        json={"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": name, "arguments": arguments}},
+        headers={"accept": "application/json, text/event-stream", main.CLIENT_ID_HEADER: client_id},
+    )
+    response.raise_for_status()
+    if '"isError":true' in response.text.replace(" ", ""):
+        raise RuntimeError(f"{name} failed: {response.text[:200]}")
+    return (time.perf_counter() - start) * 1e3
+
+
+def bench_serve(args) -> dict:
+    """
+    HTTP deployment: latency of a light client's read_paper while another client
+    floods the server with --concurrency whole-document reads, with and without
+    the per-client limit, on --serve-workers worker processes.
+    """
+    repo = Path(__file__).resolve().parent
+    with tempfile.TemporaryDirectory() as tmp:
+        heavy_pdf = Path(tmp) / "heavy.pdf"
+        heavy_pdf.write_bytes(make_pdf(60))
+        light_pdf = Path(tmp) / "light.pdf"
+        light_pdf.write_bytes(make_pdf(2, seed=1))
+
+        async def measure_light(url: str, flood: bool) -> dict:
+            async with httpx.AsyncClient(timeout=300) as client:
+                # 每个工作进程都先完成预热和首次导入
+                await asyncio.sleep(1)
+                for _ in range(4 * args.serve_workers):
+                    await call_http_tool(client, url, "read_paper", {"pdf_path": str(light_pdf), "pages": "1"}, "light")
+                stop = asyncio.Event()
+                heavy_calls = [0]
+
+                async def heavy_worker():
+                    while not stop.is_set():
+                        await call_http_tool(
+                            client, url, "read_paper", {"pdf_path": str(heavy_pdf), "pages": "1-60"}, "heavy"
+                        )
+                        heavy_calls[0] += 1
+
+                workers = [asyncio.create_task(heavy_worker()) for _ in range(args.concurrency if flood else 0)]
+                await asyncio.sleep(0.5 if flood else 0)
+                start = time.perf_counter()
+                samples = []
+                for _ in range(max(args.repeat // 100, 10)):
+                    samples.append(
+                        await call_http_tool(
+                            client, url, "read_paper", {"pdf_path": str(light_pdf), "pages": "1"}, "light"
+                        )
+                    )
+                elapsed = time.perf_counter() - start
+                stop.set()
+                await asyncio.gather(*workers)
+                samples.sort()
+                return {
+                    "light_p50_ms": round(samples[len(samples) // 2], 1),
+                    "light_max_ms": round(samples[-1], 1),
+                    "heavy_calls_per_s": round(heavy_calls[0] / elapsed, 1),
+                }
+
+        def scenario(client_concurrency: int, flood: bool) -> dict:
+            port = free_port()
+            env = {
+                **os.environ,
+                "FASTMCP_STATELESS_HTTP": "true",
+                "SCHOLAI_CLIENT_CONCURRENCY": str(client_concurrency),
+                "SCHOLAI_WARMUP_DELAY": "0",
+            }
+            process = subprocess.Popen(
+                [
+                    sys.executable,
+                    "main.py",
+                    "--transport",
+                    "streamable-http",
+                    "--port",
+                    str(port),
+                    "--workers",
+                    str(args.serve_workers),
+                ],
+                cwd=repo,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                deadline = time.monotonic() + 30
+                while True:
+                    try:
+                        if httpx.get(f"http://127.0.0.1:{port}/metrics").status_code == 200:
+                            break
+                    except httpx.TransportError:
+                        pass
+                    if time.monotonic() > deadline or process.poll() is not None:
+                        raise RuntimeError("HTTP server did not start")
+                    time.sleep(0.1)
+                return asyncio.run(measure_light(f"http://127.0.0.1:{port}/mcp/", flood))
+            finally:
+                process.terminate()
+                process.wait(timeout=60)
+
+        return {
+            "workers": args.serve_workers,
+            "heavy_concurrency": args.concurrency,
+            "idle": scenario(main.CLIENT_CONCURRENCY, flood=False),
+            "flood_unlimited": scenario(0, flood=True),
+            f"flood_client_limit_{main.CLIENT_CONCURRENCY}": scenario(main.CLIENT_CONCURRENCY, flood=True),
+        }
+
+
+BENCHMARKS = {
+    "ccf": bench_ccf,
+    "http": bench_http,
+    "parse": bench_parse,
+    "stream": bench_stream,
+    "concurrency": bench_concurrency,
+    "pdf": bench_pdf,
+    "download": bench_download,
+    "bulk_download": bench_bulk_download,
+    "local_index": bench_local_index,
+    "papers": bench_papers,
+    "passages": bench_passages,
+    "read_slice": bench_read_slice,
+    "llamaparse": bench_llamaparse,
+    "hybrid": bench_hybrid,
+    "coalesce": bench_coalesce,
+    "tracing": bench_tracing,
+    "payload": bench_payload,
+    "rerank": bench_rerank,
+    "suite": bench_suite,
+    "startup": bench_startup,
+    "serve": bench_serve,
+}
+
+
+def run(argv=None) -> dict:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("names", nargs="*", help=f"one of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument(
+        "--handshake-ms",
+        type=float,
+        default=20.0,
+        help="simulated connection setup cost of the stub server",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--download-mib", type=int, default=64)
+    parser.add_argument("--index-papers", type=int, default=100_000)
+    parser.add_argument("--rerank-papers", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--startup-runs", type=int, default=5)
+    parser.add_argument("--serve-workers", type=int, default=1, help="HTTP worker processes for `serve`")
+    parser.add_argument(
+        "--startup-budget-ms",
+        type=float,
+        default=1500.0,
+        help="p50 time from spawn to the first tools/list response allowed by `startup --check`",
+    )
+    parser.add_argument("--fixtures", help="directory of saved papers.cool search pages and PDFs")
+    parser.add_argument(
+        "--record-fixtures",
+        metavar="DIR",
+        help="save live papers.cool pages and arXiv PDFs into DIR for --fixtures, then exit",
+    )
+    parser.add_argument("--record-query", action="append", help="search query to record (repeatable)")
+    parser.add_argument("--record-pdfs", type=int, default=3)
+    parser.add_argument("--baseline", help="suite result JSON to compare against")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the suite result to PATH")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="relative p50/peak memory increase counted as a suite regression",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="exit with an error when an optimized path changes the output",
+    )
+    args = parser.parse_args(argv)
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark: {name}")
+
+    if args.record_fixtures:
+        result = record_fixtures(args)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return result
+
+    results = {}
+    for name in args.names or BENCHMARKS:
+        results[name] = BENCHMARKS[name](args)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    return results
+
+
+if __name__ == "__main__":
+    run()
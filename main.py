@@ -1,590 +1,4571 @@
 from mcp.server.fastmcp import FastMCP
+from mcp.types import TextContent
+import argparse
 import httpx
-import xml.etree.ElementTree as ET
 import json
-import yaml
+import math
 import re
-import fitz
+import sys
+import hashlib
+import importlib
+import pickle
+import time
 from pathlib import Path
-from bs4 import BeautifulSoup
 import os
 import asyncio
+import base64
+import bisect
+import codecs
+import contextvars
+import copy
+import functools
+import importlib.util
+import inspect
+import itertools
+import mmap
+import multiprocessing
+import socket
+import sqlite3
+import string
+import threading
+import weakref
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from operator import attrgetter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from html.parser import HTMLParser
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
 
-mcp = FastMCP("ScholAI MCP Server", version="0.0.1")
+try:
+    import fcntl
+except ImportError:  # Windows：跨进程文件锁退化为空操作
+    fcntl = None
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported on first attribute access.
+
+    MCP hosts start a fresh stdio process per session, and many sessions never
+    read a PDF or parse HTML, so PyMuPDF, BeautifulSoup, PyYAML and the optional
+    parser backends are not imported at startup.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, name: str):
+        return getattr(self.load(), name)
+
+    def __repr__(self) -> str:
+        return f"<LazyModule {self._name!r} ({'loaded' if self.loaded else 'not loaded'})>"
+
+
+# pymupdf 与旧的 fitz 接口相同，但导入 fitz 会向 stdout（stdio 协议通道）打印弃用警告
+fitz = LazyModule("pymupdf")
+bs4 = LazyModule("bs4")
+yaml = LazyModule("yaml")
+# 可选的 HTML 解析后端，只检查是否安装，不在启动时导入
+lexbor = LazyModule("selectolax.lexbor") if importlib.util.find_spec("selectolax") else None
+lxml_html = LazyModule("lxml.html") if importlib.util.find_spec("lxml") else None
+# 可选：安装 numpy 时相关性重排使用向量化计算，否则使用纯 Python 实现
+numpy = LazyModule("numpy") if importlib.util.find_spec("numpy") else None
 
 proxies = None
 
+PAPERS_COOL_URL = os.getenv("PAPERS_COOL_URL", "https://papers.cool")
+LLAMAPARSE_API_URL = os.getenv("LLAMAPARSE_API_URL", "https://api.cloud.llamaindex.ai")
+
+# 每个上游主机的超时时间（秒），未列出的主机（如 PDF 下载）使用默认值
+HTTP_TIMEOUTS = {
+    httpx.URL(PAPERS_COOL_URL).host: 30.0,
+    httpx.URL(LLAMAPARSE_API_URL).host: 60.0,
+}
+HTTP_DEFAULT_TIMEOUT = 60.0
+HTTP_UPLOAD_TIMEOUT = 600.0
+HTTP_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("SCHOLAI_HTTP_MAX_CONNECTIONS", "20")),
+    max_keepalive_connections=int(os.getenv("SCHOLAI_HTTP_MAX_KEEPALIVE", "10")),
+    keepalive_expiry=float(os.getenv("SCHOLAI_HTTP_KEEPALIVE_EXPIRY", "30")),
+)
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+
+_http_clients: dict[str, tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+
+
+def _retire_http_client(loop: asyncio.AbstractEventLoop, client: httpx.AsyncClient) -> None:
+    """
+    Release the connection pool of a client created on another event loop.
+
+    Its connections can only be closed by that loop: aclose() is scheduled there
+    while it still runs. Once it has stopped (e.g. after asyncio.run returned)
+    aclose() would fail with "Event loop is closed", so the pooled sockets are
+    closed directly instead.
+    """
+    if loop.is_running() and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        return
+    pool = getattr(client._transport, "_pool", None)
+    for connection in list(getattr(pool, "connections", ())):
+        # AsyncHTTPConnection -> HTTP/1.1 或 HTTP/2 连接 -> 网络流
+        stream = getattr(getattr(connection, "_connection", None), "_network_stream", None)
+        sock = stream.get_extra_info("socket") if stream is not None else None
+        if sock is not None:
+            # asyncio 的 TransportSocket 不允许 close()，关闭其包装的套接字
+            getattr(sock, "_sock", sock).close()
+
+
+def get_http_client(url: str) -> httpx.AsyncClient:
+    """
+    Return the pooled client for the host of `url`, creating it on first use.
+
+    Hosts listed in HTTP_TIMEOUTS get a dedicated client; every other host
+    (e.g. arbitrary PDF servers) shares one default client, so the number of
+    clients stays bounded. Clients live for the whole server lifetime so that
+    keep-alive connections (and their TLS sessions) are reused across tool calls.
+    """
+    host = httpx.URL(url).host
+    if host not in HTTP_TIMEOUTS:
+        host = ""
+    loop = asyncio.get_running_loop()
+    entry = _http_clients.get(host)
+    if entry is None or entry[0] is not loop or entry[1].is_closed:
+        if entry is not None and not entry[1].is_closed:
+            _retire_http_client(*entry)
+        client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUTS.get(host, HTTP_DEFAULT_TIMEOUT),
+            limits=HTTP_LIMITS,
+            http2=HTTP2_ENABLED,
+            proxy=proxies,
+        )
+        entry = _http_clients[host] = (loop, client)
+    return entry[1]
+
+
+async def close_http_clients() -> None:
+    clients = [client for _, client in _http_clients.values()]
+    _http_clients.clear()
+    await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+
+
+# 线程池用于轻量的阻塞操作（SQLite、文件读写），进程池用于 PDF 文本提取和大页面解析
+THREAD_POOL_WORKERS = int(os.getenv("SCHOLAI_THREAD_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+# 设为 0 时所有 CPU 密集型任务都在线程池中执行
+PROCESS_POOL_WORKERS = int(os.getenv("SCHOLAI_PROCESS_WORKERS", str(os.cpu_count() or 1)))
+# 超过该大小的 HTML 页面交给进程池解析
+PROCESS_HTML_MIN_BYTES = int(os.getenv("SCHOLAI_PROCESS_HTML_MIN_BYTES", str(2**20)))
+
+_executors: dict[str, Executor | None] = {"thread": None, "process": None}
+
+
+def _get_executor(kind: str) -> Executor:
+    executor = _executors[kind]
+    if executor is None:
+        if kind == "thread":
+            executor = ThreadPoolExecutor(THREAD_POOL_WORKERS, thread_name_prefix="scholai")
+        else:
+            executor = ProcessPoolExecutor(
+                PROCESS_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        _executors[kind] = executor
+    return executor
+
+
+async def run_in_thread(func, *args, **kwargs):
+    """Run a blocking call in the shared thread pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor("thread"), functools.partial(func, *args, **kwargs)
+    )
+
+
+async def run_in_process(func, *args):
+    """
+    Run a CPU-bound call in the shared process pool.
+
+    `func` and its arguments must be picklable (module-level functions only).
+    Falls back to the thread pool when SCHOLAI_PROCESS_WORKERS is 0.
+    """
+    if PROCESS_POOL_WORKERS <= 0:
+        return await run_in_thread(func, *args)
+
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_executor("process"), func, *args)
+    except BrokenProcessPool:
+        # 工作进程崩溃（例如损坏的 PDF 导致 PyMuPDF 崩溃）后重建进程池
+        _executors["process"] = None
+        raise
+
+
+# 相同参数的并发调用共享同一个进行中的任务（single-flight），键为 (namespace, 规范化参数)
+_in_flight: dict[tuple[str, object], asyncio.Task] = {}
+_single_flight_stats: dict[str, dict[str, int]] = {}
+# 有多个调用方的任务；这些调用方各自拿到结果的浅拷贝
+_coalesced_tasks: weakref.WeakSet[asyncio.Task] = weakref.WeakSet()
+# 任务 -> (发起方的追踪, 任务自己的追踪)
+_flight_traces: weakref.WeakKeyDictionary[asyncio.Task, tuple[dict, dict]] = weakref.WeakKeyDictionary()
+
+
+def in_flight(namespace: str, key) -> asyncio.Task | None:
+    task = _in_flight.get((namespace, key))
+    return None if task is None or task.done() else task
+
+
+def _merge_trace(trace: dict, flight_trace: dict) -> None:
+    for name, ms in flight_trace["stages"].items():
+        trace["stages"][name] = trace["stages"].get(name, 0.0) + ms
+    for name, value in flight_trace["marks"].items():
+        trace["marks"][name] = trace["marks"].get(name, 0) + value
+
+
+def single_flight_task(namespace: str, key, factory) -> asyncio.Task:
+    """
+    Return the running task for (namespace, key), or start factory() as a new one.
+
+    Exceptions are consumed when nobody awaits the task, so it can also be used
+    for fire-and-forget work such as background revalidation.
+    """
+    stats = _single_flight_stats.setdefault(namespace, {"calls": 0, "coalesced": 0})
+    stats["calls"] += 1
+    flight_key = (namespace, key)
+    task = in_flight(namespace, key)
+    if task is not None and task.get_loop() is asyncio.get_running_loop():
+        stats["coalesced"] += 1
+        _coalesced_tasks.add(task)
+        return task
+
+    # 任务在自己的追踪里计时，不写入发起方的追踪：发起方可能已被取消并结束了追踪
+    trace = _current_trace.get()
+    flight_trace = None if trace is None else {"tool": trace["tool"], "stages": {}, "marks": {}}
+    context = contextvars.copy_context()
+    context.run(_current_trace.set, flight_trace)
+    task = asyncio.get_running_loop().create_task(factory(), context=context)
+    if flight_trace is not None:
+        _flight_traces[task] = (trace, flight_trace)
+    _in_flight[flight_key] = task
+
+    def _done(finished: asyncio.Task) -> None:
+        if _in_flight.get(flight_key) is finished:
+            del _in_flight[flight_key]
+        if not finished.cancelled():
+            finished.exception()
+
+    task.add_done_callback(_done)
+    return task
+
+
+async def single_flight(namespace: str, key, factory):
+    """
+    Await factory() once for all concurrent callers with the same key.
+
+    The shared task is shielded, so a caller that is cancelled does not cancel
+    the work for the others. When several callers shared the task, each one
+    gets its own shallow copy of the result, so one caller reordering or
+    extending a list does not change what the others see.
+    """
+    task = single_flight_task(namespace, key, factory)
+    result = await asyncio.shield(task)
+    traces = _flight_traces.get(task)
+    if traces is not None and traces[0] is _current_trace.get():
+        # 发起方把任务的阶段耗时和计数并入自己的追踪记录
+        del _flight_traces[task]
+        _merge_trace(*traces)
+    return copy.copy(result) if task in _coalesced_tasks else result
+
+
+def single_flight_info() -> dict:
+    return {
+        namespace: {
+            **stats,
+            "in_flight": sum(1 for (name, _), task in _in_flight.items() if name == namespace and not task.done()),
+        }
+        for namespace, stats in _single_flight_stats.items()
+    }
+
+
+def shutdown_executors() -> None:
+    for kind, executor in _executors.items():
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors[kind] = None
+
+
+@contextmanager
+def file_lock(path: Path):
+    """
+    Hold an exclusive advisory lock on `path` (created if missing).
+
+    The lock is shared by every process on the host, so worker processes of an
+    HTTP deployment can update files in ./data and the caches safely. It also
+    excludes other threads of this process. A no-op where fcntl is unavailable.
+    """
+    if fcntl is None:
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@asynccontextmanager
+async def file_lock_async(path: Path, poll_interval: float = 0.05):
+    """file_lock for coroutines: waits by polling instead of blocking a pool thread."""
+    if fcntl is None:
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        while True:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                await asyncio.sleep(poll_interval)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+# 启动后等待多少秒再在后台预热延迟导入的模块，小于 0 表示不预热
+WARMUP_DELAY = float(os.getenv("SCHOLAI_WARMUP_DELAY", "1"))
+
+
+def warm_up() -> None:
+    """Import the deferred modules and load the CCF index before a tool needs them."""
+    fitz.load()
+    yaml.load()
+    html_module = {"bs4": bs4, "selectolax": lexbor, "lxml": lxml_html}.get(html_parser_backend())
+    if html_module is not None:
+        html_module.load()
+    if numpy is not None:
+        numpy.load()
+    _refresh_ccf_index()
+
+
+async def _warm_up_later(delay: float) -> None:
+    # 延迟到握手和 tools/list 之后，避免与首个请求争抢 GIL
+    await asyncio.sleep(delay)
+    try:
+        await run_in_thread(warm_up)
+    except Exception:
+        # 预热失败不影响服务，真正调用时会报告错误
+        pass
+
+
+# HTTP 传输下由 create_app() 设置，共享资源随应用而不是随 MCP 会话创建和释放
+_http_app = {"transport": None}
+
+
+@asynccontextmanager
+async def shared_resources():
+    """Open the pooled HTTP client and schedule the warm-up; close clients and worker pools on exit."""
+    get_http_client(PAPERS_COOL_URL)
+    warm_up_task = asyncio.ensure_future(_warm_up_later(WARMUP_DELAY)) if WARMUP_DELAY >= 0 else None
+    try:
+        yield
+    finally:
+        if warm_up_task is not None:
+            warm_up_task.cancel()
+        await close_http_clients()
+        shutdown_executors()
+
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP):
+    # HTTP 传输下每个会话（无状态模式下每个请求）都会进入 lifespan，不能在这里关闭共享资源
+    if _http_app["transport"] is not None:
+        yield {}
+        return
+    async with shared_resources():
+        yield {}
+
+
+def _content_bytes(content) -> int | None:
+    """
+    UTF-8 size of the text blocks returned by FastMCP.call_tool: a sequence of
+    content blocks (mcp 1.9), or (content blocks, structured output) in later
+    releases. None for shapes whose size is not known without serializing again.
+    """
+    if isinstance(content, tuple) and len(content) == 2 and isinstance(content[1], dict):
+        content = content[0]
+    if not isinstance(content, (list, tuple)):
+        return None
+    return sum(len(item.text.encode("utf-8")) for item in content if isinstance(item, TextContent))
+
+
+class TracedFastMCP(FastMCP):
+    """
+    FastMCP that finishes tool traces after the result has been serialized.
+
+    The serialize stage and response_bytes then describe the payload FastMCP
+    actually sends, without serializing the result a second time.
+    """
+
+    async def call_tool(self, name: str, arguments: dict):
+        if not METRICS_ENABLED:
+            return await super().call_tool(name, arguments)
+        pending = {}
+        token = _pending_trace.set(pending)
+        content = None
+        try:
+            content = await super().call_tool(name, arguments)
+            return content
+        finally:
+            _pending_trace.reset(token)
+            if "trace" in pending:
+                end = time.perf_counter()
+                response_bytes = None if content is None else _content_bytes(content)
+                _finish_trace(
+                    pending["trace"],
+                    pending["start"],
+                    pending["error"],
+                    end=end,
+                    serialize_ms=(end - pending["returned"]) * 1e3 if content is not None else None,
+                    response_bytes=response_bytes,
+                )
+
+
+mcp = TracedFastMCP("ScholAI MCP Server", version="0.0.1", lifespan=server_lifespan)
+
+
+# 关闭后 traced_tool 直接返回原函数，stage()/mark() 为空操作
+METRICS_ENABLED = os.getenv("SCHOLAI_METRICS", "1") != "0"
+# 设置后每次工具调用向该文件追加一行 JSON 记录
+TRACE_FILE = os.getenv("SCHOLAI_TRACE_FILE")
+# 直方图桶上界（毫秒）
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+_metrics = {
+    "started_at": time.time(),
+    "histograms": {},  # (tool, stage) -> {"buckets": [...], "count", "sum", "min", "max"}
+    "counters": {},  # (tool, name) -> value
+    "calls": {},  # tool -> {"calls": n, "errors": n}
+}
+_metrics_lock = threading.Lock()
+_current_trace: contextvars.ContextVar[dict | None] = contextvars.ContextVar(
+    "scholai_trace", default=None
+)
+# TracedFastMCP.call_tool 放入的槽位：最外层的 traced_tool 把追踪交给它，在序列化之后结束
+_pending_trace: contextvars.ContextVar[dict | None] = contextvars.ContextVar(
+    "scholai_pending_trace", default=None
+)
+_trace_file = {"handle": None, "lock": threading.Lock()}
+_NULL_STAGE = nullcontext()
+
+
+def _observe_locked(tool: str, stage_name: str, elapsed_ms: float) -> None:
+    histogram = _metrics["histograms"].get((tool, stage_name))
+    if histogram is None:
+        histogram = _metrics["histograms"][(tool, stage_name)] = {
+            "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+            "count": 0,
+            "sum": 0.0,
+            "min": elapsed_ms,
+            "max": elapsed_ms,
+        }
+    histogram["buckets"][bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+    histogram["count"] += 1
+    histogram["sum"] += elapsed_ms
+    if elapsed_ms < histogram["min"]:
+        histogram["min"] = elapsed_ms
+    if elapsed_ms > histogram["max"]:
+        histogram["max"] = elapsed_ms
+
+
+def _observe(tool: str, stage_name: str, elapsed_ms: float) -> None:
+    with _metrics_lock:
+        _observe_locked(tool, stage_name, elapsed_ms)
+
+
+@contextmanager
+def _timed_stage(trace: dict, stage_name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1e3
+        trace["stages"][stage_name] = trace["stages"].get(stage_name, 0.0) + elapsed_ms
+        _observe(trace["tool"], stage_name, elapsed_ms)
+
+
+def stage(stage_name: str):
+    """Time a block as one stage of the current tool call (no-op outside a traced call)."""
+    trace = _current_trace.get() if METRICS_ENABLED else None
+    if trace is None:
+        return _NULL_STAGE
+    return _timed_stage(trace, stage_name)
+
+
+def mark(name: str, value: float = 1) -> None:
+    """Add to a per-tool counter (bytes, cache hits, ...) and to the current trace."""
+    trace = _current_trace.get() if METRICS_ENABLED else None
+    if trace is None:
+        return
+    trace["marks"][name] = trace["marks"].get(name, 0) + value
+    with _metrics_lock:
+        key = (trace["tool"], name)
+        _metrics["counters"][key] = _metrics["counters"].get(key, 0) + value
+
+
+def _result_error(result) -> str | None:
+    """The error message of a tool result, following the repo's error conventions."""
+    if isinstance(result, str):
+        return result if result.startswith("Error") else None
+    if isinstance(result, dict):
+        return result.get("error")
+    if isinstance(result, list) and len(result) == 1:
+        return _result_error(result[0])
+    return None
+
+
+def _write_trace(record: dict) -> None:
+    with _trace_file["lock"]:
+        if _trace_file["handle"] is None:
+            _trace_file["handle"] = open(TRACE_FILE, "a", encoding="utf-8", buffering=1)
+        _trace_file["handle"].write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _finish_trace(
+    trace: dict,
+    start: float,
+    error: str | None,
+    end: float | None = None,
+    serialize_ms: float | None = None,
+    response_bytes: int | None = None,
+) -> None:
+    """
+    Record a finished tool call. serialize_ms and response_bytes are only known
+    when the call came through TracedFastMCP.call_tool; direct calls omit them.
+    """
+    end = time.perf_counter() if end is None else end
+    elapsed_ms = (end - start) * 1e3
+    tool = trace["tool"]
+    if serialize_ms is not None:
+        trace["stages"]["serialize"] = serialize_ms
+    if response_bytes is not None:
+        trace["marks"]["response_bytes"] = response_bytes
+    # 一次加锁完成全部更新，保持每次调用的开销稳定
+    with _metrics_lock:
+        if serialize_ms is not None:
+            _observe_locked(tool, "serialize", serialize_ms)
+        _observe_locked(tool, "total", elapsed_ms)
+        calls = _metrics["calls"].get(tool)
+        if calls is None:
+            calls = _metrics["calls"][tool] = {"calls": 0, "errors": 0}
+        calls["calls"] += 1
+        calls["errors"] += error is not None
+        if response_bytes is not None:
+            key = (tool, "response_bytes")
+            _metrics["counters"][key] = _metrics["counters"].get(key, 0) + response_bytes
+    if TRACE_FILE:
+        _write_trace(
+            {
+                "ts": round(time.time(), 3),
+                "tool": trace["tool"],
+                "ms": round(elapsed_ms, 3),
+                "status": "error" if error else "ok",
+                "error": error[:500] if error else None,
+                "stages": {name: round(ms, 3) for name, ms in trace["stages"].items()},
+                "marks": trace["marks"],
+            }
+        )
+
+
+def _end_tool_trace(trace: dict, start: float, error: str | None) -> None:
+    pending = _pending_trace.get()
+    # 只有最外层的工具调用交给 call_tool，在 FastMCP 序列化结果之后再结束
+    if pending is not None and "trace" not in pending and _current_trace.get() is None:
+        pending.update(trace=trace, start=start, error=error, returned=time.perf_counter())
+    else:
+        _finish_trace(trace, start, error)
+
+
+def traced_tool(func):
+    """
+    Record total latency, per-stage timings, response size and errors of a tool.
+
+    Calls dispatched by FastMCP are finished in TracedFastMCP.call_tool, after
+    the result has been serialized.
+
+    Place it directly under @mcp.tool; the wrapper keeps the signature FastMCP
+    inspects. Returns func unchanged when SCHOLAI_METRICS=0.
+    """
+    if not METRICS_ENABLED:
+        return func
+    tool = func.__name__
+
+    def begin():
+        trace = {"tool": tool, "stages": {}, "marks": {}}
+        return trace, _current_trace.set(trace), time.perf_counter()
+
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            trace, token, start = begin()
+            result, error = None, None
+            try:
+                result = await func(*args, **kwargs)
+                error = _result_error(result)
+                return result
+            except BaseException as e:
+                error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                _current_trace.reset(token)
+                _end_tool_trace(trace, start, error)
+
+    else:
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            trace, token, start = begin()
+            result, error = None, None
+            try:
+                result = func(*args, **kwargs)
+                error = _result_error(result)
+                return result
+            except BaseException as e:
+                error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                _current_trace.reset(token)
+                _end_tool_trace(trace, start, error)
+
+    return wrapper
+
+
+# HTTP 传输下每个客户端在每个工作进程中同时执行的重型工具调用数，0 表示不限制
+CLIENT_CONCURRENCY = int(os.getenv("SCHOLAI_CLIENT_CONCURRENCY", "2"))
+# 用于区分客户端的请求头，缺省时按客户端 IP 区分
+CLIENT_ID_HEADER = os.getenv("SCHOLAI_CLIENT_ID_HEADER", "x-client-id")
+
+# client -> (loop, semaphore, [持有或等待的调用数])，计数归零时删除
+_client_slots: dict[str, tuple[asyncio.AbstractEventLoop, asyncio.Semaphore, list[int]]] = {}
+
+
+def current_client_id() -> str | None:
+    """Identify the HTTP client of the running tool call; None under stdio."""
+    try:
+        request = mcp.get_context().request_context.request
+    except (LookupError, ValueError):
+        return None
+    if request is None:
+        return None
+    client_id = request.headers.get(CLIENT_ID_HEADER)
+    if client_id:
+        return client_id
+    return request.client.host if request.client else None
+
+
+@asynccontextmanager
+async def client_slot():
+    """Hold one of the calling client's slots so a single client cannot occupy every worker."""
+    client = current_client_id()
+    if client is None or CLIENT_CONCURRENCY <= 0:
+        yield
+        return
+    loop = asyncio.get_running_loop()
+    entry = _client_slots.get(client)
+    if entry is None or entry[0] is not loop:
+        entry = _client_slots[client] = (loop, asyncio.Semaphore(CLIENT_CONCURRENCY), [0])
+    _, semaphore, users = entry
+
+    users[0] += 1
+    try:
+        with stage("client_queue"):
+            await semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
+    finally:
+        users[0] -= 1
+        if not users[0] and _client_slots.get(client) is entry:
+            del _client_slots[client]
+
+
+def client_limited(func):
+    """
+    Run a heavy tool inside the caller's client slot (see client_slot).
+
+    Place it under @traced_tool so time spent queueing shows up as the
+    `client_queue` stage.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        async with client_slot():
+            return await func(*args, **kwargs)
+
+    return wrapper
+
+
+def _histogram_quantile(histogram: dict, quantile: float) -> float:
+    """
+    Estimate a quantile by linear interpolation inside the histogram bucket,
+    clamped to the observed min/max so sparse histograms stay plausible.
+    """
+    rank = quantile * histogram["count"]
+    seen = 0
+    lower = 0.0
+    estimate = histogram["max"]
+    for upper, count in zip((*LATENCY_BUCKETS_MS, float("inf")), histogram["buckets"]):
+        if count and seen + count >= rank:
+            if upper != float("inf"):
+                estimate = lower + (upper - lower) * (rank - seen) / count
+            break
+        seen += count
+        lower = upper
+    return min(max(estimate, histogram["min"]), histogram["max"])
+
+
+def metrics_snapshot() -> dict:
+    with _metrics_lock:
+        histograms = {key: {**h, "buckets": list(h["buckets"])} for key, h in _metrics["histograms"].items()}
+        counters = dict(_metrics["counters"])
+        calls = {tool: dict(c) for tool, c in _metrics["calls"].items()}
+
+    tools = {}
+    for (tool, stage_name), histogram in sorted(histograms.items()):
+        summary = {
+            "count": histogram["count"],
+            "mean_ms": round(histogram["sum"] / histogram["count"], 3),
+            "p50_ms": round(_histogram_quantile(histogram, 0.5), 3),
+            "p95_ms": round(_histogram_quantile(histogram, 0.95), 3),
+        }
+        entry = tools.setdefault(tool, {**calls.get(tool, {"calls": 0, "errors": 0}), "stages": {}, "counters": {}})
+        if stage_name == "total":
+            entry.update({k: v for k, v in summary.items() if k != "count"})
+        else:
+            entry["stages"][stage_name] = summary
+    for (tool, name), value in sorted(counters.items()):
+        tools.setdefault(tool, {**calls.get(tool, {"calls": 0, "errors": 0}), "stages": {}, "counters": {}})
+        tools[tool]["counters"][name] = value
+    return {
+        "enabled": METRICS_ENABLED,
+        "uptime_s": round(time.time() - _metrics["started_at"], 1),
+        "trace_file": TRACE_FILE,
+        "tools": tools,
+    }
+
+
+def prometheus_metrics() -> str:
+    """Render the in-memory metrics in the Prometheus text exposition format."""
+    with _metrics_lock:
+        histograms = sorted(_metrics["histograms"].items())
+        counters = sorted(_metrics["counters"].items())
+        calls = sorted(_metrics["calls"].items())
+
+    lines = [
+        "# HELP scholai_tool_calls_total Tool calls by outcome.",
+        "# TYPE scholai_tool_calls_total counter",
+    ]
+    for tool, c in calls:
+        lines.append(f'scholai_tool_calls_total{{tool="{tool}",status="ok"}} {c["calls"] - c["errors"]}')
+        lines.append(f'scholai_tool_calls_total{{tool="{tool}",status="error"}} {c["errors"]}')
+    lines += [
+        "# HELP scholai_stage_duration_ms Latency of tool calls and their stages.",
+        "# TYPE scholai_stage_duration_ms histogram",
+    ]
+    for (tool, stage_name), histogram in histograms:
+        labels = f'tool="{tool}",stage="{stage_name}"'
+        cumulative = 0
+        for upper, count in zip((*LATENCY_BUCKETS_MS, "+Inf"), histogram["buckets"]):
+            cumulative += count
+            lines.append(f'scholai_stage_duration_ms_bucket{{{labels},le="{upper}"}} {cumulative}')
+        lines.append(f"scholai_stage_duration_ms_sum{{{labels}}} {histogram['sum']:.3f}")
+        lines.append(f"scholai_stage_duration_ms_count{{{labels}}} {histogram['count']}")
+    lines += [
+        "# HELP scholai_tool_counter Per-tool counters such as bytes and cache hits.",
+        "# TYPE scholai_tool_counter counter",
+    ]
+    for (tool, name), value in counters:
+        lines.append(f'scholai_tool_counter{{tool="{tool}",name="{name}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request) -> Response:
+    """Prometheus scrape endpoint, served with the SSE and streamable HTTP transports."""
+    return PlainTextResponse(prometheus_metrics(), media_type="text/plain; version=0.0.4")
+
+
+HTML_PARSER = os.getenv("SCHOLAI_HTML_PARSER", "auto")
+
+_TOGGLE_PDF_RE = re.compile(r"togglePdf\('[^']*',\s*'([^']+)',")
+_WRAPPED_PDF_URL_RE = re.compile(r"url=([^&]+)")
+_SUBJECT_YEAR_RE = re.compile(r"\.(\d{4})")
+_AUTHORS_ID_RE = re.compile(r"^authors-")
+# 会隐式结束未闭合 <p> 的块级元素（HTML 规范），lxml / selectolax 会自动处理，
+# html.parser 不会，bs4 与流式后端据此保持一致
+_P_CLOSING_TAGS = frozenset(
+    "address article aside blockquote details dialog div dl fieldset figcaption figure footer "
+    "form h1 h2 h3 h4 h5 h6 header hgroup hr main menu nav ol p pre section table ul".split()
+)
+
+
+def _class_matches(class_attr: str | None, target: str) -> bool:
+    """与 BeautifulSoup 的 class_ 匹配规则一致：匹配单个类名，或完整的类名字符串"""
+    if not class_attr:
+        return False
+    classes = class_attr.split()
+    return target in classes or " ".join(classes) == target
+
+
+_PUBLISH_DATE_RE = re.compile(r"((?:19|20)\d{2})-(\d{2})-(\d{2})(?:[ T](\d{2}):(\d{2})(?::(\d{2}))?)?")
+_YEAR_RE = re.compile(r"(?:19|20)\d{2}")
+
+
+def publication_sort_key(publication_time: str | int | None) -> int:
+    """
+    Normalize an arXiv publish date string or a venue year to one sortable integer
+    (YYYYMMDDhhmmss; 0 when unknown). A bare year gets month and day 00, so it
+    sorts before every full date of the same year.
+    """
+    if publication_time is None:
+        return 0
+    if isinstance(publication_time, int):
+        return publication_time * 10**10
+    match = _PUBLISH_DATE_RE.search(publication_time)
+    if match:
+        return int("".join(part or "00" for part in match.groups()))
+    match = _YEAR_RE.search(publication_time)
+    return int(match.group(0)) * 10**10 if match else 0
+
+
+@dataclass(slots=True)
+class Paper:
+    """
+    One search result. Fields that were not found on the page stay None and are
+    left out of `to_dict`, which produces the JSON shape the search tools return.
+    """
+
+    title: str | None = None
+    pdf_url: str | None = None
+    first_author: str | None = None
+    abstract: str | None = None
+    # 会议论文的 venue 名称（如 "ICML.2024"）大量重复，统一驻留
+    subjects: tuple[str, ...] | None = None
+    # arXiv 为发布时间字符串，会议论文为年份
+    publication_time: str | int | None = None
+    # search_local 结果的来源（"arxiv" / "venue"）
+    source: str | None = None
+    sort_key: int | None = None
+
+    def __post_init__(self):
+        if self.subjects is not None:
+            self.subjects = tuple(map(sys.intern, self.subjects))
+        if self.sort_key is None:
+            self.sort_key = publication_sort_key(self.publication_time)
+
+    def __reduce__(self):
+        # 从进程池传回时经 __post_init__ 重新驻留 subjects，且不必再次解析日期
+        return (
+            Paper,
+            (
+                self.title,
+                self.pdf_url,
+                self.first_author,
+                self.abstract,
+                self.subjects,
+                self.publication_time,
+                self.source,
+                self.sort_key,
+            ),
+        )
+
+    @property
+    def year(self) -> int | None:
+        return self.sort_key // 10**10 or None
+
+    def to_dict(self) -> dict:
+        paper = {}
+        if self.title is not None:
+            paper["title"] = self.title
+        if self.pdf_url is not None:
+            paper["pdf_url"] = self.pdf_url
+        if self.first_author is not None:
+            paper["first_author"] = self.first_author
+        if self.abstract is not None:
+            paper["abstract"] = self.abstract
+        if self.subjects is not None:
+            paper["subjects"] = list(self.subjects)
+        if self.publication_time is not None:
+            paper["publication_time"] = self.publication_time
+        if self.source is not None:
+            paper["source"] = self.source
+        return paper
+
+    @classmethod
+    def from_dict(cls, paper: dict) -> "Paper":
+        return cls(
+            paper.get("title"),
+            paper.get("pdf_url"),
+            paper.get("first_author"),
+            paper.get("abstract"),
+            paper.get("subjects"),
+            paper.get("publication_time"),
+            paper.get("source"),
+        )
+
+
+_PAPER_SORT_KEY = attrgetter("sort_key")
+
+
+def papers_to_dicts(papers: list) -> list[dict]:
+    """Convert Paper records to the tool JSON shape; error dicts pass through unchanged."""
+    return [paper.to_dict() if isinstance(paper, Paper) else paper for paper in papers]
+
+
+# fields 投影可选的字段（ccf_rank 仅在标注了 CCF 等级时存在，relevance 仅在重排时存在）
+PAPER_FIELDS = (
+    "title",
+    "pdf_url",
+    "first_author",
+    "abstract",
+    "subjects",
+    "publication_time",
+    "source",
+    "ccf_rank",
+    "relevance",
+)
+
+
+def filter_papers(
+    papers: list,
+    year_from: int = None,
+    year_to: int = None,
+    subjects: list[str] = None,
+    exclude_subjects: list[str] = None,
+    venues: list[str] = None,
+    exclude_venues: list[str] = None,
+) -> list:
+    """
+    Keep the Paper records that pass every given filter; papers without a known
+    year fail year filters and papers without subjects fail include filters.
+
+    Subjects match whole tags ("ICML.2024", "Oral") and venues match the tag
+    before the year ("ICML"), both case-insensitively.
+    """
+    subjects = {subject.casefold() for subject in subjects} if subjects else None
+    exclude_subjects = {subject.casefold() for subject in exclude_subjects or ()}
+    venues = {venue.casefold() for venue in venues} if venues else None
+    exclude_venues = {venue.casefold() for venue in exclude_venues or ()}
+    # sort_key 以 YYYYMMDDhhmmss 存储，年份范围直接换算为整数区间
+    low = year_from * 10**10 if year_from else 1
+    high = (year_to + 1) * 10**10 if year_to else None
+
+    kept = []
+    for paper in papers:
+        if (year_from or year_to) and not (low <= paper.sort_key and (high is None or paper.sort_key < high)):
+            continue
+        if subjects or exclude_subjects or venues or exclude_venues:
+            tags = [tag.casefold() for tag in paper.subjects or ()]
+            names = {tag.split(".", 1)[0] for tag in tags}
+            if subjects is not None and subjects.isdisjoint(tags):
+                continue
+            if venues is not None and venues.isdisjoint(names):
+                continue
+            if not exclude_subjects.isdisjoint(tags) or not exclude_venues.isdisjoint(names):
+                continue
+        kept.append(paper)
+    return kept
+
+
+def shape_papers(
+    papers: list, fields: list[str] = None, abstract_chars: int = None, max_bytes: int = None
+) -> list[dict]:
+    """
+    Convert papers to the tool JSON shape keeping only `fields`, cutting abstracts
+    to `abstract_chars` characters, and stopping before the compact JSON of the
+    papers exceeds `max_bytes`. Dropped papers are reported by a final
+    {"omitted": n} entry; error dicts pass through unchanged.
+    """
+    shaped = []
+    used = 0
+    for position, paper in enumerate(papers):
+        if isinstance(paper, Paper):
+            paper = paper.to_dict()
+        elif "error" in paper:
+            shaped.append(paper)
+            continue
+        if fields is not None:
+            paper = {field: paper[field] for field in fields if field in paper}
+        abstract = paper.get("abstract")
+        if abstract_chars is not None and abstract and len(abstract) > abstract_chars:
+            paper["abstract"] = abstract[:abstract_chars].rstrip() + "…"
+        if max_bytes is not None:
+            used += len(json.dumps(paper, ensure_ascii=False).encode("utf-8"))
+            if used > max_bytes:
+                shaped.append({"omitted": len(papers) - position})
+                break
+        shaped.append(paper)
+    return shaped
+
+
+def _search_filter_error(
+    year_from: int, year_to: int, fields: list[str], abstract_chars: int, max_bytes: int
+) -> str | None:
+    if year_from and year_to and year_from > year_to:
+        return "year_from must not be later than year_to"
+    if fields is not None:
+        unknown = [field for field in fields if field not in PAPER_FIELDS]
+        if unknown or not fields:
+            return f"fields must be a non-empty list of {', '.join(PAPER_FIELDS)}"
+    if abstract_chars is not None and abstract_chars <= 0:
+        return "abstract_chars must be positive"
+    if max_bytes is not None and max_bytes <= 0:
+        return "max_bytes must be positive"
+    return None
+
+
+def _build_paper_info(
+    venue: bool,
+    title: str | None,
+    onclick: str | None,
+    has_authors: bool,
+    first_author: str | None,
+    authors_text: str | None,
+    abstract: str | None,
+    date_text: str | None,
+    subjects: list[str] | None,
+) -> Paper:
+    """
+    由各解析后端提取出的原始字段构建论文信息，保证所有后端输出完全一致。
+    None 表示对应的元素不存在。
+    """
+    pdf_url = None
+    if onclick is not None:
+        # 方法1: 处理新格式 - 直接URL (如arxiv)
+        # 匹配: togglePdf('id', 'https://arxiv.org/pdf/xxx', this)
+        direct_url_match = _TOGGLE_PDF_RE.search(onclick)
+        if direct_url_match:
+            pdf_url = direct_url_match.group(1)
+            # 检查是否是直接的PDF链接
+            if not pdf_url.startswith("http") or pdf_url.startswith("/pdf?url="):
+                # 方法2: 处理旧格式 - 包装的URL
+                # 从 /pdf?url=actual_url 中提取 actual_url
+                actual_url_match = _WRAPPED_PDF_URL_RE.search(pdf_url)
+                pdf_url = actual_url_match.group(1) if actual_url_match else None
+
+    # 提取第一作者
+    if has_authors and first_author is None:
+        # 如果没有找到author类的链接，尝试从文本中提取
+        # 移除"Authors:"前缀，然后按逗号分割取第一个
+        if authors_text and "Authors:" in authors_text:
+            authors_clean = authors_text.replace("Authors:", "").strip()
+            first_author = authors_clean.split(",")[0].strip()
+    elif not has_authors:
+        first_author = None
+
+    # 提取出版年份
+    publication_time = None
+    if not venue:
+        if date_text is not None:
+            publication_time = date_text.split("Publish: ")[-1]
+        subjects = None
+
+    elif subjects is not None:
+        for subject in subjects:
+            year_match = _SUBJECT_YEAR_RE.search(subject)
+            if year_match:
+                publication_time = int(year_match.group(1))
+                break
+
+    return Paper(title, pdf_url, first_author, abstract, subjects, publication_time)
+
+
+def _bs4_text(element, string_type, tag_type) -> str:
+    """
+    get_text(strip=True)，但只取普通文本（不含 CDATA 等），并跳过 html.parser
+    因 <p> 未闭合而嵌套进来的块级元素
+    """
+    parts = []
+    stack = list(reversed(element.contents))
+    while stack:
+        node = stack.pop()
+        if type(node) is string_type:
+            parts.append(node.strip())
+        elif isinstance(node, tag_type) and node.name not in _P_CLOSING_TAGS:
+            stack.extend(reversed(node.contents))
+    return "".join(parts)
+
+
+def _bs4_owned_links(paragraph, tag_type, class_name: str = None) -> list:
+    """一次遍历取出直接属于 paragraph 的 <a>（跳过嵌套在其中的未闭合段落），按文档顺序"""
+    links = []
+    stack = list(reversed(paragraph.contents))
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, tag_type) or node.name in _P_CLOSING_TAGS:
+            continue
+        if node.name == "a" and (class_name is None or class_name in node.get("class", ())):
+            links.append(node)
+        stack.extend(reversed(node.contents))
+    return links
+
+
+def _extract_papers_bs4(html_content: str, venue: bool) -> list:
+    soup = bs4.BeautifulSoup(html_content, "html.parser")
+    # 只解析一次惰性模块的属性，避免每个节点都经过 LazyModule
+    string_type, tag_type = bs4.NavigableString, bs4.Tag
+    papers = []
+
+    # 找到所有论文div
+    for paper_div in soup.find_all("div", class_="panel paper"):
+        title_link = paper_div.find("a", class_="title-link")
+        pdf_link = paper_div.find("a", class_="title-pdf")
+
+        first_author = authors_text = None
+        authors_p = paper_div.find("p", id=_AUTHORS_ID_RE)
+        if authors_p:
+            # 只保留第一作者
+            author_links = _bs4_owned_links(authors_p, tag_type, "author")
+            if author_links:
+                first_author = _bs4_text(author_links[0], string_type, tag_type)
+            else:
+                authors_text = _bs4_text(authors_p, string_type, tag_type)
+
+        summary_p = paper_div.find("p", class_="summary")
+
+        date_text = subjects = None
+        if not venue:
+            date = paper_div.find("p", class_="metainfo date")
+            if date:
+                date_text = _bs4_text(date, string_type, tag_type)
+        else:
+            subjects_p = paper_div.find("p", class_="metainfo subjects")
+            if subjects_p:
+                subjects = [
+                    _bs4_text(a, string_type, tag_type) for a in _bs4_owned_links(subjects_p, tag_type)
+                ]
+
+        papers.append(
+            _build_paper_info(
+                venue,
+                _bs4_text(title_link, string_type, tag_type) if title_link else None,
+                pdf_link.get("onclick", "") if pdf_link else None,
+                authors_p is not None,
+                first_author,
+                authors_text,
+                _bs4_text(summary_p, string_type, tag_type) if summary_p else None,
+                date_text,
+                subjects,
+            )
+        )
+
+    return papers
+
+
+def _extract_papers_lxml(html_content: str, venue: bool) -> list:
+    def text_of(element) -> str:
+        return "".join(s.strip() for s in element.itertext())
+
+    root = lxml_html.fromstring(html_content)
+    papers = []
+
+    for paper_div in root.iter("div"):
+        if not _class_matches(paper_div.get("class"), "panel paper"):
+            continue
+
+        title = onclick = first_author = authors_p = abstract = date_text = None
+        subjects = None
+        # 每篇论文只遍历一次子树，记录每类元素的第一个匹配
+        for element in paper_div.iterdescendants():
+            tag = element.tag
+            if tag == "a":
+                classes = element.get("class")
+                if title is None and _class_matches(classes, "title-link"):
+                    title = text_of(element)
+                if onclick is None and _class_matches(classes, "title-pdf"):
+                    onclick = element.get("onclick", "")
+            elif tag == "p":
+                classes = element.get("class")
+                if authors_p is None and (element.get("id") or "").startswith("authors-"):
+                    authors_p = element
+                if abstract is None and _class_matches(classes, "summary"):
+                    abstract = text_of(element)
+                if not venue and date_text is None and _class_matches(classes, "metainfo date"):
+                    date_text = text_of(element)
+                if venue and subjects is None and _class_matches(classes, "metainfo subjects"):
+                    subjects = [text_of(a) for a in element.iter("a")]
+
+        authors_text = None
+        if authors_p is not None:
+            for author_link in authors_p.iter("a"):
+                if _class_matches(author_link.get("class"), "author"):
+                    first_author = text_of(author_link)
+                    break
+            else:
+                authors_text = text_of(authors_p)
+
+        papers.append(
+            _build_paper_info(
+                venue,
+                title,
+                onclick,
+                authors_p is not None,
+                first_author,
+                authors_text,
+                abstract,
+                date_text,
+                subjects,
+            )
+        )
+
+    return papers
+
+
+def _extract_papers_selectolax(html_content: str, venue: bool) -> list:
+    def text_of(node) -> str:
+        return node.text(deep=True, separator="", strip=True)
+
+    tree = lexbor.LexborHTMLParser(html_content)
+    papers = []
+
+    for paper_div in tree.css("div.panel.paper"):
+        if not _class_matches(paper_div.attributes.get("class"), "panel paper"):
+            continue
+
+        title = onclick = first_author = authors_p = abstract = date_text = None
+        subjects = None
+        # 每篇论文只遍历一次子树，记录每类元素的第一个匹配
+        for node in paper_div.traverse():
+            tag = node.tag
+            if tag == "a":
+                classes = node.attributes.get("class")
+                if title is None and _class_matches(classes, "title-link"):
+                    title = text_of(node)
+                if onclick is None and _class_matches(classes, "title-pdf"):
+                    onclick = node.attributes.get("onclick") or ""
+            elif tag == "p":
+                attributes = node.attributes
+                classes = attributes.get("class")
+                if authors_p is None and (attributes.get("id") or "").startswith("authors-"):
+                    authors_p = node
+                if abstract is None and _class_matches(classes, "summary"):
+                    abstract = text_of(node)
+                if not venue and date_text is None and _class_matches(classes, "metainfo date"):
+                    date_text = text_of(node)
+                if venue and subjects is None and _class_matches(classes, "metainfo subjects"):
+                    subjects = [text_of(a) for a in node.css("a")]
+
+        authors_text = None
+        if authors_p is not None:
+            for author_link in authors_p.css("a"):
+                if _class_matches(author_link.attributes.get("class"), "author"):
+                    first_author = text_of(author_link)
+                    break
+            else:
+                authors_text = text_of(authors_p)
+
+        papers.append(
+            _build_paper_info(
+                venue,
+                title,
+                onclick,
+                authors_p is not None,
+                first_author,
+                authors_text,
+                abstract,
+                date_text,
+                subjects,
+            )
+        )
+
+    return papers
+
+
+class PaperStreamParser(HTMLParser):
+    """
+    增量式 HTML 解析器：每当一个 div.panel.paper 结束时就生成对应的论文信息，
+    无需等待整个页面下载完成。输出与 BeautifulSoup 后端一致。
+    """
+
+    VOID_ELEMENTS = frozenset(
+        "area base br col embed hr img input link meta param source track wbr".split()
+    )
+
+    def __init__(self, venue: bool = True):
+        super().__init__(convert_charrefs=True)
+        self.venue = venue
+        self.papers = []
+        self._text = []
+        self._stack = None
+        self._captures = []
+
+    def _reset_paper(self) -> None:
+        self._stack = ["div"]
+        self._captures = []
+        self._fields = {
+            "title": None,
+            "onclick": None,
+            "authors": None,
+            "first_author": None,
+            "abstract": None,
+            "date": None,
+            "subjects": None,
+        }
+
+    def _flush_text(self) -> None:
+        if not self._text:
+            return
+        text = "".join(self._text).strip()
+        self._text = []
+        if text:
+            for capture in self._captures:
+                capture[2].append(text)
+
+    def handle_data(self, data):
+        if self._stack is not None and self._captures:
+            self._text.append(data)
+
+    def handle_comment(self, data):
+        self._flush_text()
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if self._stack is None:
+            if tag == "div" and _class_matches(dict(attrs).get("class"), "panel paper"):
+                self._reset_paper()
+            return
+        if tag in _P_CLOSING_TAGS and "p" in self._stack:
+            # 与 HTML 解析规则一致：块级元素隐式结束未闭合的 <p>
+            self.handle_endtag("p")
+            if self._stack is None:
+                return
+        if tag in self.VOID_ELEMENTS:
+            return
+
+        self._stack.append(tag)
+        depth = len(self._stack)
+        fields = self._fields
+        attributes = dict(attrs)
+        classes = attributes.get("class")
+        if tag == "a":
+            if fields["title"] is None and _class_matches(classes, "title-link"):
+                self._captures.append(("title", depth, []))
+            if fields["onclick"] is None and _class_matches(classes, "title-pdf"):
+                fields["onclick"] = attributes.get("onclick") or ""
+            if self._capturing("authors") and _class_matches(classes, "author"):
+                if fields["first_author"] is None and not self._capturing("first_author"):
+                    self._captures.append(("first_author", depth, []))
+            if self._capturing("subjects"):
+                self._captures.append(("subject", depth, []))
+        elif tag == "p":
+            if fields["authors"] is None and (attributes.get("id") or "").startswith("authors-"):
+                self._captures.append(("authors", depth, []))
+            if fields["abstract"] is None and _class_matches(classes, "summary"):
+                self._captures.append(("abstract", depth, []))
+            if not self.venue and fields["date"] is None and _class_matches(classes, "metainfo date"):
+                self._captures.append(("date", depth, []))
+            if self.venue and fields["subjects"] is None and _class_matches(classes, "metainfo subjects"):
+                fields["subjects"] = []
+                self._captures.append(("subjects", depth, []))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if self._stack is not None and tag not in self.VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if self._stack is None or tag not in self._stack:
+            return
+
+        while self._stack:
+            depth = len(self._stack)
+            closed = self._stack.pop()
+            self._close_captures(depth)
+            if closed == tag:
+                break
+
+        if not self._stack:
+            fields = self._fields
+            self.papers.append(
+                _build_paper_info(
+                    self.venue,
+                    fields["title"],
+                    fields["onclick"],
+                    fields["authors"] is not None,
+                    fields["first_author"],
+                    fields["authors"],
+                    fields["abstract"],
+                    fields["date"],
+                    fields["subjects"],
+                )
+            )
+            self._stack = None
+
+    def _capturing(self, name: str) -> bool:
+        return any(capture[0] == name for capture in self._captures)
+
+    def _close_captures(self, depth: int) -> None:
+        fields = self._fields
+        while self._captures and self._captures[-1][1] >= depth:
+            name, _, parts = self._captures.pop()
+            text = "".join(parts)
+            if name == "subject":
+                fields["subjects"].append(text)
+            elif name != "subjects" and fields[name] is None:
+                fields[name] = text
+
+
+def _extract_papers_stream(html_content: str, venue: bool) -> list:
+    parser = PaperStreamParser(venue)
+    parser.feed(html_content)
+    parser.close()
+    return parser.papers
+
+
+HTML_PARSER_BACKENDS = {
+    "bs4": _extract_papers_bs4,
+    "stream": _extract_papers_stream,
+}
+if lexbor is not None:
+    HTML_PARSER_BACKENDS["selectolax"] = _extract_papers_selectolax
+if lxml_html is not None:
+    HTML_PARSER_BACKENDS["lxml"] = _extract_papers_lxml
+
+
+def html_parser_backend(name: str = None) -> str:
+    """
+    Resolve the configured parser name. "auto" prefers selectolax, then lxml,
+    then the pure-stdlib stream parser; bs4 is only used when asked for.
+    """
+    name = name or HTML_PARSER
+    if name == "auto":
+        for candidate in ("selectolax", "lxml", "stream", "bs4"):
+            if candidate in HTML_PARSER_BACKENDS:
+                return candidate
+    if name not in HTML_PARSER_BACKENDS:
+        raise ValueError(f"HTML parser backend '{name}' is not available")
+    return name
+
+
+def parse_papers_html(html_content, venue=True, backend: str = None) -> list:
+    """
+    从HTML内容中提取论文信息（同步版本）
+    """
+    try:
+        if not html_content or not html_content.strip():
+            return []
+
+        return HTML_PARSER_BACKENDS[html_parser_backend(backend)](html_content, venue)
+    except Exception as e:
+        return [{"error": f"Failed to parse HTML content: {str(e)}"}]
+
+
+async def extract_papers_from_html(html_content, venue=True):
+    """
+    从HTML内容中提取论文信息
+    """
+    if html_content and len(html_content) >= PROCESS_HTML_MIN_BYTES:
+        return await run_in_process(parse_papers_html, html_content, venue)
+    return await run_in_thread(parse_papers_html, html_content, venue)
+
+
+CCF_RANK_FILE = Path("ccfrank.yml")
+CCF_INDEX_VERSION = 2
+# 两次检查 ccfrank.yml 是否被修改之间的最小间隔（秒）
+CCF_RELOAD_INTERVAL = 1.0
+
+_CCF_TRACK_SUFFIX_RE = re.compile(r"\s+-\s+.*$")
+_CCF_YEAR_SUFFIX_RE = re.compile(r"(?:[\s._'’-]+(?:19|20)\d{2}|['’]\d{2})$")
+_CCF_PROCEEDINGS_RE = re.compile(r"^(?:proceedings|proc)\b\.?\s*(?:of\s+)?(?:the\s+)?")
+_CCF_ORDINAL_RE = re.compile(r"^(?:(?:19|20)\d{2}\s+)?(?:\d+(?:st|nd|rd|th)\s+)?")
+_CCF_PUNCT_RE = re.compile(r"[^0-9a-z]+")
+
+# map: 内部查找索引（含 "=" / "~" 前缀的归一化键）；names: 原始的 名称 -> 等级 映射
+_ccf_index = {"map": {}, "names": {}, "key": None, "checked_at": 0.0}
+
+
+def _ccf_index_file() -> Path:
+    """编译后的索引与 ccfrank.yml 放在同一目录，而不是当前工作目录"""
+    return CCF_RANK_FILE.with_name(f".{CCF_RANK_FILE.stem}.index.pkl")
+
+
+def normalize_venue_name(venue: str) -> str:
+    """
+    将会议/期刊名称归一化为索引键，例如：
+    "NeurIPS.2024" -> "neurips"，"Proceedings of the ACM SIGMOD ..." -> "acm sigmod ..."
+    """
+    name = _CCF_TRACK_SUFFIX_RE.sub("", venue.strip())
+    name = _CCF_YEAR_SUFFIX_RE.sub("", name).lower()
+    name = _CCF_PROCEEDINGS_RE.sub("", name)
+    name = _CCF_ORDINAL_RE.sub("", name)
+    return " ".join(_CCF_PUNCT_RE.sub(" ", name).split())
+
+
+def _build_ccf_index(yaml_data) -> tuple[dict, dict]:
+    """返回 (查找索引, 原始名称映射)"""
+    if not yaml_data or "venues" not in yaml_data:
+        return {}, {}
+
+    exact, normalized, compact = {}, {}, {}
+    for venue in yaml_data["venues"]:
+        rank = venue.get("rank")
+        for name in (venue.get("abbr"), venue.get("name")):
+            if not name:
+                continue
+            exact[name.lower()] = rank
+            key = normalize_venue_name(name)
+            if key:
+                normalized[key] = rank
+                compact[key.replace(" ", "")] = rank
+
+    # 精确匹配优先，其次是归一化匹配，最后是去空格匹配
+    index = {f"~{key}": rank for key, rank in compact.items()}
+    index.update({f"={key}": rank for key, rank in normalized.items()})
+    index.update(exact)
+    return index, exact
+
+
+def _read_ccf_index_file(stat_key: tuple, content_hash: str | None = None):
+    try:
+        with open(_ccf_index_file(), "rb") as f:
+            cached = pickle.load(f)
+        if cached.get("version") != CCF_INDEX_VERSION:
+            return None
+        if cached.get("stat") == stat_key or (
+            content_hash and cached.get("sha256") == content_hash
+        ):
+            return cached
+    except Exception:
+        pass
+    return None
+
+
+def _write_ccf_index_file(stat_key: tuple, content_hash: str, index: dict, names: dict) -> None:
+    index_file = _ccf_index_file()
+    tmp_path = index_file.with_name(f"{index_file.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump(
+                {
+                    "version": CCF_INDEX_VERSION,
+                    "stat": stat_key,
+                    "sha256": content_hash,
+                    "index": index,
+                    "names": names,
+                },
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_path, index_file)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+
+
+def _refresh_ccf_index() -> None:
+    """
+    Reload the compiled CCF ranking index, rebuilding it only when ccfrank.yml changes.
+
+    The compiled index is persisted next to the YAML file so that new server
+    processes can skip YAML parsing entirely.
+    """
+    now = time.monotonic()
+    if _ccf_index["key"] is not None and now - _ccf_index["checked_at"] < CCF_RELOAD_INTERVAL:
+        return
+    _ccf_index["checked_at"] = now
+
+    try:
+        stat = CCF_RANK_FILE.stat()
+    except OSError:
+        _ccf_index.update(map={}, names={}, key=None)
+        return
+
+    stat_key = (stat.st_mtime_ns, stat.st_size)
+    if _ccf_index["key"] == stat_key:
+        return
+
+    cached = _read_ccf_index_file(stat_key)
+    if cached is None:
+        raw = CCF_RANK_FILE.read_bytes()
+        content_hash = hashlib.sha256(raw).hexdigest()
+        cached = _read_ccf_index_file(stat_key, content_hash)
+        if cached is None:
+            try:
+                index, names = _build_ccf_index(yaml.safe_load(raw))
+            except yaml.YAMLError:
+                index, names = {}, {}
+        else:
+            index, names = cached["index"], cached["names"]
+        _write_ccf_index_file(stat_key, content_hash, index, names)
+    else:
+        index, names = cached["index"], cached["names"]
+
+    _ccf_index.update(map=index, names=names, key=stat_key)
+
+
+def lookup_ccf_rank(venue: str) -> str | None:
+    """Resolve a venue name or papers.cool subject (e.g. "ICML.2024") to its CCF rank."""
+    _refresh_ccf_index()
+    index = _ccf_index["map"]
+    rank = index.get(venue.strip().lower())
+    if rank is not None:
+        return rank
+
+    key = normalize_venue_name(venue)
+    if not key:
+        return None
+    rank = index.get(f"={key}")
+    if rank is None:
+        rank = index.get(f"~{key.replace(' ', '')}")
+    return rank
+
+
+async def load_ccf_ranking() -> dict:
+    """Return the lower-cased venue name/abbreviation -> CCF rank mapping from ccfrank.yml."""
+    try:
+        _refresh_ccf_index()
+        return dict(_ccf_index["names"])
+    except Exception:
+        return {}
+
+
+@mcp.tool(name="get_ccf_rank", description="Get the CCF rank of a venue")
+@traced_tool
+async def get_ccf_rank(venue: str) -> str:
+    try:
+        if not venue or not venue.strip():
+            return "Error: Venue name cannot be empty"
+
+        return await run_in_thread(lookup_ccf_rank, venue) or "N/A"
+    except Exception as e:
+        return f"Error: Failed to get CCF rank - {str(e)}"
+
+
+CCF_RANK_ORDER = {"A": 0, "B": 1, "C": 2}
+
+
+def annotate_ccf_rank(papers: list, min_rank: str | None = None) -> list:
+    """
+    为每篇论文附加 ccf_rank 字段，每个不同的会议/期刊名称只查询一次索引。
+
+    Papers whose rank is below `min_rank` (or unranked) are dropped when it is set.
+    """
+    threshold = CCF_RANK_ORDER[min_rank.upper()] if min_rank else None
+    resolved = {}
+    annotated = []
+
+    for paper in papers:
+        if isinstance(paper, Paper):
+            candidates = paper.subjects or ()
+        elif "error" in paper:
+            annotated.append(paper)
+            continue
+        else:
+            candidates = [paper["venue"]] if paper.get("venue") else []
+            candidates += paper.get("subjects") or []
+
+        rank = None
+        for candidate in candidates:
+            if candidate not in resolved:
+                resolved[candidate] = lookup_ccf_rank(candidate)
+            rank = resolved[candidate]
+            if rank:
+                break
+
+        if threshold is not None and CCF_RANK_ORDER.get(rank, len(CCF_RANK_ORDER)) > threshold:
+            continue
+
+        paper = paper.to_dict() if isinstance(paper, Paper) else {**paper}
+        paper["ccf_rank"] = rank or "N/A"
+        annotated.append(paper)
+
+    return annotated
+
+
+@mcp.tool(
+    name="rank_papers",
+    description="""
+    Annotate a whole list of papers with their CCF rank in one call.
+
+    Pass the paper list returned by `search_on_venue` (or any list of objects with
+    `subjects` such as ["ICML.2024"] or a `venue` field). Every distinct venue is
+    resolved once and `ccf_rank` ("A", "B", "C" or "N/A") is added to each paper.
+
+    Parameters:
+    - papers: List of paper objects
+    - min_rank: Optional lowest CCF rank to keep ("A", "B" or "C"); lower-ranked and unranked papers are dropped
+    """,
+)
+@traced_tool
+async def rank_papers(papers: list[dict], min_rank: str = None) -> list:
+    try:
+        if min_rank and min_rank.upper() not in CCF_RANK_ORDER:
+            return [{"error": "min_rank must be one of A, B, C"}]
+
+        return await run_in_thread(annotate_ccf_rank, papers or [], min_rank)
+    except Exception as e:
+        return [{"error": f"Failed to rank papers: {str(e)}"}]
+
+
+CACHE_DIR = Path(os.getenv("SCHOLAI_CACHE_DIR", "./.cache"))
+
+# 搜索结果缓存的新鲜期（秒）：arXiv 更新频繁，会议论文几乎不变
+SEARCH_CACHE_TTL = {
+    "arxiv": float(os.getenv("SCHOLAI_ARXIV_CACHE_TTL", "3600")),
+    "venue": float(os.getenv("SCHOLAI_VENUE_CACHE_TTL", "86400")),
+}
+# 过期后仍可直接返回旧结果、同时在后台刷新的时间窗口（秒）
+SEARCH_CACHE_STALE = float(os.getenv("SCHOLAI_SEARCH_CACHE_STALE", "86400"))
+SEARCH_CACHE_MEMORY_ENTRIES = int(os.getenv("SCHOLAI_SEARCH_CACHE_ENTRIES", "64"))
+SEARCH_CACHE_MAX_BYTES = int(float(os.getenv("SCHOLAI_SEARCH_CACHE_MAX_MB", "256")) * 2**20)
+
+# 内存缓存条目为 (fetched_at, papers, complete)，complete=False 表示提前终止读取的部分结果
+_search_cache_memory: OrderedDict[tuple[str, str], tuple[float, list[Paper], bool]] = OrderedDict()
+_search_cache_db = {"conn": None, "lock": threading.Lock()}
+_search_cache_stats = {
+    "memory_hits": 0,
+    "disk_hits": 0,
+    "stale_hits": 0,
+    "misses": 0,
+    "revalidations": 0,
+    "evictions": 0,
+}
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+_TITLE_NORMALIZE_RE = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_title(title: str) -> str:
+    return " ".join(_TITLE_NORMALIZE_RE.sub(" ", title.lower()).split())
+
+
+def _search_cache_connection() -> sqlite3.Connection:
+    if _search_cache_db["conn"] is None:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(CACHE_DIR / "search.sqlite3", check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS search_cache (
+                endpoint TEXT NOT NULL,
+                query TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                payload BLOB NOT NULL,
+                PRIMARY KEY (endpoint, query)
+            )"""
+        )
+        _search_cache_db["conn"] = conn
+    return _search_cache_db["conn"]
+
+
+def _search_cache_disk_get(key: tuple[str, str]) -> tuple[float, list] | None:
+    with _search_cache_db["lock"]:
+        conn = _search_cache_connection()
+        row = conn.execute(
+            "SELECT fetched_at, payload FROM search_cache WHERE endpoint = ? AND query = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE search_cache SET accessed_at = ? WHERE endpoint = ? AND query = ?",
+            (time.time(), *key),
+        )
+        conn.commit()
+    return row[0], [Paper.from_dict(paper) for paper in json.loads(zlib.decompress(row[1]))]
+
+
+def _search_cache_disk_put(key: tuple[str, str], fetched_at: float, papers: list) -> None:
+    payload = zlib.compress(json.dumps(papers_to_dicts(papers), ensure_ascii=False).encode("utf-8"))
+    with _search_cache_db["lock"]:
+        conn = _search_cache_connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?, ?, ?, ?)",
+            (*key, fetched_at, time.time(), len(payload), payload),
+        )
+        # 超过容量上限时按最近访问时间淘汰
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM search_cache").fetchone()[0]
+        while total > SEARCH_CACHE_MAX_BYTES:
+            row = conn.execute(
+                "SELECT endpoint, query, size FROM search_cache ORDER BY accessed_at LIMIT 1"
+            ).fetchone()
+            if row is None or (row[0], row[1]) == key:
+                break
+            conn.execute(
+                "DELETE FROM search_cache WHERE endpoint = ? AND query = ?", row[:2]
+            )
+            total -= row[2]
+            _search_cache_stats["evictions"] += 1
+        conn.commit()
+
+
+def _search_cache_memory_put(
+    key: tuple[str, str], fetched_at: float, papers: list, complete: bool = True
+) -> None:
+    _search_cache_memory[key] = (fetched_at, papers, complete)
+    _search_cache_memory.move_to_end(key)
+    while len(_search_cache_memory) > SEARCH_CACHE_MEMORY_ENTRIES:
+        _search_cache_memory.popitem(last=False)
+
+
+async def _fetch_search_page(endpoint: str, query: str) -> list:
+    client = get_http_client(PAPERS_COOL_URL)
+    with stage("fetch"):
+        response = await client.get(
+            f"{PAPERS_COOL_URL}/{endpoint}/search", params={"query": query, "show": 1000}
+        )
+        response.raise_for_status()
+    mark("upstream_bytes", len(response.content))
+    with stage("parse"):
+        return await extract_papers_from_html(response.text, venue=endpoint == "venue")
+
+
+async def _stream_search_page(endpoint: str, query: str, limit: int) -> tuple[list, bool]:
+    """
+    Parse the search page while it downloads and stop reading once `limit` papers are found.
+
+    Returns the papers and whether the whole page was read.
+    """
+    parser = PaperStreamParser(venue=endpoint == "venue")
+    client = get_http_client(PAPERS_COOL_URL)
+    # 边下载边解析，两者无法分开计时
+    with stage("fetch_parse"):
+        async with client.stream(
+            "GET",
+            f"{PAPERS_COOL_URL}/{endpoint}/search",
+            params={"query": query, "show": 1000},
+        ) as response:
+            response.raise_for_status()
+            # 按原始字节计数，再增量解码（与 aiter_text 相同的编码），多字节字符可跨块
+            decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+            async for chunk in response.aiter_bytes():
+                mark("upstream_bytes", len(chunk))
+                await run_in_thread(parser.feed, decoder.decode(chunk))
+                if len(parser.papers) >= limit:
+                    return parser.papers, False
+            parser.feed(decoder.decode(b"", final=True))
+
+        parser.close()
+    return parser.papers, True
+
+
+async def _refresh_search_results(endpoint: str, query: str) -> list:
+    key = (endpoint, normalize_query(query))
+    papers = await _fetch_search_page(endpoint, query)
+    # 解析失败时返回错误字典，不写入缓存
+    if papers and isinstance(papers[0], dict):
+        return papers
+
+    fetched_at = time.time()
+    _search_cache_memory_put(key, fetched_at, papers)
+    await run_in_thread(_search_cache_disk_put, key, fetched_at, papers)
+    schedule_paper_indexing(endpoint, papers)
+    return papers
+
+
+def _schedule_search_revalidation(endpoint: str, query: str) -> None:
+    # 与 limit=None 的未命中请求共用同一个 single-flight 键
+    key = (endpoint, normalize_query(query), None)
+    if in_flight("search", key) is not None:
+        return
+
+    _search_cache_stats["revalidations"] += 1
+    # 后台刷新失败时保留旧结果，异常由 single_flight_task 消费
+    single_flight_task("search", key, functools.partial(_refresh_search_results, endpoint, query))
+
+
+async def _fetch_search_prefix(endpoint: str, query: str, limit: int) -> list:
+    key = (endpoint, normalize_query(query))
+    papers, complete = await _stream_search_page(endpoint, query, limit)
+    fetched_at = time.time()
+    _search_cache_memory_put(key, fetched_at, papers, complete)
+    if complete:
+        await run_in_thread(_search_cache_disk_put, key, fetched_at, papers)
+    schedule_paper_indexing(endpoint, papers)
+    return papers
+
+
+async def fetch_search_results(endpoint: str, query: str, limit: int = None) -> list:
+    """
+    Return the parsed papers.cool result list for `query`.
+
+    Results are cached per (endpoint, normalized query) in memory and on disk, so
+    calls that only differ in num_results or sorting share one upstream fetch.
+    Entries past their TTL are still served during the stale window while a
+    background task refreshes them.
+
+    When `limit` is given the caller only needs the first `limit` papers in page
+    order, so a cache miss streams the page and stops reading early.
+    """
+    key = (endpoint, normalize_query(query))
+    entry = _search_cache_memory.get(key)
+    if entry is not None and (entry[2] or (limit is not None and len(entry[1]) >= limit)):
+        _search_cache_memory.move_to_end(key)
+        tier = "memory_hits"
+    else:
+        with stage("cache_lookup"):
+            entry = await run_in_thread(_search_cache_disk_get, key)
+        if entry is not None:
+            entry = (*entry, True)
+            _search_cache_memory_put(key, *entry)
+        tier = "disk_hits"
+
+    if entry is not None:
+        fetched_at, papers, _ = entry
+        age = time.time() - fetched_at
+        if age < SEARCH_CACHE_TTL[endpoint]:
+            _search_cache_stats[tier] += 1
+            mark(f"search_cache_{tier}")
+            return papers
+        if age < SEARCH_CACHE_TTL[endpoint] + SEARCH_CACHE_STALE:
+            _search_cache_stats["stale_hits"] += 1
+            mark("search_cache_stale_hits")
+            _schedule_search_revalidation(endpoint, query)
+            return papers
+
+    _search_cache_stats["misses"] += 1
+    mark("search_cache_misses")
+    # 并发的相同查询只请求一次上游
+    if limit is None:
+        return await single_flight(
+            "search", (*key, None), functools.partial(_refresh_search_results, endpoint, query)
+        )
+    return await single_flight(
+        "search", (*key, limit), functools.partial(_fetch_search_prefix, endpoint, query, limit)
+    )
+
+
+def search_cache_info() -> dict:
+    with _search_cache_db["lock"]:
+        entries, size = _search_cache_connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM search_cache"
+        ).fetchone()
+    return {
+        **_search_cache_stats,
+        "memory_entries": len(_search_cache_memory),
+        "disk_entries": entries,
+        "disk_bytes": size,
+        "ttl_seconds": SEARCH_CACHE_TTL,
+        "stale_seconds": SEARCH_CACHE_STALE,
+    }
+
+
+@mcp.tool(
+    name="get_cache_stats",
+    description="Diagnostic tool: show hit/miss counters and size of the search result and paper text caches, and how many concurrent identical calls were coalesced.",
+)
+@traced_tool
+async def get_cache_stats() -> dict:
+    try:
+        return {
+            "search": await run_in_thread(search_cache_info),
+            "paper_text": await run_in_thread(text_cache_info),
+            "coalescing": single_flight_info(),
+        }
+    except Exception as e:
+        return {"error": f"Failed to read cache stats: {str(e)}"}
+
+
+@mcp.tool(
+    name="server_stats",
+    description="""
+    Diagnostic tool: per-tool call counts, error counts and latency (mean/p50/p95),
+    a per-stage breakdown (e.g. fetch, parse, sort, extract, llamaparse_wait),
+    byte counters and cache hit markers collected since the server started.
+    """,
+)
+async def server_stats() -> dict:
+    try:
+        return {
+            **metrics_snapshot(),
+            "coalescing": single_flight_info(),
+            "llamaparse_jobs": dict(_parse_job_stats),
+        }
+    except Exception as e:
+        return {"error": f"Failed to read server stats: {str(e)}"}
+
+
+PAPER_INDEX_PATH = CACHE_DIR / "papers.sqlite3"
+# 2: 键中包含来源，arXiv 与会议版本的同名论文分别保存
+PAPER_INDEX_VERSION = 2
+# FTS5 bm25 权重：title, first_author, abstract, subjects
+PAPER_INDEX_WEIGHTS = (5.0, 1.0, 1.0, 2.0)
+
+_paper_index_db = {"conn": None, "lock": threading.Lock()}
+_paper_index_tasks: set[asyncio.Task] = set()
+_FTS_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _paper_index_connection() -> sqlite3.Connection:
+    if _paper_index_db["conn"] is None:
+        PAPER_INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(PAPER_INDEX_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] < PAPER_INDEX_VERSION:
+            # 索引只是已见过的搜索结果的缓存，格式变化时直接重建
+            conn.executescript(
+                f"""
+                DROP TRIGGER IF EXISTS papers_ai;
+                DROP TRIGGER IF EXISTS papers_au;
+                DROP TABLE IF EXISTS papers_fts;
+                DROP TABLE IF EXISTS papers;
+                PRAGMA user_version = {PAPER_INDEX_VERSION};
+                """
+            )
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS papers (
+                key TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                title TEXT,
+                pdf_url TEXT,
+                first_author TEXT,
+                abstract TEXT,
+                subjects TEXT,
+                publication_time TEXT,
+                year INTEGER,
+                seen_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS papers_year ON papers (source, year);
+            CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+                title, first_author, abstract, subjects,
+                content='papers', content_rowid='rowid', tokenize='porter unicode61'
+            );
+            CREATE TRIGGER IF NOT EXISTS papers_ai AFTER INSERT ON papers BEGIN
+                INSERT INTO papers_fts (rowid, title, first_author, abstract, subjects)
+                VALUES (new.rowid, new.title, new.first_author, new.abstract, new.subjects);
+            END;
+            CREATE TRIGGER IF NOT EXISTS papers_au
+            AFTER UPDATE OF title, first_author, abstract, subjects ON papers BEGIN
+                INSERT INTO papers_fts (papers_fts, rowid, title, first_author, abstract, subjects)
+                VALUES ('delete', old.rowid, old.title, old.first_author, old.abstract, old.subjects);
+                INSERT INTO papers_fts (rowid, title, first_author, abstract, subjects)
+                VALUES (new.rowid, new.title, new.first_author, new.abstract, new.subjects);
+            END;
+            """
+        )
+        _paper_index_db["conn"] = conn
+    return _paper_index_db["conn"]
+
+
+def index_papers(source: str, papers: list) -> int:
+    """
+    Insert or update parsed search results in the local full-text index.
+
+    Papers are keyed by source and normalized title, so the arXiv and venue
+    versions of a paper are kept apart; unchanged rows are left untouched so
+    repeated searches do not rewrite the FTS index.
+    """
+    now = time.time()
+    rows = [
+        (
+            f"{source}:{normalize_title(paper.title) or paper.title}",
+            source,
+            paper.title,
+            paper.pdf_url,
+            paper.first_author,
+            paper.abstract,
+            None if paper.subjects is None else json.dumps(paper.subjects, ensure_ascii=False),
+            None if paper.publication_time is None else str(paper.publication_time),
+            paper.year,
+            now,
+        )
+        for paper in papers
+        if isinstance(paper, Paper) and paper.title
+    ]
+    with _paper_index_db["lock"]:
+        conn = _paper_index_connection()
+        conn.executemany(
+            """INSERT INTO papers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                title = excluded.title,
+                pdf_url = excluded.pdf_url,
+                first_author = excluded.first_author,
+                abstract = excluded.abstract,
+                subjects = excluded.subjects,
+                publication_time = excluded.publication_time,
+                year = excluded.year,
+                seen_at = excluded.seen_at
+            WHERE papers.title IS NOT excluded.title
+                OR papers.pdf_url IS NOT excluded.pdf_url
+                OR papers.first_author IS NOT excluded.first_author
+                OR papers.abstract IS NOT excluded.abstract
+                OR papers.subjects IS NOT excluded.subjects
+                OR papers.publication_time IS NOT excluded.publication_time""",
+            rows,
+        )
+        conn.commit()
+    return len(rows)
+
+
+def schedule_paper_indexing(source: str, papers: list) -> None:
+    """Index freshly fetched results in the background so searches never wait on it."""
+    task = asyncio.ensure_future(run_in_thread(index_papers, source, papers))
+    _paper_index_tasks.add(task)
+    task.add_done_callback(_paper_index_tasks.discard)
+
+
+def search_paper_index(
+    query: str,
+    num_results: int = 20,
+    source: str = None,
+    year_from: int = None,
+    year_to: int = None,
+    match_all: bool = False,
+) -> list:
+    """
+    BM25-ranked local index hits for `query`. By default a paper matches if it
+    contains any query term; with `match_all` it must contain every term.
+    """
+    tokens = _FTS_TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return []
+
+    sql = [
+        """SELECT p.source, p.title, p.pdf_url, p.first_author, p.abstract,
+                  p.subjects, p.publication_time
+           FROM papers_fts JOIN papers p ON p.rowid = papers_fts.rowid
+           WHERE papers_fts MATCH ?"""
+    ]
+    params = [(" AND " if match_all else " OR ").join(f'"{token}"' for token in tokens)]
+    if source:
+        sql.append("AND p.source = ?")
+        params.append(source)
+    if year_from:
+        sql.append("AND p.year >= ?")
+        params.append(year_from)
+    if year_to:
+        sql.append("AND p.year <= ?")
+        params.append(year_to)
+    sql.append(f"ORDER BY bm25(papers_fts, {', '.join(map(str, PAPER_INDEX_WEIGHTS))}) LIMIT ?")
+    params.append(num_results)
+
+    with _paper_index_db["lock"]:
+        rows = _paper_index_connection().execute(" ".join(sql), params).fetchall()
+
+    return [
+        Paper(
+            title,
+            pdf_url,
+            first_author,
+            abstract,
+            None if subjects is None else json.loads(subjects),
+            int(publication_time) if source == "venue" and publication_time is not None else publication_time,
+            source,
+        )
+        for source, title, pdf_url, first_author, abstract, subjects, publication_time in rows
+    ]
+
+
+async def search_local_first(source: str, query: str, num_results: int) -> list | None:
+    """Return local index hits if there are enough of them, otherwise None."""
+    try:
+        with stage("local_index"):
+            # 只有包含全部查询词的论文才算本地命中，否则仅共享一个词的论文也会跳过网络请求
+            papers = await run_in_thread(
+                search_paper_index, query, num_results, source, match_all=True
+            )
+    except sqlite3.Error:
+        return None
+    if len(papers) < num_results:
+        mark("local_index_misses")
+        return None
+    mark("local_index_hits")
+    for paper in papers:
+        paper.source = None
+    return papers
+
+
+@mcp.tool(
+    name="search_local",
+    description="""
+    Search the local index of every paper previously returned by `search_on_arxiv`,
+    `search_on_venue` or `multi_search`. Answers in milliseconds and works offline,
+    but only covers papers this server has already seen.
+
+    Parameters:
+    - query: Keywords matched against title, first author, abstract and venue
+    - num_results: Max papers to return (default: 20)
+    - source: Restrict to "arxiv" or "venue" (default: both)
+    - year_from / year_to: Optional publication year range
+
+    Returns: List of papers ranked by BM25 relevance, each with its `source`.
+    """,
+)
+@traced_tool
+async def search_local(
+    query: str,
+    num_results: int = 20,
+    source: str = None,
+    year_from: int = None,
+    year_to: int = None,
+) -> list:
+    try:
+        if not query or not query.strip():
+            return [{"error": "Query cannot be empty"}]
+
+        if num_results <= 0:
+            return [{"error": "Number of results must be positive"}]
+
+        if source and source not in SEARCH_CACHE_TTL:
+            return [{"error": "Source must be 'arxiv' or 'venue'"}]
+
+        papers = await run_in_thread(
+            search_paper_index, query, num_results, source, year_from, year_to
+        )
+        return papers_to_dicts(papers)
+    except sqlite3.Error as e:
+        return [{"error": f"Local index error: {str(e)}"}]
+    except Exception as e:
+        return [{"error": f"Local search failed: {str(e)}"}]
+
+
+# BM25 参数；标题词频按 RERANK_TITLE_WEIGHT 倍计入
+RERANK_K1 = 1.2
+RERANK_B = 0.75
+RERANK_TITLE_WEIGHT = 2
+# 缓存最近重排过的结果列表的索引（搜索结果缓存命中时返回同一个列表对象）
+RERANK_INDEX_CACHE_SIZE = 16
+
+_bm25_indexes: OrderedDict[int, tuple[list, "BM25Index"]] = OrderedDict()
+_bm25_lock = threading.Lock()
+
+
+class BM25Index:
+    """
+    BM25 statistics of one result list over title + abstract.
+
+    Postings are stored term by term in two flat arrays, and each posting
+    already holds its final weight (IDF times the saturated, length-normalized
+    term frequency), so scoring a query only adds up the postings of its terms.
+    With NumPy the index is built and scored with array operations.
+    """
+
+    __slots__ = ("size", "positions", "spans", "docs", "weights")
+
+    def __init__(self, papers: list):
+        self.size = len(papers)
+        self.positions = {id(paper): position for position, paper in enumerate(papers)}
+        tokenized = [_rerank_tokens(paper) for paper in papers]
+        if numpy is not None:
+            self._build_vectorized(tokenized)
+        else:
+            self._build(tokenized)
+
+    def _build(self, tokenized: list[list[str]]) -> None:
+        lengths = [len(tokens) for tokens in tokenized]
+        average = sum(lengths) / self.size if sum(lengths) else 1.0
+        postings: dict[str, tuple[list[int], list[float]]] = {}
+        for position, tokens in enumerate(tokenized):
+            norm = RERANK_K1 * (1 - RERANK_B + RERANK_B * lengths[position] / average)
+            for term, tf in Counter(tokens).items():
+                entry = postings.get(term)
+                if entry is None:
+                    entry = postings[term] = ([], [])
+                entry[0].append(position)
+                entry[1].append(tf * (RERANK_K1 + 1) / (tf + norm))
+
+        self.spans = {}
+        self.docs = array("q")
+        self.weights = array("d")
+        for term, (docs, weights) in postings.items():
+            idf = _bm25_idf(self.size, len(docs))
+            self.spans[term] = (len(self.docs), len(self.docs) + len(docs))
+            self.docs.extend(docs)
+            self.weights.extend([weight * idf for weight in weights])
+
+    def _build_vectorized(self, tokenized: list[list[str]]) -> None:
+        # 与 _build 逐项相同的浮点运算，两种实现的分数完全一致
+        size = self.size
+        tokens = list(itertools.chain.from_iterable(tokenized))
+        vocabulary = {term: term_id for term_id, term in enumerate(dict.fromkeys(tokens))}
+        term_ids = numpy.fromiter(map(vocabulary.__getitem__, tokens), dtype=numpy.int64, count=len(tokens))
+        lengths = numpy.fromiter(map(len, tokenized), dtype=numpy.int64, count=size)
+        total = int(lengths.sum())
+        average = total / size if total else 1.0
+
+        # (词, 文档) 对按词再按文档排序，出现次数即词频
+        pairs, tf = numpy.unique(term_ids * size + numpy.repeat(numpy.arange(size), lengths), return_counts=True)
+        terms, docs = numpy.divmod(pairs, size)
+        norm = RERANK_K1 * (1 - RERANK_B + RERANK_B * lengths[docs] / average)
+        df = numpy.bincount(terms, minlength=len(vocabulary))
+        idf = numpy.array([_bm25_idf(size, count) for count in df.tolist()])
+        self.docs = docs
+        self.weights = tf * (RERANK_K1 + 1) / (tf + norm) * idf[terms]
+        ends = numpy.cumsum(df).tolist()
+        self.spans = dict(zip(vocabulary, zip((end - count for end, count in zip(ends, df.tolist())), ends)))
+
+    def scores(self, terms: dict[str, int]):
+        """BM25 score of every paper for the query terms (term -> query frequency)."""
+        if numpy is not None:
+            scores = numpy.zeros(self.size)
+            for term, count in terms.items():
+                span = self.spans.get(term)
+                if span:
+                    start, end = span
+                    # 同一个词的倒排列表中文档不重复，可以直接按下标累加
+                    scores[self.docs[start:end]] += count * self.weights[start:end]
+            return scores
+
+        scores = [0.0] * self.size
+        for term, count in terms.items():
+            span = self.spans.get(term)
+            if span:
+                start, end = span
+                for doc, weight in zip(self.docs[start:end], self.weights[start:end]):
+                    scores[doc] += count * weight
+        return scores
+
+    def top(self, scores, candidates: list[int] | None, top_k: int | None) -> list[tuple[int, float]]:
+        """
+        The best `top_k` (all when None) of `candidates` (all papers when None) as
+        (position, score), highest score first and page order among equal scores.
+        """
+        if numpy is not None:
+            positions = (
+                numpy.arange(self.size)
+                if candidates is None
+                else numpy.fromiter(candidates, dtype=numpy.intp, count=len(candidates))
+            )
+            values = scores[positions]
+            if top_k is not None and top_k < len(positions):
+                # 取第 k 大的分数为阈值，分数相同的按原顺序取前面的，保证与纯 Python 实现一致
+                threshold = numpy.partition(values, len(values) - top_k)[len(values) - top_k]
+                above = numpy.flatnonzero(values > threshold)
+                ties = numpy.flatnonzero(values == threshold)[: top_k - len(above)]
+                keep = numpy.concatenate((above, ties))
+            else:
+                keep = numpy.arange(len(positions))
+            keep = keep[numpy.lexsort((keep, -values[keep]))]
+            return list(zip(positions[keep].tolist(), values[keep].tolist()))
+
+        positions = range(self.size) if candidates is None else candidates
+        order = sorted(range(len(positions)), key=lambda i: (-scores[positions[i]], i))
+        if top_k is not None:
+            order = order[:top_k]
+        return [(positions[i], scores[positions[i]]) for i in order]
+
+
+_RERANK_SEPARATORS = str.maketrans(dict.fromkeys(string.punctuation, " "))
+
+
+def _rerank_terms(text: str) -> list[str]:
+    # ASCII 标点视为分隔符；比正则分词快一倍，重排的开销主要在分词
+    return text.lower().translate(_RERANK_SEPARATORS).split()
+
+
+def _rerank_tokens(paper: Paper) -> list[str]:
+    tokens = _rerank_terms(paper.abstract) if paper.abstract else []
+    if paper.title:
+        tokens += _rerank_terms(paper.title) * RERANK_TITLE_WEIGHT
+    return tokens
+
+
+def _bm25_idf(size: int, df: int) -> float:
+    return math.log(1 + (size - df + 0.5) / (df + 0.5))
+
+
+def bm25_index(papers: list) -> BM25Index:
+    """Return the BM25 index of a result list, building it once per list object."""
+    key = id(papers)
+    with _bm25_lock:
+        entry = _bm25_indexes.get(key)
+        if entry is not None and entry[0] is papers:
+            _bm25_indexes.move_to_end(key)
+            return entry[1]
+
+    index = BM25Index(papers)
+    with _bm25_lock:
+        # 保存列表本身，保证 id 在缓存期间不会被复用
+        _bm25_indexes[key] = (papers, index)
+        while len(_bm25_indexes) > RERANK_INDEX_CACHE_SIZE:
+            _bm25_indexes.popitem(last=False)
+    return index
+
+
+def rerank_papers(
+    papers: list,
+    query: str,
+    concepts: list[str] = None,
+    top_k: int = None,
+    corpus: list = None,
+) -> list[dict]:
+    """
+    Order papers by BM25 relevance of their title and abstract to the query
+    and concepts, best first, each with a `relevance` score.
+
+    `papers` may be a filtered subset of `corpus` (the full result list), whose
+    cached index supplies the vocabulary and IDF statistics.
+    """
+    corpus = papers if corpus is None else corpus
+    index = bm25_index(corpus)
+    terms = Counter(_rerank_terms(query))
+    for concept in concepts or ():
+        terms.update(_rerank_terms(concept))
+    candidates = None if papers is corpus else [index.positions[id(paper)] for paper in papers]
+    return [
+        {**corpus[position].to_dict(), "relevance": round(score, 4)}
+        for position, score in index.top(index.scores(terms), candidates, top_k)
+    ]
+
+
+@mcp.tool(
+    name="search_on_arxiv",
+    description="""
+    
+    **Query Format**: Use simple keywords only - no boolean operators (AND/OR) supported.
+    Examples: "machine learning", "neural networks", "quantum computing"
+    
+    Search preprint papers on arXiv, the world's largest open-access repository.
+    
+    This tool searches arXiv's collection of preprint papers across multiple scientific disciplines. Perfect for discovering cutting-edge research before peer review and tracking emerging trends.
+    
+    Key features:
+    - Access to latest research developments before formal publication
+    - Multi-disciplinary coverage (physics, math, CS, biology, economics)
+    - Simple keyword search (no boolean operators like AND/OR)
+    - Open access with immediate PDF availability
+    
+    Parameters:
+    - query: Single search term or phrase
+    - num_results: Max papers to return (default: 100)
+    - need_datetime_sort: Sort by submission date, newest first (default: False)
+    - prefer_local: Answer from the local index (see `search_local`) when it already holds at least num_results matches (default: False)
+    - year_from / year_to: Only keep papers published in this range of years (inclusive)
+    - fields: Only return these fields, e.g. ["title", "pdf_url"] (default: all)
+    - abstract_chars: Cut abstracts to this many characters
+    - max_bytes: Stop adding papers before their JSON exceeds this many bytes; a final {"omitted": n} entry counts the dropped papers
+    - rerank: Order by BM25 relevance of title and abstract to the query (and extracted_concepts) instead of page or date order; each paper gets a `relevance` score (default: False)
+    - extracted_concepts: Extra terms for rerank, e.g. the `extracted_concepts` passed to `sequential_extract_academic_query`
+
+    
+    Returns: List of preprints with titles, authors, arXiv categories, and optional PDF links.
+    """,
+)
+@traced_tool
+@client_limited
+async def search_on_arxiv(
+    query: str,
+    num_results: int = 100,
+    need_datetime_sort: bool = False,
+    prefer_local: bool = False,
+    year_from: int = None,
+    year_to: int = None,
+    fields: list[str] = None,
+    abstract_chars: int = None,
+    max_bytes: int = None,
+    rerank: bool = False,
+    extracted_concepts: list[str] = None,
+) -> list:
+    try:
+        if not query or not query.strip():
+            return [{"error": "Query cannot be empty"}]
+
+        if num_results <= 0:
+            return [{"error": "Number of results must be positive"}]
+
+        error = _search_filter_error(year_from, year_to, fields, abstract_chars, max_bytes)
+        if error:
+            return [{"error": error}]
+
+        filtered = bool(year_from or year_to)
+        papers = None
+        # 过滤或重排需要完整的结果列表，本地命中数无法保证，直接走远程
+        if prefer_local and not filtered and not rerank:
+            papers = await search_local_first("arxiv", query, num_results)
+        if papers is None:
+            papers = await fetch_search_results(
+                "arxiv", query, limit=None if need_datetime_sort or filtered or rerank else num_results
+            )
+
+        if papers and isinstance(papers[0], dict):
+            return papers
+
+        corpus = papers
+        if filtered:
+            with stage("filter"):
+                papers = filter_papers(papers, year_from, year_to)
+
+        if rerank:
+            with stage("rerank"):
+                papers = await run_in_thread(
+                    rerank_papers, papers, query, extracted_concepts, num_results, corpus
+                )
+        elif need_datetime_sort:
+            with stage("sort"):
+                papers = sorted(papers, key=_PAPER_SORT_KEY, reverse=True)
+
+        return shape_papers(papers[:num_results], fields, abstract_chars, max_bytes)
+    except httpx.RequestError as e:
+        return [{"error": f"Network request failed: {str(e)}"}]
+    except httpx.HTTPStatusError as e:
+        return [
+            {"error": f"HTTP error {e.response.status_code}: {e.response.text[:100]}"}
+        ]
+    except Exception as e:
+        return [{"error": f"Search failed: {str(e)}"}]
+
+
+@mcp.tool(
+    name="search_on_venue",
+    description="""
+    
+    **Query Format**: Use simple keywords only - no boolean operators (AND/OR) supported.
+    Examples: "machine learning", "neural networks", "quantum computing"
+    
+    Search academic papers within specific conferences and journals (venues).
+    
+    This tool targets peer-reviewed publications from established academic venues like conferences (NeurIPS, ICML) and journals (Nature, IEEE). Ideal for finding high-quality papers within specific academic communities.
+    
+    Key features:
+    - Venue-specific search within curated conference/journal databases
+    - Simple keyword search (no boolean operators like AND/OR)
+    - Quality-focused results from peer-reviewed sources
+    - Customizable output with PDF links and publication metadata
+    
+    Parameters:
+    - query: Single search term or phrase
+    - num_results: Max papers to return (default: 100)
+    - need_datetime_sort: Sort by publication date, newest first (default: True)
+    - with_ccf_rank: Attach the CCF rank of each paper's venue as `ccf_rank` (default: False)
+    - min_rank: Only keep papers whose venue has at least this CCF rank ("A", "B" or "C"); implies with_ccf_rank
+    - prefer_local: Answer from the local index (see `search_local`) when it already holds at least num_results matches (default: False)
+    - year_from / year_to: Only keep papers published in this range of years (inclusive)
+    - venues / exclude_venues: Keep / drop papers of these venues, e.g. ["ICML", "NeurIPS"]
+    - subjects / exclude_subjects: Keep / drop papers with these subject tags, e.g. ["ICML.2024"] or ["Oral"]
+    - fields: Only return these fields, e.g. ["title", "pdf_url"] (default: all)
+    - abstract_chars: Cut abstracts to this many characters
+    - max_bytes: Stop adding papers before their JSON exceeds this many bytes; a final {"omitted": n} entry counts the dropped papers
+    - rerank: Order by BM25 relevance of title and abstract to the query (and extracted_concepts) instead of page or date order; each paper gets a `relevance` score (default: False)
+    - extracted_concepts: Extra terms for rerank, e.g. the `extracted_concepts` passed to `sequential_extract_academic_query`
+
+    
+    Returns: List of papers with titles, authors, venue details, and optional PDF links.
+    """,
+)
+@traced_tool
+@client_limited
+async def search_on_venue(
+    query: str,
+    num_results: int = 100,
+    need_datetime_sort: bool = True,
+    with_ccf_rank: bool = False,
+    min_rank: str = None,
+    prefer_local: bool = False,
+    year_from: int = None,
+    year_to: int = None,
+    venues: list[str] = None,
+    exclude_venues: list[str] = None,
+    subjects: list[str] = None,
+    exclude_subjects: list[str] = None,
+    fields: list[str] = None,
+    abstract_chars: int = None,
+    max_bytes: int = None,
+    rerank: bool = False,
+    extracted_concepts: list[str] = None,
+) -> list:
+    try:
+        if not query or not query.strip():
+            return [{"error": "Query cannot be empty"}]
+
+        if num_results <= 0:
+            return [{"error": "Number of results must be positive"}]
+
+        if min_rank and min_rank.upper() not in CCF_RANK_ORDER:
+            return [{"error": "min_rank must be one of A, B, C"}]
+
+        error = _search_filter_error(year_from, year_to, fields, abstract_chars, max_bytes)
+        if error:
+            return [{"error": error}]
+
+        filtered = bool(year_from or year_to or venues or exclude_venues or subjects or exclude_subjects)
+        papers = None
+        # min_rank、过滤条件和重排需要完整的结果列表，本地命中数无法保证，直接走远程
+        if prefer_local and not min_rank and not filtered and not rerank:
+            papers = await search_local_first("venue", query, num_results)
+        if papers is None:
+            papers = await fetch_search_results(
+                "venue",
+                query,
+                limit=None if need_datetime_sort or min_rank or filtered or rerank else num_results,
+            )
+
+        if papers and isinstance(papers[0], dict):
+            return papers
+
+        corpus = papers
+        if filtered:
+            with stage("filter"):
+                papers = filter_papers(
+                    papers, year_from, year_to, subjects, exclude_subjects, venues, exclude_venues
+                )
+
+        if rerank:
+            # 按等级过滤时先完整排序，过滤后再截取
+            with stage("rerank"):
+                papers = await run_in_thread(
+                    rerank_papers, papers, query, extracted_concepts, None if min_rank else num_results, corpus
+                )
+        elif need_datetime_sort:
+            with stage("sort"):
+                papers = sorted(papers, key=_PAPER_SORT_KEY, reverse=True)
+
+        # 不按等级过滤时只需标注最终返回的论文
+        if not min_rank:
+            papers = papers[:num_results]
+        if with_ccf_rank or min_rank:
+            with stage("ccf_rank"):
+                papers = await run_in_thread(annotate_ccf_rank, papers, min_rank)
+
+        return shape_papers(papers[:num_results], fields, abstract_chars, max_bytes)
+    except httpx.RequestError as e:
+        return [{"error": f"Network request failed: {str(e)}"}]
+    except httpx.HTTPStatusError as e:
+        return [
+            {"error": f"HTTP error {e.response.status_code}: {e.response.text[:100]}"}
+        ]
+    except Exception as e:
+        return [{"error": f"Search failed: {str(e)}"}]
+
+
+def merge_search_results(result_sets: list[tuple[str, str, list]], limit: int | None = None) -> list:
+    """
+    合并多个查询的结果，按规范化标题或 PDF 链接去重，
+    并按命中的查询数量（其次是最佳排名）排序，最多保留 limit 篇。
+
+    结果中的错误项（如某个查询解析失败）不参与合并，附上 source / query 后放在列表末尾。
+    """
+    merged = []
+    errors = []
+    by_key = {}
+    for source, query, papers in result_sets:
+        for position, paper in enumerate(papers):
+            if not isinstance(paper, Paper):
+                if isinstance(paper, dict) and "error" in paper:
+                    errors.append({**paper, "source": source, "query": query})
+                continue
+            keys = [f"url:{paper.pdf_url}"] if paper.pdf_url else []
+            if paper.title:
+                keys.append(f"title:{normalize_title(paper.title)}")
+
+            # PDF 链接和标题可能分别命中两个已有条目，此时将它们合并为一条
+            matches = sorted(
+                {id(by_key[key]): by_key[key] for key in keys if key in by_key}.values(),
+                key=lambda match: match["order"],
+            )
+            if matches:
+                entry = matches[0]
+                for other in matches[1:]:
+                    for other_query in other["queries"]:
+                        if other_query not in entry["queries"]:
+                            entry["queries"].append(other_query)
+                    for other_source in other["sources"]:
+                        if other_source not in entry["sources"]:
+                            entry["sources"].append(other_source)
+                    entry["best_position"] = min(entry["best_position"], other["best_position"])
+                    entry["keys"].extend(other["keys"])
+                    for other_key in other["keys"]:
+                        by_key[other_key] = entry
+                    other["merged"] = True
+            else:
+                entry = {
+                    "paper": paper,
+                    "queries": [],
+                    "sources": [],
+                    "best_position": position,
+                    "keys": [],
+                    "order": len(merged),
+                }
+                merged.append(entry)
+            for key in keys:
+                if key not in by_key:
+                    by_key[key] = entry
+                    entry["keys"].append(key)
+            if query not in entry["queries"]:
+                entry["queries"].append(query)
+            if source not in entry["sources"]:
+                entry["sources"].append(source)
+            entry["best_position"] = min(entry["best_position"], position)
+
+    merged = [entry for entry in merged if not entry.get("merged")]
+    merged.sort(key=lambda entry: (-len(entry["queries"]), entry["best_position"]))
+    return [
+        {
+            **entry["paper"].to_dict(),
+            "hits": len(entry["queries"]),
+            "matched_queries": entry["queries"],
+            "sources": entry["sources"],
+        }
+        for entry in merged[:limit]
+    ] + errors
+
+
+@mcp.tool(
+    name="multi_search",
+    description="""
+    Run several search queries at once on arXiv and/or venues and get one merged list.
+
+    Use this with the keywords and alternatives produced by `sequential_extract_academic_query`
+    instead of calling `search_on_arxiv` / `search_on_venue` once per keyword.
+    Results are deduplicated by title and PDF link, and papers matched by more queries rank higher.
+
+    Parameters:
+    - queries: List of simple keyword queries (no boolean operators)
+    - sources: Databases to search, any of "arxiv", "venue" (default: both)
+    - num_results: Max papers to return after merging (default: 50)
+    - results_per_query: Papers taken from each individual query before merging (default: 100)
+    - with_ccf_rank: Attach the CCF rank of venue papers as `ccf_rank` (default: False)
+
+    Returns: List of papers with `hits` (number of matching queries), `matched_queries` and `sources`,
+    followed by an `error` entry (with its `source` and `query`) for every query that failed.
+    """,
+)
+@traced_tool
+@client_limited
+async def multi_search(
+    queries: list[str],
+    sources: list[str] = None,
+    num_results: int = 50,
+    results_per_query: int = 100,
+    with_ccf_rank: bool = False,
+) -> list:
+    try:
+        queries = list(dict.fromkeys(q.strip() for q in queries or [] if q and q.strip()))
+        if not queries:
+            return [{"error": "Queries cannot be empty"}]
+
+        sources = sources or ["arxiv", "venue"]
+        if any(source not in SEARCH_CACHE_TTL for source in sources):
+            return [{"error": "Sources must be 'arxiv' or 'venue'"}]
+
+        if num_results <= 0 or results_per_query <= 0:
+            return [{"error": "Number of results must be positive"}]
+
+        searches = [(source, query) for source in dict.fromkeys(sources) for query in queries]
+        responses = await asyncio.gather(
+            *(
+                fetch_search_results(source, query, limit=results_per_query)
+                for source, query in searches
+            ),
+            return_exceptions=True,
+        )
+
+        result_sets = []
+        errors = []
+        for (source, query), response in zip(searches, responses):
+            if isinstance(response, BaseException):
+                errors.append({"error": f"Search failed: {str(response)}", "source": source, "query": query})
+            else:
+                result_sets.append((source, query, response[:results_per_query]))
+
+        papers = merge_search_results(result_sets, num_results)
+        if with_ccf_rank:
+            papers = await run_in_thread(annotate_ccf_rank, papers)
+
+        return papers + errors
+    except Exception as e:
+        return [{"error": f"Search failed: {str(e)}"}]
+
+
+DATA_DIR = Path("./data")
+DOWNLOAD_MANIFEST = DATA_DIR / ".manifest.json"
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+_download_manifest_lock = threading.Lock()
+
+
+def format_filename(title: str) -> str:
+    return re.sub(r'[<>:"/\\|?*]', "_", title.strip())[:100] + ".pdf"
+
+
+def _load_download_manifest() -> dict:
+    try:
+        return json.loads(DOWNLOAD_MANIFEST.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def lookup_downloaded_pdf(pdf_url: str) -> str | None:
+    """Return the file name of a previous complete download of `pdf_url`, if it is still intact on disk."""
+    with _download_manifest_lock:
+        entry = _load_download_manifest().get(pdf_url)
+    if not entry:
+        return None
+    try:
+        file_path = DATA_DIR / entry["file"]
+        # 大小一致时再比较内容哈希（按 mtime/size 缓存，未修改的文件不会重复计算）
+        if file_path.stat().st_size == entry["size"] and pdf_content_hash(file_path) == entry["sha256"]:
+            return entry["file"]
+    except (OSError, KeyError):
+        pass
+    return None
+
+
+def record_downloaded_pdf(pdf_url: str, file_name: str) -> None:
+    file_path = DATA_DIR / file_name
+    entry = {
+        "file": file_name,
+        "size": file_path.stat().st_size,
+        "sha256": pdf_content_hash(file_path),
+    }
+    # 清单的读-改-写在所有工作进程之间串行
+    with _download_manifest_lock, file_lock(DOWNLOAD_MANIFEST.with_suffix(".lock")):
+        manifest = _load_download_manifest()
+        manifest[pdf_url] = entry
+        tmp_path = DOWNLOAD_MANIFEST.with_name(f"{DOWNLOAD_MANIFEST.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, DOWNLOAD_MANIFEST)
+
+
+def _range_validator(response: httpx.Response) -> str | None:
+    """If-Range 只能使用强 ETag 或 Last-Modified"""
+    etag = response.headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("last-modified")
+
+
+def _read_part_validator(validator_path: Path) -> str | None:
+    try:
+        return validator_path.read_text(encoding="utf-8") or None
+    except OSError:
+        return None
+
+
+def _write_part_validator(validator_path: Path, validator: str | None) -> None:
+    if validator:
+        validator_path.write_text(validator, encoding="utf-8")
+    else:
+        validator_path.unlink(missing_ok=True)
+
+
+async def _stream_to_file(pdf_url: str, part_path: Path) -> None:
+    """
+    将 PDF 分块写入 part_path。已有部分文件时（上一次尝试中断），使用 Range 请求从已写入的位置续传；
+    重试由 download_pdf_with_retry 负责，这里每次只发起一次下载。
+
+    续传请求通过 If-Range 带上首次响应的 ETag / Last-Modified（保存在 .validator 文件中），
+    服务器上的文件已改变时会返回完整的新文件，而不是把两个版本拼接在一起；
+    没有可用的校验值时不续传，从头下载。
+    """
+    client = get_http_client(pdf_url)
+    validator_path = part_path.with_suffix(".validator")
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    validator = await run_in_thread(_read_part_validator, validator_path) if offset else None
+    headers = {"Range": f"bytes={offset}-", "If-Range": validator} if validator else None
+
+    async with client.stream("GET", pdf_url, headers=headers) as response:
+        resumed = headers is not None and response.status_code == 206
+        restart = headers is not None and (
+            response.status_code == 416
+            or (resumed and not response.headers.get("content-range", "").startswith(f"bytes {offset}-"))
+        )
+        if not restart:
+            response.raise_for_status()
+
+            # 文件已改变或服务器不支持 Range 时会返回完整内容（200），此时覆盖重写
+            if not resumed:
+                await run_in_thread(_write_part_validator, validator_path, _range_validator(response))
+            f = await run_in_thread(open, part_path, "ab" if resumed else "wb")
+            try:
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    await run_in_thread(f.write, chunk)
+            finally:
+                await run_in_thread(f.close)
+
+    if restart:
+        # 本地的部分文件与服务器不一致，丢弃后从头下载（不带 Range，不会再次进入这里）
+        await run_in_thread(part_path.unlink, missing_ok=True)
+        await _stream_to_file(pdf_url, part_path)
+
+
+async def _download_pdf(title: str, pdf_url: str) -> str:
+    existing = await run_in_thread(lookup_downloaded_pdf, pdf_url)
+    if existing:
+        return existing
+
+    # Ensure data directory exists
+    DATA_DIR.mkdir(exist_ok=True)
+
+    save_path = format_filename(title)
+    file_path = DATA_DIR / save_path
+    # 部分下载的文件以 URL 命名，保证续传时不会拼接其他论文的内容
+    url_digest = hashlib.sha256(pdf_url.encode()).hexdigest()[:16]
+    part_path = DATA_DIR / f".{url_digest}.part"
+
+    # 其他工作进程可能正在下载同一 URL：持锁期间独占 .part 文件，拿到锁后再查一次清单。
+    # 锁文件集中放在 .locks 目录里；flock 的锁文件删除后会与正在等待的进程失去互斥，因此不删除
+    async with file_lock_async(DATA_DIR / ".locks" / f"{url_digest}.lock"):
+        existing = await run_in_thread(lookup_downloaded_pdf, pdf_url)
+        if existing:
+            return existing
+        with stage("download"):
+            async with host_slot(pdf_url):
+                await _stream_to_file(pdf_url, part_path)
+        mark("download_bytes", (await run_in_thread(os.stat, part_path)).st_size)
+        await run_in_thread(os.replace, part_path, file_path)
+        await run_in_thread(part_path.with_suffix(".validator").unlink, missing_ok=True)
+        await run_in_thread(record_downloaded_pdf, pdf_url, save_path)
+    return save_path
+
+
+async def download_pdf(title: str, pdf_url: str) -> str:
+    """
+    Download `pdf_url` into the data directory and return the saved file name.
+
+    Concurrent calls for the same URL share a single transfer, and URLs that
+    were already downloaded completely are not fetched again. Either way the
+    file is named after the title of the first call for that URL; a later or
+    concurrent call with a different title gets that existing file name.
+    """
+    return await single_flight(
+        "download", pdf_url, functools.partial(_download_pdf, title, pdf_url)
+    )
+
+
+@mcp.tool(
+    name="download_paper_pdf",
+    description="Download pdf file of paper from the pdf_url. And return the path of the downloaded paper. A pdf_url that was already downloaded (or is being downloaded by another call) returns the existing file without downloading again; the file keeps the name derived from the title of the first download, even if `title` differs.",
+)
+@traced_tool
+@client_limited
+async def download_paper_pdf(title: str, pdf_url: str) -> str:
+    try:
+        if not title or not title.strip():
+            return "Error: Title cannot be empty"
+
+        if not pdf_url or not pdf_url.startswith(("http://", "https://")):
+            return "Error: Invalid PDF URL"
+
+        return await download_pdf_with_retry(title, pdf_url)
+
+    except httpx.RequestError as e:
+        return f"Error: Network request failed - {str(e)}"
+    except httpx.HTTPStatusError as e:
+        return f"Error: HTTP error {e.response.status_code}"
+    except OSError as e:
+        return f"Error: File operation failed - {str(e)}"
+    except Exception as e:
+        return f"Error: Download failed - {str(e)}"
+
+
+DOWNLOAD_CONCURRENCY = int(os.getenv("SCHOLAI_DOWNLOAD_CONCURRENCY", "8"))
+DOWNLOAD_RETRIES = int(os.getenv("SCHOLAI_DOWNLOAD_RETRIES", "3"))
+DOWNLOAD_BACKOFF = float(os.getenv("SCHOLAI_DOWNLOAD_BACKOFF", "1.0"))
+# 每个主机的 (最大并发数, 两次请求开始之间的最小间隔秒数)，子域名沿用父域名的设置
+DOWNLOAD_HOST_POLICIES = {
+    "arxiv.org": (2, 1.0),
+    "openreview.net": (4, 0.25),
+    "aclanthology.org": (4, 0.25),
+}
+DOWNLOAD_DEFAULT_HOST_POLICY = (int(os.getenv("SCHOLAI_DOWNLOAD_PER_HOST", "4")), 0.0)
+
+# 所有 download_papers 调用共享的并发上限，与 _host_slots 一样按事件循环创建
+_download_slots: dict[str, object] = {"loop": None, "semaphore": None}
+_host_slots: dict[str, tuple[asyncio.AbstractEventLoop, asyncio.Semaphore, list[float]]] = {}
+
+
+def _host_policy(host: str) -> tuple[int, float]:
+    for domain, policy in DOWNLOAD_HOST_POLICIES.items():
+        if host == domain or host.endswith(f".{domain}"):
+            return policy
+    return DOWNLOAD_DEFAULT_HOST_POLICY
+
+
+@asynccontextmanager
+async def host_slot(url: str):
+    """Hold one of the per-host download slots, spacing request starts by the host's interval."""
+    host = httpx.URL(url).host
+    concurrency, interval = _host_policy(host)
+    loop = asyncio.get_running_loop()
+    entry = _host_slots.get(host)
+    if entry is None or entry[0] is not loop:
+        entry = _host_slots[host] = (loop, asyncio.Semaphore(concurrency), [0.0])
+    _, semaphore, next_start = entry
+
+    async with semaphore:
+        if interval:
+            now = time.monotonic()
+            start_at = max(now, next_start[0])
+            next_start[0] = start_at + interval
+            if start_at > now:
+                await asyncio.sleep(start_at - now)
+        yield
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return False
+
+
+def _download_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    if _download_slots["loop"] is not loop:
+        _download_slots.update(loop=loop, semaphore=asyncio.Semaphore(DOWNLOAD_CONCURRENCY))
+    return _download_slots["semaphore"]
+
+
+async def download_pdf_with_retry(title: str, pdf_url: str, result: dict | None = None) -> str:
+    """
+    download_pdf with exponential backoff on connection errors, 429 and 5xx responses.
+
+    This is the only retry layer for downloads; each retry resumes the partial
+    file left by the previous attempt. The attempt count is stored in
+    `result["attempts"]` when `result` is given.
+    """
+    for attempt in range(1, DOWNLOAD_RETRIES + 2):
+        if result is not None:
+            result["attempts"] = attempt
+        try:
+            return await download_pdf(title, pdf_url)
+        except Exception as e:
+            if attempt > DOWNLOAD_RETRIES or not _is_retryable(e):
+                raise
+        await asyncio.sleep(DOWNLOAD_BACKOFF * 2 ** (attempt - 1))
+
+
+async def _download_with_retry(title: str, pdf_url: str) -> dict:
+    result = {"title": title, "pdf_url": pdf_url}
+    start = time.perf_counter()
+    async with _download_semaphore():
+        try:
+            result["path"] = await download_pdf_with_retry(title, pdf_url, result)
+        except Exception as e:
+            if isinstance(e, httpx.HTTPStatusError):
+                result["error"] = f"HTTP error {e.response.status_code}"
+            else:
+                result["error"] = f"Download failed - {str(e)}"
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+@mcp.tool(
+    name="download_papers",
+    description="""
+    Download many papers at once instead of calling `download_paper_pdf` repeatedly.
+
+    Files are fetched concurrently with per-host rate limits (e.g. arxiv.org), failed
+    downloads are retried with exponential backoff, and already-downloaded URLs are skipped.
+    Files are named after the title of the first download of each URL, so a paper requested
+    again under a different title returns the existing file name.
+
+    Parameters:
+    - papers: List of objects with `title` and `pdf_url` (search results can be passed directly)
+
+    Returns: Per-paper results with the saved `path` or an `error`, attempts and seconds taken.
+    """,
+)
+@traced_tool
+@client_limited
+async def download_papers(papers: list[dict]) -> dict:
+    try:
+        if not papers:
+            return {"error": "Papers list cannot be empty"}
+
+        start = time.perf_counter()
+        jobs = []
+        results = [None] * len(papers)
+        for i, paper in enumerate(papers):
+            title = (paper.get("title") or "").strip()
+            pdf_url = paper.get("pdf_url") or ""
+            if not title:
+                results[i] = {"pdf_url": pdf_url, "error": "Title cannot be empty"}
+            elif not pdf_url.startswith(("http://", "https://")):
+                results[i] = {"title": title, "pdf_url": pdf_url, "error": "Invalid PDF URL"}
+            else:
+                jobs.append((i, _download_with_retry(title, pdf_url)))
+
+        for (i, _), result in zip(jobs, await asyncio.gather(*(job for _, job in jobs))):
+            results[i] = result
+
+        return {
+            "results": results,
+            "downloaded": sum(1 for result in results if "path" in result),
+            "failed": sum(1 for result in results if "error" in result),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+    except Exception as e:
+        return {"error": f"Bulk download failed: {str(e)}"}
+
+
+@mcp.tool(
+    name="sequential_extract_academic_query",
+    description="""
+    Note: All processes and results must be in English!
+    A tool for progressively analyzing and extracting users' academic search intent  
+
+    This tool helps transform vague user expressions into precise academic search queries. Through a multi-step analytical process, it deeply understands users' genuine research needs.  
+
+    Use cases:  
+    - When users express ambiguous or overly broad research interests  
+    - Converting natural language into academic keywords  
+    - Determining optimal search strategies and database selection  
+    - Optimizing queries for the most relevant results  
+    - Handling interdisciplinary or emerging field search needs  
+
+    Analysis steps include:  
+    1. Intent understanding: Parsing core research interests  
+    2. Domain identification: Determining primary/secondary research fields  
+    3. Concept extraction: Identifying key technical terms and concepts  
+    4. Query construction: Combining keywords to form search queries  
+    5. Strategy optimization: Selecting appropriate search strategies and filters  
+    6. Validation refinement: Verifying query completeness and accuracy  
+
+    Parameter specifications:  
+    - analysis_step: Current step's detailed content and reasoning  
+    - step_number: Current step index  
+    - total_steps: Estimated total steps (adjustable)  
+    - next_step_needed: Whether further analysis is required  
+    - extracted_concepts: List of identified key concepts  
+    - databases: Search databases (options: arxiv, venue)  
+    - search_strategy: Recommended search approach  
+    - confidence_level: Analysis confidence score (0-1)  
+    - needs_clarification: Whether user clarification is needed  
+    - clarification_questions: List of follow-up questions for users  
+    - date_range: Timeframe (options: recent, all)  
+    - datetime_sort: Time-based sorting (options: True, False)  
+
+    Output format:  
+    Returns JSON containing:  
+    - Generated search queries  
+    - Recommended databases/tools  
+    - Search parameter configurations  
+    - Analysis confidence level  
+    - Potential query variations
+    """,
+)
+@traced_tool
+def sequential_extract_academic_query(
+    analysis_step: str,
+    step_number: int,
+    total_steps: int,
+    next_step_needed: bool,
+    extracted_concepts: list[str] = None,
+    databases: str = None,
+    search_strategy: str = None,
+    confidence_level: float = None,
+    needs_clarification: bool = False,
+    clarification_questions: list[str] = None,
+    date_range: str = None,
+    datetime_sort: bool = False,
+) -> str:
+    try:
+        if not analysis_step or step_number <= 0 or total_steps <= 0:
+            return json.dumps({"error": "Invalid parameters provided"})
+
+        result = {
+            "step_number": step_number,
+            "total_steps": total_steps,
+            "next_step_needed": next_step_needed,
+            "analysis_step": analysis_step,
+            "confidence_level": confidence_level or 0.5,
+        }
+
+        if not next_step_needed:
+            concepts = extracted_concepts or []
+            result.update(
+                {
+                    "query_config": {
+                        "keywords": concepts[:3],
+                        "databases": databases,
+                        "filters": {
+                            "date_range": date_range,
+                            "sort": "datetime" if datetime_sort else "relevance",
+                        },
+                    },
+                    "alternatives": (
+                        [{"keywords": concepts[3:6]}] if len(concepts) > 3 else []
+                    ),
+                    "analysis_complete": True,
+                }
+            )
+        else:
+            result.update(
+                {
+                    "extracted_concepts": extracted_concepts or [],
+                    "databases": databases,
+                    "search_strategy": search_strategy,
+                    "needs_clarification": needs_clarification,
+                    "clarification_questions": clarification_questions or [],
+                }
+            )
+
+        return json.dumps(result, indent=2)
+    except Exception as e:
+        return json.dumps({"error": f"Query extraction failed: {str(e)}"})
+
+
+@mcp.tool(
+    name="list_downloaded_papers",
+    description="When you need to read a paper, first List all paths of downloaded papers. ",
+)
+@traced_tool
+async def list_downloaded_papers() -> list[str]:
+    try:
+        data_dir = DATA_DIR
+        if not data_dir.exists():
+            return ["Error: Data directory does not exist"]
+
+        pdf_files = await run_in_thread(
+            lambda: [file.name for file in data_dir.iterdir() if file.suffix == ".pdf"]
+        )
+        return pdf_files if pdf_files else ["No PDF files found"]
+    except PermissionError:
+        return ["Error: Permission denied accessing data directory"]
+    except Exception as e:
+        return [f"Error: Failed to list files - {str(e)}"]
+
+
+TEXT_CACHE_DIR = CACHE_DIR / "text"
+TEXT_CACHE_MAX_BYTES = int(float(os.getenv("SCHOLAI_TEXT_CACHE_MAX_MB", "512")) * 2**20)
+# 大于该大小的缓存条目通过 mmap 读取，避免先复制到 Python bytes
+TEXT_CACHE_MMAP_MIN_BYTES = 2**20
+
+# (path, mtime_ns, size) -> sha256，避免重复计算未修改文件的哈希
+_pdf_hashes: dict[tuple[str, int, int], str] = {}
+_text_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def pdf_content_hash(pdf_path: str | Path) -> str:
+    stat = os.stat(pdf_path)
+    stat_key = (str(Path(pdf_path).resolve()), stat.st_mtime_ns, stat.st_size)
+    digest = _pdf_hashes.get(stat_key)
+    if digest is None:
+        sha256 = hashlib.sha256()
+        with open(pdf_path, "rb") as f:
+            while chunk := f.read(2**20):
+                sha256.update(chunk)
+        digest = _pdf_hashes[stat_key] = sha256.hexdigest()
+    return digest
+
+
+def text_cache_key(pdf_hash: str, extractor: str, **settings) -> str:
+    """Cache key for the text of one PDF content hash produced by one extractor configuration."""
+    payload = json.dumps(
+        {"pdf": pdf_hash, "extractor": extractor, **settings}, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _text_cache_path(key: str) -> Path:
+    return TEXT_CACHE_DIR / key[:2] / f"{key}.z"
+
+
+def text_cache_get(key: str) -> str | None:
+    path = _text_cache_path(key)
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size >= TEXT_CACHE_MMAP_MIN_BYTES:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    data = zlib.decompress(mapped)
+            else:
+                data = zlib.decompress(f.read())
+        # 以修改时间记录最近使用时间，用于 LRU 淘汰
+        os.utime(path)
+    except (OSError, zlib.error):
+        _text_cache_stats["misses"] += 1
+        return None
+
+    _text_cache_stats["hits"] += 1
+    return data.decode("utf-8")
+
+
+def _scan_text_cache() -> tuple[list, int]:
+    entries = []
+    total = 0
+    for entry in TEXT_CACHE_DIR.glob("*/*.z"):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry))
+        total += stat.st_size
+    return entries, total
 
-async def extract_papers_from_html(html_content, venue=True):
+
+def text_cache_put(key: str, text: str) -> None:
+    path = _text_cache_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    data = zlib.compress(text.encode("utf-8"))
+    tmp_path.write_bytes(data)
+
+    # 缓存总大小记录在 .size 中，所有工作进程在同一把锁下增量更新，只有超出上限时才重新扫描目录
+    with file_lock(TEXT_CACHE_DIR / ".evict.lock"):
+        try:
+            replaced = path.stat().st_size
+        except OSError:
+            replaced = 0
+        os.replace(tmp_path, path)
+
+        size_file = TEXT_CACHE_DIR / ".size"
+        try:
+            total = int(size_file.read_text()) + len(data) - replaced
+        except (OSError, ValueError):
+            total = None
+        if total is None or total > TEXT_CACHE_MAX_BYTES:
+            # 计数缺失或超出上限（也可能只是计数因外部删除而偏大）时以实际目录内容为准
+            entries, total = _scan_text_cache()
+            for _, size, entry in sorted(entries):
+                if total <= TEXT_CACHE_MAX_BYTES:
+                    break
+                if entry == path:
+                    continue
+                entry.unlink(missing_ok=True)
+                total -= size
+                _text_cache_stats["evictions"] += 1
+        size_file.write_text(str(total))
+
+
+def text_cache_info() -> dict:
+    entries, total = _scan_text_cache()
+    return {**_text_cache_stats, "entries": len(entries), "bytes": total}
+
+
+async def upload_file_to_llamaparse(
+    file_path: str | Path,
+    token: str,
+    compact_markdown_table: bool = True,
+    extract_charts: bool = True,
+    structured_output: bool = True,
+    file_bytes: bytes = None,
+) -> httpx.Response:
     """
-    从HTML内容中提取论文信息
+    Uploads a file to the LlamaParse API, converting a cURL command to an httpx function.
+
+    Args:
+        file_path: The local path to the file to be uploaded.
+        token: The API bearer token for authentication.
+        compact_markdown_table: Flag to enable compact markdown table parsing.
+        extract_charts: Flag to enable chart extraction.
+        structured_output: Flag to enable structured output.
+        file_bytes: Content to upload instead of reading file_path (which then only names the upload).
+
+    Returns:
+        The response object from the httpx request.
     """
+    url = f"{LLAMAPARSE_API_URL}/api/v1/parsing/upload"
+    headers = {"Accept": "application/json", "Authorization": f"Bearer {token}"}
+    data = {
+        "compact_markdown_table": str(compact_markdown_table).lower(),
+        "extract_charts": str(extract_charts).lower(),
+        "structured_output": str(structured_output).lower(),
+    }
+
+    file_path = Path(file_path)
+    if file_bytes is None:
+        file_bytes = await run_in_thread(file_path.read_bytes)
+    files = {"file": (file_path.name, file_bytes)}
+    response = await get_http_client(url).post(
+        url, headers=headers, data=data, files=files, timeout=HTTP_UPLOAD_TIMEOUT
+    )
+    # Raise an exception for bad status codes (4xx or 5xx)
+    response.raise_for_status()
+    return response.json()
+
+
+async def get_job_status(job_id: str, token: str) -> httpx.Response:
+    """Gets the parsing job status."""
+    url = f"{LLAMAPARSE_API_URL}/api/v1/parsing/job/{job_id}"
+    headers = {"Accept": "application/json", "Authorization": f"Bearer {token}"}
+
+    response = await get_http_client(url).get(url, headers=headers)
+    response.raise_for_status()
+    return response
+
+
+async def get_job_result_markdown(job_id: str, token: str) -> httpx.Response:
+    """Gets the parsing job result in markdown format."""
+    url = f"{LLAMAPARSE_API_URL}/api/v1/parsing/job/{job_id}/result/markdown"
+    headers = {"Accept": "application/json", "Authorization": f"Bearer {token}"}
+
+    response = await get_http_client(url).get(url, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+
+async def get_job_result_json(job_id: str, token: str) -> dict:
+    """Gets the parsing job result as JSON, with one markdown entry per page."""
+    url = f"{LLAMAPARSE_API_URL}/api/v1/parsing/job/{job_id}/result/json"
+    headers = {"Accept": "application/json", "Authorization": f"Bearer {token}"}
+
+    response = await get_http_client(url).get(url, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+
+# LlamaParse 轮询：首次轮询间隔按已完成任务的每页耗时自适应，之后指数退避
+LLAMAPARSE_POLL_INITIAL = float(os.getenv("SCHOLAI_LLAMAPARSE_POLL_INITIAL", "1"))
+LLAMAPARSE_POLL_MAX = float(os.getenv("SCHOLAI_LLAMAPARSE_POLL_MAX", "15"))
+LLAMAPARSE_POLL_BACKOFF = 1.5
+LLAMAPARSE_DEADLINE = float(os.getenv("SCHOLAI_LLAMAPARSE_DEADLINE", "900"))
+# 保留的已结束任务数量，供 get_parse_result 稍后取回
+LLAMAPARSE_FINISHED_JOBS = 256
+
+_parse_jobs: OrderedDict[str, dict] = OrderedDict()
+_parse_pollers: dict[asyncio.AbstractEventLoop, asyncio.Task] = {}
+_parse_job_stats = {"submitted": 0, "succeeded": 0, "failed": 0, "polls": 0, "avg_seconds_per_page": None}
+
+
+def _finish_parse_job(job: dict, status: str, markdown: str = None, error: str = None) -> None:
+    if job["done"].is_set():
+        # 等待方已按截止时间结束了任务，之后返回的轮询结果不再生效
+        return
+    job.update(status=status, markdown=markdown, error=error, finished_at=time.monotonic())
+    job["done"].set()
+    if job["job_id"] is None or job["page_count"] is None:
+        # 命中文本缓存或接管的其他进程的任务，不计入远程任务统计
+        pass
+    elif status == "SUCCESS":
+        _parse_job_stats["succeeded"] += 1
+        per_page = (job["finished_at"] - job["submitted_at"]) / max(job["page_count"], 1)
+        average = _parse_job_stats["avg_seconds_per_page"]
+        _parse_job_stats["avg_seconds_per_page"] = (
+            per_page if average is None else 0.8 * average + 0.2 * per_page
+        )
+    else:
+        _parse_job_stats["failed"] += 1
+
+    finished = [handle for handle, other in _parse_jobs.items() if other["done"].is_set()]
+    for handle in finished[: max(len(finished) - LLAMAPARSE_FINISHED_JOBS, 0)]:
+        del _parse_jobs[handle]
+
+
+def _first_poll_delay(page_count: int) -> float:
+    average = _parse_job_stats["avg_seconds_per_page"]
+    if average is None:
+        return LLAMAPARSE_POLL_INITIAL
+    return min(max(0.8 * average * page_count, LLAMAPARSE_POLL_INITIAL), LLAMAPARSE_POLL_MAX)
+
+
+async def _cache_parse_result(cache_key: str | None, text: str) -> None:
+    if not cache_key:
+        return
     try:
-        if not html_content or not html_content.strip():
-            return []
+        await run_in_thread(text_cache_put, cache_key, text)
+    except OSError:
+        # 缓存写入失败不影响本次解析结果
+        pass
 
-        soup = BeautifulSoup(html_content, "html.parser")
-        papers = []
-
-        # 找到所有论文div
-        paper_divs = soup.find_all("div", class_="panel paper")
-
-        for paper_div in paper_divs:
-            paper_info = {}
-
-            # 提取标题
-            title_link = paper_div.find("a", class_="title-link")
-            if title_link:
-                paper_info["title"] = title_link.get_text(strip=True)
-            pdf_url = paper_div.find("a", class_="title-pdf")
-            if pdf_url:
-                onclick_attr = pdf_url.get("onclick", "")
-                # 方法1: 处理新格式 - 直接URL (如arxiv)
-                # 匹配: togglePdf('id', 'https://arxiv.org/pdf/xxx', this)
-                direct_url_match = re.search(
-                    r"togglePdf\('[^']*',\s*'([^']+)',", onclick_attr
-                )
-                if direct_url_match:
-                    pdf_url = direct_url_match.group(1)
-                    # 检查是否是直接的PDF链接
-                    if pdf_url.startswith("http") and not pdf_url.startswith(
-                        "/pdf?url="
-                    ):
-                        paper_info["pdf_url"] = pdf_url
-                    else:
-                        # 方法2: 处理旧格式 - 包装的URL
-                        # 从 /pdf?url=actual_url 中提取 actual_url
-                        actual_url_match = re.search(r"url=([^&]+)", pdf_url)
-                        if actual_url_match:
-                            paper_info["pdf_url"] = actual_url_match.group(1)
-
-            # 提取第一作者
-            authors_p = paper_div.find("p", id=lambda x: x and x.startswith("authors-"))
-            if authors_p:
-                # 查找所有作者链接
-                author_links = authors_p.find_all("a", class_="author")
-                if author_links:
-                    # 只保留第一作者
-                    first_author = author_links[0].get_text(strip=True)
-                    paper_info["first_author"] = first_author
-                else:
-                    # 如果没有找到author类的链接，尝试从文本中提取
-                    authors_text = authors_p.get_text(strip=True)
-                    # 移除"Authors:"前缀，然后按逗号分割取第一个
-                    if "Authors:" in authors_text:
-                        authors_clean = authors_text.replace("Authors:", "").strip()
-                        first_author = authors_clean.split(",")[0].strip()
-                        paper_info["first_author"] = first_author
-
-            # 提取摘要
-            summary_p = paper_div.find("p", class_="summary")
-            if summary_p:
-                paper_info["abstract"] = summary_p.get_text(strip=True)
-
-            # 提取出版年份
-            publication_time = None
-
-            if not venue:
-                date = paper_div.find("p", class_="metainfo date")
-                if date:
-                    paper_info["publication_time"] = date.get_text(strip=True).split(
-                        "Publish: "
-                    )[-1]
 
+async def _poll_parse_job(job: dict, token: str) -> None:
+    _parse_job_stats["polls"] += 1
+    try:
+        body = (await get_job_status(job["job_id"], token)).json()
+        status = job["upstream_status"] = body.get("status")
+        if status == "SUCCESS":
+            if job["pages"] is None:
+                result = await get_job_result_markdown(job["job_id"], token)
+                markdown = result.get("markdown", "")
+                await _cache_parse_result(job["cache_key"], markdown)
             else:
-                subjects_p = paper_div.find("p", class_="metainfo subjects")
-                if subjects_p:
-                    subject_links = subjects_p.find_all("a")
-                    subjects = [
-                        subject.get_text(strip=True) for subject in subject_links
-                    ]
-                    paper_info["subjects"] = subjects
+                # 部分页面的任务按页取回，便于按原页码拼接
+                result = await get_job_result_json(job["job_id"], token)
+                job["page_markdown"] = [page.get("md", "") for page in result.get("pages", [])]
+                markdown = "\n\n".join(job["page_markdown"])
+                await _cache_parse_result(job["cache_key"], json.dumps(job["page_markdown"]))
+            _finish_parse_job(job, "SUCCESS", markdown=markdown)
+            return
+        if status in ("ERROR", "CANCELED"):
+            message = body.get("error_message")
+            error = f"LlamaParse job {status.lower()}" + (f" - {message}" if message else "")
+            _finish_parse_job(job, "ERROR", error=error)
+            return
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code < 500 and e.response.status_code != 429:
+            _finish_parse_job(job, "ERROR", error=f"HTTP error {e.response.status_code}")
+            return
+    except httpx.RequestError:
+        # 网络抖动：按退避间隔继续轮询，直到超过截止时间
+        pass
+    except Exception as e:
+        # 无法解析的响应等：只结束这一个任务，不影响共享的轮询任务
+        _finish_parse_job(job, "ERROR", error=f"Unexpected LlamaParse response - {str(e)}")
+        return
 
-                    for subject in subjects:
-                        year_match = re.search(r"\.(\d{4})", subject)
-                        if year_match:
-                            publication_time = int(year_match.group(1))
-                            break
+    now = time.monotonic()
+    if now >= job["deadline"]:
+        _finish_parse_job(job, "TIMEOUT", error="LlamaParse job did not finish before the deadline")
+        return
+    job["interval"] = min(job["interval"] * LLAMAPARSE_POLL_BACKOFF, LLAMAPARSE_POLL_MAX)
+    job["next_poll"] = min(now + job["interval"], job["deadline"])
 
-                if publication_time:
-                    paper_info["publication_time"] = publication_time
 
-            papers.append(paper_info)
+async def _run_parse_poller(token: str) -> None:
+    """Poll every outstanding job of this event loop from one task until none are left."""
+    while True:
+        pending = [job for job in _parse_jobs.values() if not job["done"].is_set()]
+        if not pending:
+            return
+        now = time.monotonic()
+        due = [job for job in pending if job["next_poll"] <= now]
+        if due:
+            await asyncio.gather(*(_poll_parse_job(job, token) for job in due), return_exceptions=True)
+        else:
+            await asyncio.sleep(min(job["next_poll"] for job in pending) - now)
 
-        return papers
-    except Exception as e:
-        return [{"error": f"Failed to parse HTML content: {str(e)}"}]
 
+def _ensure_parse_poller(token: str) -> None:
+    loop = asyncio.get_running_loop()
+    poller = _parse_pollers.get(loop)
+    if poller is None or poller.done():
+        if poller is not None and not poller.cancelled():
+            # 轮询任务异常退出后重新启动，未完成的任务继续轮询
+            poller.exception()
+        # 轮询任务比发起它的工具调用活得久，不继承调用方的追踪
+        context = contextvars.copy_context()
+        context.run(_current_trace.set, None)
+        _parse_pollers[loop] = loop.create_task(_run_parse_poller(token), context=context)
 
-async def load_ccf_ranking() -> dict:
-    try:
-        with open("ccfrank.yml", "r", encoding="utf-8") as f:
-            yaml_data = yaml.safe_load(f)
 
-        if not yaml_data or "venues" not in yaml_data:
-            return {}
+def _new_parse_job(file_name: str | None, cache_key: str | None, pages: list[int] = None) -> dict:
+    return {
+        "job_id": None,
+        "file": file_name,
+        "cache_key": cache_key,
+        "status": "PENDING",
+        # 最近一次从 LlamaParse 状态接口取得的状态，从未成功查询时为 None
+        "upstream_status": None,
+        "markdown": None,
+        "error": None,
+        "done": asyncio.Event(),
+        "submitted_at": time.monotonic(),
+        "finished_at": None,
+        "pages": pages,
+        "page_count": len(pages) if pages is not None else None,
+        "page_markdown": None,
+    }
 
-        ccf_rank_map = {}
-        for venue in yaml_data["venues"]:
-            rank = venue.get("rank")
-            abbr = venue.get("abbr")
-            full_name = venue.get("name")
 
-            if abbr:
-                ccf_rank_map[abbr.lower()] = rank
-            if full_name:
-                ccf_rank_map[full_name.lower()] = rank
+async def submit_parse_job(
+    pdf_path: str | Path, token: str, deadline: float = None, pages: list[int] = None
+) -> str:
+    """
+    Start parsing one PDF with LlamaParse and return a job handle immediately.
 
-        return ccf_rank_map
-    except FileNotFoundError:
-        return {}
-    except yaml.YAMLError:
-        return {}
-    except Exception:
-        return {}
+    With pages (0-based), only those pages are uploaded as a sub-PDF and the
+    finished job also carries `page_markdown`, one entry per requested page.
+    Cached results and PDFs that are already being parsed reuse the existing
+    handle instead of uploading again.
+    """
+    settings = {"compact_markdown_table": True, "extract_charts": True, "structured_output": True}
+    if pages is not None:
+        settings["pages"] = list(pages)
+    cache_key = text_cache_key(
+        await run_in_thread(pdf_content_hash, pdf_path), "llamaparse", **settings
+    )
+    for handle, job in _parse_jobs.items():
+        if job["cache_key"] == cache_key and job["status"] in ("PENDING", "SUCCESS"):
+            return handle
 
+    # 同一文件的并发提交在任务登记之前共享同一次上传
+    return await single_flight(
+        "llamaparse_submit",
+        cache_key,
+        functools.partial(
+            _submit_parse_job, pdf_path, token, cache_key, deadline, settings.get("pages")
+        ),
+    )
 
-@mcp.tool(name="get_ccf_rank", description="Get the CCF rank of a venue")
-async def get_ccf_rank(venue: str) -> str:
+
+async def _submit_parse_job(
+    pdf_path: str | Path, token: str, cache_key: str, deadline: float | None, pages: list[int] | None
+) -> str:
+    job = _new_parse_job(Path(pdf_path).name, cache_key, pages)
+
+    markdown = await run_in_thread(text_cache_get, cache_key)
+    if markdown is not None:
+        handle = f"cached-{cache_key[:16]}"
+        _parse_jobs[handle] = job
+        if pages is not None:
+            job["page_markdown"] = json.loads(markdown)
+            markdown = "\n\n".join(job["page_markdown"])
+        _finish_parse_job(job, "SUCCESS", markdown=markdown)
+        return handle
+
+    file_bytes = None
+    if pages is not None:
+        file_bytes = await run_in_process(extract_pdf_subset, str(pdf_path), job["pages"])
+    else:
+        job["page_count"] = await run_in_thread(pdf_page_count, str(pdf_path))
+    upload_response = await upload_file_to_llamaparse(pdf_path, token, file_bytes=file_bytes)
+    mark("upload_bytes", len(file_bytes) if file_bytes is not None else Path(pdf_path).stat().st_size)
+    # 任务从上传完成时开始计时
+    now = time.monotonic()
+    job.update(
+        job_id=upload_response.get("id"),
+        submitted_at=now,
+        deadline=now + (deadline or LLAMAPARSE_DEADLINE),
+        interval=_first_poll_delay(job["page_count"]),
+    )
+    job["next_poll"] = min(now + job["interval"], job["deadline"])
+    handle = job["job_id"]
+    _parse_jobs[handle] = job
+    _parse_job_stats["submitted"] += 1
+    _ensure_parse_poller(token)
+    return handle
+
+
+def parse_job_info(handle: str) -> dict:
+    job = _parse_jobs.get(handle)
+    if job is None:
+        return {"job_id": handle, "status": "UNKNOWN", "error": "Unknown job handle"}
+    info = {"job_id": handle, "file": job["file"], "status": job["status"]}
+    end = job["finished_at"] or time.monotonic()
+    info["seconds"] = round(end - job["submitted_at"], 2)
+    if job["markdown"] is not None:
+        info["markdown"] = job["markdown"]
+    if job["error"]:
+        info["error"] = job["error"]
+    return info
+
+
+def _find_text_cache_key(prefix: str) -> str | None:
+    if not re.fullmatch(r"[0-9a-f]{16}", prefix):
+        return None
+    return next((path.stem for path in (TEXT_CACHE_DIR / prefix[:2]).glob(f"{prefix}*.z")), None)
+
+
+_LLAMAPARSE_JOB_ID_RE = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+
+
+async def _adopt_parse_job(handle: str) -> dict | None:
+    """
+    Register a handle issued by another worker process (or before a restart).
+
+    Cached handles are resolved from the shared text cache; handles in the
+    LlamaParse job-id format (a UUID) are polled. Returns None, without a
+    network call for malformed handles, when the handle cannot be resolved.
+    Handles whose status lookup fails are not remembered; jobs that failed on
+    LlamaParse are kept and report their error.
+    """
+    if handle.startswith("cached-"):
+        cache_key = await run_in_thread(_find_text_cache_key, handle[len("cached-") :])
+        markdown = cache_key and await run_in_thread(text_cache_get, cache_key)
+        if markdown is None:
+            return None
+        job = _parse_jobs[handle] = _new_parse_job(None, cache_key)
+        _finish_parse_job(job, "SUCCESS", markdown=markdown)
+        return job
+
+    # 只有 LlamaParse 格式的任务 ID（UUID）才去查询，其他句柄直接视为未知
+    if not _LLAMAPARSE_JOB_ID_RE.fullmatch(handle):
+        return None
+    token = os.getenv("LLAMAINDEX_API_KEY", None)
+    if not token:
+        return None
+    # 原始文件和提交时间未知：结果不写入文本缓存，也不计入每页耗时统计
+    now = time.monotonic()
+    job = _parse_jobs[handle] = _new_parse_job(None, None)
+    job.update(
+        job_id=handle,
+        deadline=now + LLAMAPARSE_DEADLINE,
+        interval=LLAMAPARSE_POLL_INITIAL,
+        next_poll=now,
+    )
+    await _poll_parse_job(job, token)
+    if job["status"] == "ERROR" and job["upstream_status"] is None:
+        # 状态查询本身失败（例如 ID 不存在）的句柄不留在任务表里，之后仍按未知句柄处理；
+        # LlamaParse 上真实失败的任务保留，返回其错误信息
+        if _parse_jobs.get(handle) is job:
+            del _parse_jobs[handle]
+        return None
+    if not job["done"].is_set():
+        _ensure_parse_poller(token)
+    return job
+
+
+async def wait_parse_job(handle: str, timeout: float = None) -> dict:
+    """
+    Wait up to timeout seconds (if None, until the job's deadline) for a job
+    and return its info. Waits never outlast the job's deadline.
+    """
+    job = _parse_jobs.get(handle)
+    if job is None:
+        job = await _adopt_parse_job(handle)
+    if job is not None and not job["done"].is_set():
+        token = os.getenv("LLAMAINDEX_API_KEY", None)
+        if token:
+            _ensure_parse_poller(token)
+        remaining = max(job["deadline"] - time.monotonic(), 0)
+        try:
+            await asyncio.wait_for(
+                job["done"].wait(), remaining if timeout is None else min(timeout, remaining)
+            )
+        except asyncio.TimeoutError:
+            if time.monotonic() >= job["deadline"]:
+                _finish_parse_job(job, "TIMEOUT", error="LlamaParse job did not finish before the deadline")
+    return parse_job_info(handle)
+
+
+# 混合解析：只有包含表格、图片/图表或文本质量差的页面才交给 LlamaParse
+LLAMAPARSE_HYBRID = os.getenv("SCHOLAI_LLAMAPARSE_HYBRID", "1") != "0"
+# 图片覆盖页面面积的比例超过该值视为图片页（含扫描页）
+HARD_PAGE_IMAGE_RATIO = float(os.getenv("SCHOLAI_HARD_PAGE_IMAGE_RATIO", "0.5"))
+# 矢量绘图指令数超过该值视为图表页
+HARD_PAGE_MIN_DRAWINGS = int(os.getenv("SCHOLAI_HARD_PAGE_MIN_DRAWINGS", "40"))
+# 每页文本字符数低于该值且有图形内容时视为文本密度过低
+HARD_PAGE_MIN_CHARS = 200
+# 表格标题：编号后带标点（"Table 1:"、"TABLE II."），且位于文本块的前两行；
+# 正文中以 "Table 1 shows ..." 开头的句子不算
+_TABLE_CAPTION_RE = re.compile(r"(?:Table|TABLE|Tab\.)\s+[0-9IVX]+\s*[.:]")
+# 页面分类规则变化时递增，使混合解析的缓存结果失效
+HARD_PAGE_RULES_VERSION = 2
+
+
+def _has_table_caption(page) -> bool:
+    for block in page.get_text("blocks"):
+        if block[6] != 0:
+            continue
+        lines = block[4].lstrip().split("\n", 2)[:2]
+        if any(_TABLE_CAPTION_RE.match(line.lstrip()) for line in lines):
+            return True
+    return False
+
+
+def classify_pdf_pages(pdf_path: str) -> list[tuple[str, str | None]]:
+    """
+    Extract every page locally and flag the ones PyMuPDF text cannot represent
+    well. Returns (text, reason) per page; reason is None for plain-text pages
+    and one of "table", "image", "chart" or "text_quality" otherwise.
+    """
+    pages = []
+    with fitz.open(pdf_path) as pdf_document:
+        for page in pdf_document:
+            text = page.get_text()
+            area = abs(page.rect) or 1.0
+            image_area = sum(
+                abs(fitz.Rect(image["bbox"]) & page.rect) for image in page.get_image_info()
+            )
+            drawings = len(page.get_drawings())
+            reason = None
+            if _has_table_caption(page):
+                reason = "table"
+            elif image_area / area >= HARD_PAGE_IMAGE_RATIO:
+                reason = "image"
+            elif drawings >= HARD_PAGE_MIN_DRAWINGS:
+                reason = "chart"
+            elif text and text.count("\ufffd") / len(text) > 0.01:
+                # 字体编码缺失导致的乱码
+                reason = "text_quality"
+            elif len(text.strip()) < HARD_PAGE_MIN_CHARS and (image_area or drawings):
+                reason = "text_quality"
+            pages.append((text, reason))
+    return pages
+
+
+def extract_pdf_subset(pdf_path: str, pages: list[int]) -> bytes:
+    """Build a PDF containing only the given 0-based pages, in order (runs in a worker process)."""
+    with fitz.open(pdf_path) as pdf_document, fitz.open() as subset:
+        for page_num in pages:
+            subset.insert_pdf(pdf_document, from_page=page_num, to_page=page_num)
+        return subset.tobytes(garbage=3, deflate=True)
+
+
+async def read_paper_hybrid(pdf_path: str | Path, token: str) -> str:
+    """
+    Read a PDF locally with PyMuPDF and send only the hard pages to LlamaParse,
+    then stitch the remote markdown back in page order.
+    """
+    cache_key = text_cache_key(
+        await run_in_thread(pdf_content_hash, pdf_path),
+        "hybrid",
+        version=fitz.VersionBind,
+        image_ratio=HARD_PAGE_IMAGE_RATIO,
+        min_drawings=HARD_PAGE_MIN_DRAWINGS,
+        rules=HARD_PAGE_RULES_VERSION,
+    )
+    text = await run_in_thread(text_cache_get, cache_key)
+    if text is not None:
+        return text
+
+    with stage("classify"):
+        pages = await run_in_process(classify_pdf_pages, str(pdf_path))
+    hard_pages = [page_num for page_num, (_, reason) in enumerate(pages) if reason]
+    mark("hard_pages", len(hard_pages))
+    if not hard_pages:
+        text = "".join(page_text for page_text, _ in pages)
+    else:
+        whole = len(hard_pages) == len(pages)
+        with stage("llamaparse_submit"):
+            handle = await submit_parse_job(pdf_path, token, pages=None if whole else hard_pages)
+        job = _parse_jobs[handle]
+        with stage("llamaparse_wait"):
+            info = await wait_parse_job(handle)
+        if info["status"] != "SUCCESS":
+            raise RuntimeError(info.get("error", info["status"]))
+        if whole:
+            text = info["markdown"]
+        else:
+            page_markdown = job["page_markdown"]
+            if len(page_markdown) != len(hard_pages):
+                raise RuntimeError(
+                    f"LlamaParse returned {len(page_markdown)} pages for {len(hard_pages)} uploaded"
+                )
+            remote = dict(zip(hard_pages, page_markdown))
+            text = "\n\n".join(
+                remote[page_num] if page_num in remote else page_text.strip()
+                for page_num, (page_text, _) in enumerate(pages)
+            )
+
+    await run_in_thread(text_cache_put, cache_key, text)
+    return text
+
+
+async def read_paper_with_llamaindex(pdf_path: str) -> str:
     try:
-        if not venue or not venue.strip():
-            return "Error: Venue name cannot be empty"
+        if not pdf_path:
+            return "Error: PDF path cannot be empty"
 
-        ccf_rank_map = await load_ccf_ranking()
-        return ccf_rank_map.get(venue.lower(), "N/A")
+        LLAMAINDEX_API_KEY = os.getenv("LLAMAINDEX_API_KEY", None)
+        if LLAMAINDEX_API_KEY:
+            if LLAMAPARSE_HYBRID:
+                return await read_paper_hybrid(pdf_path, LLAMAINDEX_API_KEY)
+            with stage("llamaparse_submit"):
+                handle = await submit_parse_job(pdf_path, LLAMAINDEX_API_KEY)
+            with stage("llamaparse_wait"):
+                info = await wait_parse_job(handle)
+            if info["status"] == "SUCCESS":
+                return info["markdown"]
+            return f"Error: Failed to read paper - {info.get('error', info['status'])}"
+
+        else:
+            return "Error: LLAMAINDEX_API_KEY is not set"
     except Exception as e:
-        return f"Error: Failed to get CCF rank - {str(e)}"
+        return f"Error: Failed to read paper - {str(e)}"
 
 
 @mcp.tool(
-    name="search_on_arxiv",
+    name="submit_parse",
     description="""
-    
-    **Query Format**: Use simple keywords only - no boolean operators (AND/OR) supported.
-    Examples: "machine learning", "neural networks", "quantum computing"
-    
-    Search preprint papers on arXiv, the world's largest open-access repository.
-    
-    This tool searches arXiv's collection of preprint papers across multiple scientific disciplines. Perfect for discovering cutting-edge research before peer review and tracking emerging trends.
-    
-    Key features:
-    - Access to latest research developments before formal publication
-    - Multi-disciplinary coverage (physics, math, CS, biology, economics)
-    - Simple keyword search (no boolean operators like AND/OR)
-    - Open access with immediate PDF availability
-    
+    Start LlamaParse jobs for one or more PDFs and return immediately with a job handle
+    per file, so several papers can be parsed in the background while you do other work.
+    Collect each result later with `get_parse_result`. Requires LLAMAINDEX_API_KEY.
+
     Parameters:
-    - query: Single search term or phrase
-    - num_results: Max papers to return (default: 100)
-    - need_datetime_sort: Sort by submission date, newest first (default: False)
+    - pdf_paths: PDF paths or file names in the data directory
 
-    
-    Returns: List of preprints with titles, authors, arXiv categories, and optional PDF links.
+    Returns: List of {"file", "job_id", "status"} (or {"file", "error"}) per path.
     """,
 )
-async def search_on_arxiv(
-    query: str,
-    num_results: int = 100,
-    need_datetime_sort: bool = False,
-) -> list:
-    try:
-        if not query or not query.strip():
-            return [{"error": "Query cannot be empty"}]
+@traced_tool
+@client_limited
+async def submit_parse(pdf_paths: list[str]) -> list:
+    LLAMAINDEX_API_KEY = os.getenv("LLAMAINDEX_API_KEY", None)
+    if not LLAMAINDEX_API_KEY:
+        return [{"error": "LLAMAINDEX_API_KEY is not set"}]
 
-        if num_results <= 0:
-            return [{"error": "Number of results must be positive"}]
-
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"https://papers.cool/arxiv/search?query={query}&show=1000"
-            )
-            response.raise_for_status()
-
-        papers = await extract_papers_from_html(response.text, venue=False)
+    if not pdf_paths:
+        return [{"error": "pdf_paths cannot be empty"}]
 
-        if need_datetime_sort:
-            papers = sorted(
-                papers, key=lambda x: x.get("publication_time", 0), reverse=True
-            )
+    async def submit(pdf_path: str) -> dict:
+        try:
+            path = Path(pdf_path)
+            if not path.exists():
+                path = DATA_DIR / pdf_path
+                if not path.exists():
+                    return {"file": pdf_path, "error": "PDF file not found"}
+            handle = await submit_parse_job(path, LLAMAINDEX_API_KEY)
+            return {"file": pdf_path, "job_id": handle, "status": _parse_jobs[handle]["status"]}
+        except httpx.HTTPStatusError as e:
+            return {"file": pdf_path, "error": f"HTTP error {e.response.status_code}"}
+        except Exception as e:
+            return {"file": pdf_path, "error": f"Upload failed: {str(e)}"}
 
-        return papers[:num_results]
-    except httpx.RequestError as e:
-        return [{"error": f"Network request failed: {str(e)}"}]
-    except httpx.HTTPStatusError as e:
-        return [
-            {"error": f"HTTP error {e.response.status_code}: {e.response.text[:100]}"}
-        ]
-    except Exception as e:
-        return [{"error": f"Search failed: {str(e)}"}]
+    return list(await asyncio.gather(*(submit(pdf_path) for pdf_path in pdf_paths)))
 
 
 @mcp.tool(
-    name="search_on_venue",
+    name="get_parse_result",
     description="""
-    
-    **Query Format**: Use simple keywords only - no boolean operators (AND/OR) supported.
-    Examples: "machine learning", "neural networks", "quantum computing"
-    
-    Search academic papers within specific conferences and journals (venues).
-    
-    This tool targets peer-reviewed publications from established academic venues like conferences (NeurIPS, ICML) and journals (Nature, IEEE). Ideal for finding high-quality papers within specific academic communities.
-    
-    Key features:
-    - Venue-specific search within curated conference/journal databases
-    - Simple keyword search (no boolean operators like AND/OR)
-    - Quality-focused results from peer-reviewed sources
-    - Customizable output with PDF links and publication metadata
-    
+    Get the status or result of a LlamaParse job started with `submit_parse`.
+
     Parameters:
-    - query: Single search term or phrase
-    - num_results: Max papers to return (default: 100)
-    - need_datetime_sort: Sort by publication date, newest first (default: True)
+    - job_id: Handle returned by `submit_parse`
+    - wait_seconds: Wait up to this many seconds for the job to finish (default: 0, return immediately)
 
-    
-    Returns: List of papers with titles, authors, venue details, and optional PDF links.
+    Returns: {"job_id", "status", "seconds"} plus `markdown` when status is SUCCESS or `error` on failure.
+    Status is one of PENDING, SUCCESS, ERROR, TIMEOUT or UNKNOWN.
     """,
 )
-async def search_on_venue(
-    query: str, num_results: int = 100, need_datetime_sort: bool = True
-) -> list:
+@traced_tool
+async def get_parse_result(job_id: str, wait_seconds: float = 0) -> dict:
     try:
-        if not query or not query.strip():
-            return [{"error": "Query cannot be empty"}]
+        return await wait_parse_job(job_id, max(wait_seconds, 0))
+    except Exception as e:
+        return {"job_id": job_id, "status": "ERROR", "error": str(e)}
 
-        if num_results <= 0:
-            return [{"error": "Number of results must be positive"}]
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"https://papers.cool/venue/search?query={query}&show=1000"
-            )
-            response.raise_for_status()
+# 页数少于该值的 PDF 直接在单个工作进程中提取
+PDF_SHARD_MIN_PAGES = int(os.getenv("SCHOLAI_PDF_SHARD_MIN_PAGES", "64"))
+PDF_SHARD_WORKERS = int(os.getenv("SCHOLAI_PDF_WORKERS", str(max(PROCESS_POOL_WORKERS, 1))))
+
+
+def pdf_page_count(pdf_path: str) -> int:
+    with fitz.open(pdf_path) as pdf_document:
+        return len(pdf_document)
+
+
+def extract_pdf_pages(pdf_path: str, start: int = 0, stop: int | None = None) -> str:
+    """Extract the plain text of pages [start, stop) with PyMuPDF (runs in a worker process)."""
+    with fitz.open(pdf_path) as pdf_document:
+        stop = len(pdf_document) if stop is None else stop
+        return "".join(pdf_document[page_num].get_text() for page_num in range(start, stop))
+
+
+def extract_pdf_text(pdf_path: str) -> str:
+    return extract_pdf_pages(pdf_path)
+
+
+async def read_pdf_text(pdf_path: str) -> str:
+    """
+    Extract the text of a whole PDF, splitting long documents into page ranges
+    that worker processes extract in parallel. The result is identical to the
+    serial extract_pdf_text().
+    """
+    page_count = await run_in_thread(pdf_page_count, pdf_path)
+    shards = min(PDF_SHARD_WORKERS, page_count // max(PDF_SHARD_MIN_PAGES, 1))
+    if shards <= 1 or PROCESS_POOL_WORKERS <= 0:
+        return await run_in_process(extract_pdf_pages, pdf_path, 0, page_count)
+
+    bounds = [page_count * i // shards for i in range(shards + 1)]
+    parts = await asyncio.gather(
+        *(
+            run_in_process(extract_pdf_pages, pdf_path, start, stop)
+            for start, stop in zip(bounds, bounds[1:])
+        )
+    )
+    return "".join(parts)
+
+
+# 保持打开的 PDF 句柄数量，供分页读取和 cursor 续读复用
+PDF_HANDLE_CACHE_SIZE = int(os.getenv("SCHOLAI_PDF_HANDLES", "8"))
+
+SECTION_ALIASES = {
+    "abstract": "abstract",
+    "introduction": "introduction",
+    "related work": "related_work",
+    "background": "related_work",
+    "method": "method",
+    "methods": "method",
+    "methodology": "method",
+    "approach": "method",
+    "proposed method": "method",
+    "experiment": "experiments",
+    "experiments": "experiments",
+    "experimental results": "experiments",
+    "evaluation": "experiments",
+    "results": "experiments",
+    "discussion": "conclusion",
+    "conclusion": "conclusion",
+    "conclusions": "conclusion",
+    "references": "references",
+    "bibliography": "references",
+}
+SECTIONS = sorted(set(SECTION_ALIASES.values()))
+_NAMED_HEADING_RE = re.compile(
+    r"^(?:(?:\d+|[IVX]+)\.?\s+)?("
+    + "|".join(sorted(SECTION_ALIASES, key=len, reverse=True))
+    + r")\s*(?:$|(?<=abstract)\s*[.:—–-])",
+    re.IGNORECASE,
+)
+# 无法识别名称的一级编号标题（如 "3 Our Framework"），只作为章节边界
+_NUMBERED_HEADING_RE = re.compile(r"^(?:\d+|[IVX]+)\.?\s+[A-Z][^.]{2,60}$")
+
+_pdf_handles: OrderedDict[str, dict] = OrderedDict()
+_pdf_handles_lock = threading.Lock()
+
+
+def _close_pdf_handle(entry: dict) -> None:
+    with entry["lock"]:
+        entry["closed"] = True
+        entry["doc"].close()
+
+
+@contextmanager
+def pdf_handle(pdf_path: str | Path):
+    """
+    Yield a cached, lazily opened PyMuPDF document entry for pdf_path.
+
+    Entries are reused across calls until the file's mtime or size changes and
+    are evicted LRU beyond PDF_HANDLE_CACHE_SIZE. The entry lock is held while
+    the caller uses it because PyMuPDF documents are not thread-safe.
+    """
+    path = str(Path(pdf_path).resolve())
+    while True:
+        stat = os.stat(path)
+        fingerprint = (stat.st_mtime_ns, stat.st_size)
+        evicted = []
+        with _pdf_handles_lock:
+            entry = _pdf_handles.get(path)
+            if entry is not None and entry["fingerprint"] == fingerprint:
+                _pdf_handles.move_to_end(path)
+            else:
+                entry = None
+
+        if entry is None:
+            # 打开文档可能较慢，不持有全局锁，避免阻塞其他文件的读取
+            opened = {
+                "doc": fitz.open(path),
+                "fingerprint": fingerprint,
+                "lock": threading.Lock(),
+                "closed": False,
+                "blocks": {},
+                "sections": None,
+            }
+            with _pdf_handles_lock:
+                entry = _pdf_handles.get(path)
+                if entry is not None and entry["fingerprint"] == fingerprint:
+                    # 其他线程同时打开了同一文件，使用已缓存的句柄
+                    evicted.append(opened)
+                else:
+                    if entry is not None:
+                        evicted.append(_pdf_handles.pop(path))
+                    entry = _pdf_handles[path] = opened
+                _pdf_handles.move_to_end(path)
+                while len(_pdf_handles) > max(PDF_HANDLE_CACHE_SIZE, 1):
+                    evicted.append(_pdf_handles.popitem(last=False)[1])
+        for old_entry in evicted:
+            _close_pdf_handle(old_entry)
+
+        with entry["lock"]:
+            # 取到锁之前句柄可能已被淘汰，重新打开
+            if not entry["closed"]:
+                yield entry
+                return
+
+
+def _page_blocks(entry: dict, page_num: int) -> list[str]:
+    """
+    Text blocks of one page from get_text("blocks"), in PyMuPDF's block order.
+
+    Page and section slices are offsets into the concatenation of these blocks,
+    which can differ from page.get_text() in ordering and separators.
+    """
+    blocks = entry["blocks"].get(page_num)
+    if blocks is None:
+        blocks = entry["blocks"][page_num] = [
+            block[4] for block in entry["doc"][page_num].get_text("blocks") if block[6] == 0
+        ]
+    return blocks
+
+
+def detect_sections(entry: dict) -> list[tuple[str | None, int, int]]:
+    """
+    Find section headings in the text blocks of the document.
+
+    Returns (section, page, block) triples in reading order; section is None
+    for numbered top-level headings whose title is not a known section name.
+    """
+    if entry["sections"] is None:
+        headings = []
+        for page_num in range(len(entry["doc"])):
+            for block_num, block in enumerate(_page_blocks(entry, page_num)):
+                text = " ".join(block.split())
+                if not text or len(text) > 80 and not text.lower().startswith("abstract"):
+                    continue
+                if ". ." in text:
+                    # 目录中的点引导线
+                    continue
+                match = _NAMED_HEADING_RE.match(text)
+                if match:
+                    headings.append((SECTION_ALIASES[match.group(1).lower()], page_num, block_num))
+                elif _NUMBERED_HEADING_RE.match(text):
+                    headings.append((None, page_num, block_num))
+        entry["sections"] = headings
+    return entry["sections"]
+
+
+def _block_offset(entry: dict, page_num: int, block_num: int) -> int:
+    return sum(len(block) for block in _page_blocks(entry, page_num)[:block_num])
+
+
+def section_segments(entry: dict, section: str) -> list[tuple[int, int, int]]:
+    """(page, start, end) character ranges of one section, or [] if it was not found."""
+    headings = detect_sections(entry)
+    start = next((i for i, heading in enumerate(headings) if heading[0] == section), None)
+    if start is not None:
+        stop = start + 1
+    elif section == "method":
+        # 方法章节常以具体名称命名：取引言/相关工作之后、实验之前的未命名章节
+        after = max(
+            (i for i, heading in enumerate(headings) if heading[0] in ("introduction", "related_work")),
+            default=None,
+        )
+        start = next(
+            (i for i in range(0 if after is None else after + 1, len(headings)) if headings[i][0] is None),
+            None,
+        )
+        if start is None:
+            return []
+        stop = start + 1
+        while stop < len(headings) and headings[stop][0] is None:
+            stop += 1
+    else:
+        return []
+
+    _, first_page, first_block = headings[start]
+    if stop < len(headings):
+        _, end_page, end_block = headings[stop]
+    else:
+        end_page, end_block = len(entry["doc"]) - 1, len(_page_blocks(entry, len(entry["doc"]) - 1))
 
-        papers = await extract_papers_from_html(response.text, venue=True)
+    segments = []
+    for page_num in range(first_page, end_page + 1):
+        page_len = sum(len(block) for block in _page_blocks(entry, page_num))
+        begin = _block_offset(entry, page_num, first_block) if page_num == first_page else 0
+        end = _block_offset(entry, page_num, end_block) if page_num == end_page else page_len
+        if end > begin:
+            segments.append((page_num, begin, end))
+    return segments
 
-        if need_datetime_sort:
-            papers = sorted(
-                papers, key=lambda x: x.get("publication_time", 0), reverse=True
-            )
 
-        return papers[:num_results]
-    except httpx.RequestError as e:
-        return [{"error": f"Network request failed: {str(e)}"}]
-    except httpx.HTTPStatusError as e:
-        return [
-            {"error": f"HTTP error {e.response.status_code}: {e.response.text[:100]}"}
-        ]
-    except Exception as e:
-        return [{"error": f"Search failed: {str(e)}"}]
+def parse_page_ranges(pages: str, page_count: int) -> list[int]:
+    """Parse a 1-based page selection like "1-3,7" into 0-based page numbers."""
+    selected = []
+    for part in pages.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        first = int(first) if first.strip() else 1
+        last = (int(last) if last.strip() else page_count) if sep else first
+        if first < 1 or last < first or first > page_count:
+            raise ValueError(f"Invalid page range '{part}' for a {page_count}-page document")
+        selected.extend(range(first - 1, min(last, page_count)))
+    if not selected:
+        raise ValueError("No pages selected")
+    return list(dict.fromkeys(selected))
 
 
-def format_filename(title: str) -> str:
-    return re.sub(r'[<>:"/\\|?*]', "_", title.strip())[:100] + ".pdf"
+def encode_read_cursor(state: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state).encode("utf-8")).decode("ascii")
 
 
-@mcp.tool(
-    name="download_paper_pdf",
-    description="Download pdf file of paper from the pdf_url. And return the path of the downloaded paper.",
-)
-async def download_paper_pdf(title: str, pdf_url: str) -> str:
+def decode_read_cursor(cursor: str) -> dict:
     try:
-        if not title or not title.strip():
-            return "Error: Title cannot be empty"
-
-        if not pdf_url or not pdf_url.startswith(("http://", "https://")):
-            return "Error: Invalid PDF URL"
+        return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except ValueError as e:
+        raise ValueError("Invalid cursor") from e
 
-        # Ensure data directory exists
-        data_dir = Path("./data")
-        data_dir.mkdir(exist_ok=True)
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.get(pdf_url)
-            response.raise_for_status()
+def read_pdf_slice(
+    pdf_path: str | Path,
+    pages: str = None,
+    section: str = None,
+    max_chars: int = None,
+    cursor: str = None,
+) -> dict:
+    """
+    Extract only the requested pages or section of a PDF, at most max_chars at
+    a time. The returned next_cursor resumes where this slice stopped.
+    """
+    if cursor:
+        state = decode_read_cursor(cursor)
+        pages, section, max_chars = state["pages"], state["section"], state["max_chars"]
+        segment_num, offset = state["segment"], state["offset"]
+    else:
+        segment_num, offset = 0, 0
 
-        save_path = format_filename(title)
-        file_path = data_dir / save_path
+    with pdf_handle(pdf_path) as entry:
+        page_count = len(entry["doc"])
+        if section:
+            segments = section_segments(entry, section)
+            if not segments:
+                raise ValueError(f"Section '{section}' not found")
+        else:
+            page_nums = parse_page_ranges(pages, page_count) if pages else range(page_count)
+            segments = [(page_num, 0, None) for page_num in page_nums]
 
-        with open(file_path, "wb") as f:
-            f.write(response.content)
+        budget = max_chars or float("inf")
+        parts = []
+        returned_pages = []
+        while segment_num < len(segments) and budget > 0:
+            page_num, begin, end = segments[segment_num]
+            page_text = "".join(_page_blocks(entry, page_num))
+            end = len(page_text) if end is None else end
+            start = begin + offset
+            take = min(end - start, budget)
+            if start + take < end:
+                # 尽量在换行处截断
+                newline = page_text.rfind("\n", start, start + take)
+                if newline > start + take // 2:
+                    take = newline + 1 - start
+            parts.append(page_text[start : start + take])
+            returned_pages.append(page_num + 1)
+            budget -= take
+            if start + take < end:
+                offset += take
+            else:
+                segment_num, offset = segment_num + 1, 0
 
-        return save_path
+    next_cursor = None
+    if segment_num < len(segments):
+        next_cursor = encode_read_cursor(
+            {
+                "pages": pages,
+                "section": section,
+                "max_chars": max_chars,
+                "segment": segment_num,
+                "offset": offset,
+            }
+        )
+    result = {
+        "Paper Content": "".join(parts),
+        "pages": [returned_pages[0], returned_pages[-1]] if returned_pages else [],
+        "total_pages": page_count,
+        "next_cursor": next_cursor,
+    }
+    if section:
+        result["section"] = section
+    return result
 
-    except httpx.RequestError as e:
-        return f"Error: Network request failed - {str(e)}"
-    except httpx.HTTPStatusError as e:
-        return f"Error: HTTP error {e.response.status_code}"
-    except OSError as e:
-        return f"Error: File operation failed - {str(e)}"
-    except Exception as e:
-        return f"Error: Download failed - {str(e)}"
 
+async def _read_paper(
+    path: Path, pages: str, max_chars: int, cursor: str, section: str
+) -> str | dict:
+    if pages or max_chars or cursor or section:
+        # 分段读取始终走 PyMuPDF，只抽取请求的部分
+        with stage("slice"):
+            return await run_in_thread(read_pdf_slice, path, pages, section, max_chars, cursor)
 
-@mcp.tool(
-    name="sequential_extract_academic_query",
-    description="""
-    Note: All processes and results must be in English!
-    A tool for progressively analyzing and extracting users' academic search intent  
+    LLAMAINDEX_API_KEY = os.getenv("LLAMAINDEX_API_KEY", None)
+    if LLAMAINDEX_API_KEY:
+        return await read_paper_with_llamaindex(path)
 
-    This tool helps transform vague user expressions into precise academic search queries. Through a multi-step analytical process, it deeply understands users' genuine research needs.  
+    with stage("hash"):
+        pdf_hash = await run_in_thread(pdf_content_hash, path)
+    cache_key = text_cache_key(pdf_hash, "fitz", version=fitz.VersionBind)
+    with stage("text_cache"):
+        full_text = await run_in_thread(text_cache_get, cache_key)
+    mark("text_cache_hits" if full_text is not None else "text_cache_misses")
+    if full_text is None:
+        with stage("extract"):
+            full_text = await read_pdf_text(str(path))
+        await run_in_thread(text_cache_put, cache_key, full_text)
 
-    Use cases:  
-    - When users express ambiguous or overly broad research interests  
-    - Converting natural language into academic keywords  
-    - Determining optimal search strategies and database selection  
-    - Optimizing queries for the most relevant results  
-    - Handling interdisciplinary or emerging field search needs  
+    return (
+        {"Paper Content": full_text}
+        if full_text.strip()
+        else "Error: No text content found in PDF"
+    )
 
-    Analysis steps include:  
-    1. Intent understanding: Parsing core research interests  
-    2. Domain identification: Determining primary/secondary research fields  
-    3. Concept extraction: Identifying key technical terms and concepts  
-    4. Query construction: Combining keywords to form search queries  
-    5. Strategy optimization: Selecting appropriate search strategies and filters  
-    6. Validation refinement: Verifying query completeness and accuracy  
 
-    Parameter specifications:  
-    - analysis_step: Current step's detailed content and reasoning  
-    - step_number: Current step index  
-    - total_steps: Estimated total steps (adjustable)  
-    - next_step_needed: Whether further analysis is required  
-    - extracted_concepts: List of identified key concepts  
-    - databases: Search databases (options: arxiv, venue)  
-    - search_strategy: Recommended search approach  
-    - confidence_level: Analysis confidence score (0-1)  
-    - needs_clarification: Whether user clarification is needed  
-    - clarification_questions: List of follow-up questions for users  
-    - date_range: Timeframe (options: recent, all)  
-    - datetime_sort: Time-based sorting (options: True, False)  
+@mcp.tool(
+    name="read_paper",
+    description="""
+    You can read the paper by this tool.
 
-    Output format:  
-    Returns JSON containing:  
-    - Generated search queries  
-    - Recommended databases/tools  
-    - Search parameter configurations  
-    - Analysis confidence level  
-    - Potential query variations
+    Without options the whole text is returned. To keep responses small, read
+    only part of the paper:
+    - pages: 1-based page selection, e.g. "1-3,7"
+    - section: one of abstract, introduction, related_work, method, experiments, conclusion, references
+    - max_chars: Return at most this many characters; pass the returned `next_cursor`
+      back as `cursor` (with the same pdf_path) to continue reading
     """,
 )
-def sequential_extract_academic_query(
-    analysis_step: str,
-    step_number: int,
-    total_steps: int,
-    next_step_needed: bool,
-    extracted_concepts: list[str] = None,
-    databases: str = None,
-    search_strategy: str = None,
-    confidence_level: float = None,
-    needs_clarification: bool = False,
-    clarification_questions: list[str] = None,
-    date_range: str = None,
-    datetime_sort: bool = False,
+@traced_tool
+@client_limited
+async def read_paper(
+    pdf_path: str,
+    pages: str = None,
+    max_chars: int = None,
+    cursor: str = None,
+    section: str = None,
 ) -> str:
     try:
-        if not analysis_step or step_number <= 0 or total_steps <= 0:
-            return json.dumps({"error": "Invalid parameters provided"})
-
-        result = {
-            "step_number": step_number,
-            "total_steps": total_steps,
-            "next_step_needed": next_step_needed,
-            "analysis_step": analysis_step,
-            "confidence_level": confidence_level or 0.5,
-        }
+        if not pdf_path:
+            return "Error: PDF path cannot be empty"
 
-        if not next_step_needed:
-            concepts = extracted_concepts or []
-            result.update(
-                {
-                    "query_config": {
-                        "keywords": concepts[:3],
-                        "databases": databases,
-                        "filters": {
-                            "date_range": date_range,
-                            "sort": "datetime" if datetime_sort else "relevance",
-                        },
-                    },
-                    "alternatives": (
-                        [{"keywords": concepts[3:6]}] if len(concepts) > 3 else []
-                    ),
-                    "analysis_complete": True,
-                }
-            )
-        else:
-            result.update(
-                {
-                    "extracted_concepts": extracted_concepts or [],
-                    "databases": databases,
-                    "search_strategy": search_strategy,
-                    "needs_clarification": needs_clarification,
-                    "clarification_questions": clarification_questions or [],
-                }
-            )
+        if max_chars is not None and max_chars <= 0:
+            return "Error: max_chars must be positive"
 
-        return json.dumps(result, indent=2)
-    except Exception as e:
-        return json.dumps({"error": f"Query extraction failed: {str(e)}"})
+        if section and section not in SECTIONS:
+            return f"Error: section must be one of {', '.join(SECTIONS)}"
 
+        # Try original path first, then data directory
+        path = Path(pdf_path)
+        if not path.exists():
+            path = DATA_DIR / pdf_path
+            if not path.exists():
+                return "Error: PDF file not found"
 
-@mcp.tool(
-    name="list_downloaded_papers",
-    description="When you need to read a paper, first List all paths of downloaded papers. ",
-)
-async def list_downloaded_papers() -> list[str]:
-    try:
-        data_dir = Path("./data")
-        if not data_dir.exists():
-            return ["Error: Data directory does not exist"]
+        key = (str(path.resolve()), pages, max_chars, cursor, section)
+        return await single_flight(
+            "read", key, functools.partial(_read_paper, path, pages, max_chars, cursor, section)
+        )
 
-        pdf_files = [file.name for file in data_dir.iterdir() if file.suffix == ".pdf"]
-        return pdf_files if pdf_files else ["No PDF files found"]
-    except PermissionError:
-        return ["Error: Permission denied accessing data directory"]
+    except ValueError as e:
+        return f"Error: {str(e)}"
     except Exception as e:
-        return [f"Error: Failed to list files - {str(e)}"]
+        return f"Error: Failed to extract text - {str(e)}"
 
 
-async def upload_file_to_llamaparse(
-    file_path: str | Path,
-    token: str,
-    compact_markdown_table: bool = True,
-    extract_charts: bool = True,
-    structured_output: bool = True,
-) -> httpx.Response:
-    """
-    Uploads a file to the LlamaParse API, converting a cURL command to an httpx function.
+PASSAGE_INDEX_PATH = CACHE_DIR / "passages.sqlite3"
+# 每个段落的目标长度（字符），按行拼接，不跨页
+PASSAGE_CHARS = int(os.getenv("SCHOLAI_PASSAGE_CHARS", "1200"))
 
-    Args:
-        file_path: The local path to the file to be uploaded.
-        token: The API bearer token for authentication.
-        compact_markdown_table: Flag to enable compact markdown table parsing.
-        extract_charts: Flag to enable chart extraction.
-        structured_output: Flag to enable structured output.
+_passage_index_db = {"conn": None, "lock": threading.Lock()}
+# 每个事件循环一把刷新锁，避免并发请求重复抽取同一文件
+_passage_refresh_locks: dict[asyncio.AbstractEventLoop, asyncio.Lock] = {}
 
-    Returns:
-        The response object from the httpx request.
-    """
-    url = "https://api.cloud.llamaindex.ai/api/v1/parsing/upload"
-    headers = {"Accept": "application/json", "Authorization": f"Bearer {token}"}
-    data = {
-        "compact_markdown_table": str(compact_markdown_table).lower(),
-        "extract_charts": str(extract_charts).lower(),
-        "structured_output": str(structured_output).lower(),
-    }
 
-    async with httpx.AsyncClient(timeout=600.0) as client:
-        with open(file_path, "rb") as f:
-            files = {"file": f}
-            response = await client.post(url, headers=headers, data=data, files=files)
-            # Raise an exception for bad status codes (4xx or 5xx)
-            response.raise_for_status()
-            return response.json()
+def _passage_index_connection() -> sqlite3.Connection:
+    if _passage_index_db["conn"] is None:
+        PASSAGE_INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(PASSAGE_INDEX_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                file_name TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                pdf_hash TEXT NOT NULL,
+                pages INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS passages (
+                id INTEGER PRIMARY KEY,
+                file_name TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                text TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS passages_file ON passages (file_name);
+            CREATE VIRTUAL TABLE IF NOT EXISTS passages_fts USING fts5(
+                text, content='passages', content_rowid='id', tokenize='porter unicode61'
+            );
+            CREATE TRIGGER IF NOT EXISTS passages_ai AFTER INSERT ON passages BEGIN
+                INSERT INTO passages_fts (rowid, text) VALUES (new.id, new.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS passages_ad AFTER DELETE ON passages BEGIN
+                INSERT INTO passages_fts (passages_fts, rowid, text)
+                VALUES ('delete', old.id, old.text);
+            END;
+            """
+        )
+        _passage_index_db["conn"] = conn
+    return _passage_index_db["conn"]
 
 
-async def get_job_status(job_id: str, token: str) -> httpx.Response:
-    """Gets the parsing job status."""
-    url = f"https://api.cloud.llamaindex.ai/api/v1/parsing/job/{job_id}"
-    headers = {"Accept": "application/json", "Authorization": f"Bearer {token}"}
+def extract_pdf_page_texts(pdf_path: str) -> list[str]:
+    """Extract the plain text of every page separately (runs in a worker process)."""
+    with fitz.open(pdf_path) as pdf_document:
+        return [page.get_text() for page in pdf_document]
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.get(url, headers=headers)
-        response.raise_for_status()
-        return response
 
+def split_passages(page_text: str, max_chars: int = PASSAGE_CHARS) -> list[str]:
+    """Pack the lines of one page into passages of about max_chars, collapsing whitespace."""
+    passages = []
+    current = []
+    length = 0
+    for line in page_text.splitlines():
+        line = " ".join(line.split())
+        if not line:
+            continue
+        if current and length + len(line) > max_chars:
+            passages.append(" ".join(current))
+            current, length = [], 0
+        current.append(line)
+        length += len(line) + 1
+    if current:
+        passages.append(" ".join(current))
+    return passages
 
-async def get_job_result_markdown(job_id: str, token: str) -> httpx.Response:
-    """Gets the parsing job result in markdown format."""
-    url = f"https://api.cloud.llamaindex.ai/api/v1/parsing/job/{job_id}/result/markdown"
-    headers = {"Accept": "application/json", "Authorization": f"Bearer {token}"}
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
+def _passage_documents() -> dict[str, tuple[int, int, str]]:
+    with _passage_index_db["lock"]:
+        rows = _passage_index_connection().execute(
+            "SELECT file_name, mtime_ns, size, pdf_hash FROM documents"
+        ).fetchall()
+    return {file_name: (mtime_ns, size, pdf_hash) for file_name, mtime_ns, size, pdf_hash in rows}
 
 
-async def read_paper_with_llamaindex(pdf_path: str) -> str:
-    try:
-        if not pdf_path:
-            return "Error: PDF path cannot be empty"
+def _scan_data_dir() -> dict[str, tuple[int, int]]:
+    if not DATA_DIR.exists():
+        return {}
+    files = {}
+    for file in DATA_DIR.iterdir():
+        if file.suffix == ".pdf":
+            stat = file.stat()
+            files[file.name] = (stat.st_mtime_ns, stat.st_size)
+    return files
 
-        LLAMAINDEX_API_KEY = os.getenv("LLAMAINDEX_API_KEY", None)
-        if LLAMAINDEX_API_KEY:
-            upload_response = await upload_file_to_llamaparse(
-                pdf_path, LLAMAINDEX_API_KEY
-            )
-            job_id = upload_response.get("id")
-
-            # Step 2: Poll for job completion
-            terminal_states = {"SUCCESS", "ERROR"}
-
-            # Get initial job status
-            job_response = await get_job_status(job_id, LLAMAINDEX_API_KEY)
-            job_json = job_response.json()
-            status = job_json.get("status")
-
-            # Poll until job reaches a terminal state
-            while status not in terminal_states:
-                await asyncio.sleep(5)  # Wait before polling again
-                job_response = await get_job_status(job_id, LLAMAINDEX_API_KEY)
-                job_json = job_response.json()
-                status = job_json.get("status")
-
-            if status == "SUCCESS":
-                result_response = await get_job_result_markdown(
-                    job_id, LLAMAINDEX_API_KEY
+
+def _store_passages(
+    file_name: str, mtime_ns: int, size: int, pdf_hash: str, pages: list[str] | None
+) -> None:
+    """Replace the passages of one file; pages=None only refreshes its stat fingerprint."""
+    with _passage_index_db["lock"]:
+        conn = _passage_index_connection()
+        with conn:
+            if pages is not None:
+                conn.execute("DELETE FROM passages WHERE file_name = ?", (file_name,))
+                conn.executemany(
+                    "INSERT INTO passages (file_name, page, text) VALUES (?, ?, ?)",
+                    (
+                        (file_name, page_num, passage)
+                        for page_num, page_text in enumerate(pages, start=1)
+                        for passage in split_passages(page_text)
+                    ),
                 )
+                conn.execute(
+                    "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?)",
+                    (file_name, mtime_ns, size, pdf_hash, len(pages)),
+                )
+            else:
+                conn.execute(
+                    "UPDATE documents SET mtime_ns = ?, size = ? WHERE file_name = ?",
+                    (mtime_ns, size, file_name),
+                )
+
+
+def _remove_passages(file_names: list[str]) -> None:
+    with _passage_index_db["lock"]:
+        conn = _passage_index_connection()
+        with conn:
+            for file_name in file_names:
+                conn.execute("DELETE FROM passages WHERE file_name = ?", (file_name,))
+                conn.execute("DELETE FROM documents WHERE file_name = ?", (file_name,))
+
+
+async def refresh_passage_index() -> dict:
+    """
+    Bring the passage index in line with ./data. Files whose mtime and size are
+    unchanged are skipped without being read; touched files are re-hashed and
+    only re-extracted when their content actually changed.
+    """
+    loop = asyncio.get_running_loop()
+    lock = _passage_refresh_locks.setdefault(loop, asyncio.Lock())
+    async with lock:
+        files = await run_in_thread(_scan_data_dir)
+        known = await run_in_thread(_passage_documents)
+        stats = {"indexed": 0, "unchanged": 0, "removed": 0, "failed": 0}
+
+        removed = [file_name for file_name in known if file_name not in files]
+        if removed:
+            await run_in_thread(_remove_passages, removed)
+            stats["removed"] = len(removed)
 
-                return result_response.get("markdown", "")
+        async def index_file(file_name: str, mtime_ns: int, size: int) -> None:
+            path = DATA_DIR / file_name
+            try:
+                pdf_hash = await run_in_thread(pdf_content_hash, path)
+                if file_name in known and known[file_name][2] == pdf_hash:
+                    await run_in_thread(_store_passages, file_name, mtime_ns, size, pdf_hash, None)
+                    stats["unchanged"] += 1
+                    return
+                pages = await run_in_process(extract_pdf_page_texts, str(path))
+                await run_in_thread(_store_passages, file_name, mtime_ns, size, pdf_hash, pages)
+                stats["indexed"] += 1
+            except Exception:
+                # 损坏或正在写入的 PDF 下次刷新时再试
+                stats["failed"] += 1
+
+        pending = []
+        for file_name, (mtime_ns, size) in files.items():
+            if known.get(file_name, (None, None))[:2] == (mtime_ns, size):
+                stats["unchanged"] += 1
             else:
-                return "Error: Failed to read paper"
+                pending.append(index_file(file_name, mtime_ns, size))
+        await asyncio.gather(*pending)
+        return stats
 
-        else:
-            return "Error: LLAMAINDEX_API_KEY is not set"
-    except Exception as e:
-        return f"Error: Failed to read paper - {str(e)}"
 
+def search_passage_index(query: str, top_k: int = 5, file_name: str = None) -> list:
+    tokens = _FTS_TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return []
 
-@mcp.tool(name="read_paper", description="You can read the paper by this tool.")
-async def read_paper(pdf_path: str) -> str:
-    try:
-        if not pdf_path:
-            return "Error: PDF path cannot be empty"
+    sql = """SELECT p.file_name, p.page, p.text, bm25(passages_fts) AS score
+             FROM passages_fts JOIN passages p ON p.id = passages_fts.rowid
+             WHERE passages_fts MATCH ?"""
+    params = [" OR ".join(f'"{token}"' for token in tokens)]
+    if file_name:
+        sql += " AND p.file_name = ?"
+        params.append(file_name)
+    sql += " ORDER BY score LIMIT ?"
+    params.append(top_k)
 
-        # Try original path first, then data directory
-        path = Path(pdf_path)
-        if not path.exists():
-            path = Path("./data") / pdf_path
-            if not path.exists():
-                return "Error: PDF file not found"
+    with _passage_index_db["lock"]:
+        rows = _passage_index_connection().execute(sql, params).fetchall()
+    return [
+        {"file": file, "page": page, "score": round(-score, 3), "text": text}
+        for file, page, text, score in rows
+    ]
 
-        LLAMAINDEX_API_KEY = os.getenv("LLAMAINDEX_API_KEY", None)
-        if LLAMAINDEX_API_KEY:
-            return await read_paper_with_llamaindex(path)
 
-        pdf_document = fitz.open(path)
-        full_text = ""
+@mcp.tool(
+    name="search_papers_content",
+    description="""
+    Search inside the full text of every downloaded paper and return only the
+    best-matching passages, instead of reading whole PDFs with `read_paper`.
+    Downloaded PDFs are indexed page by page on first use; later calls only
+    re-index files that were added or changed.
+
+    Parameters:
+    - query: Keywords to look for (e.g. "ablation learning rate warmup")
+    - top_k: Number of passages to return (default: 5)
+    - file_name: Restrict the search to one downloaded PDF (as listed by `list_downloaded_papers`)
 
-        for page_num in range(len(pdf_document)):
-            page = pdf_document[page_num]
-            full_text += page.get_text()
+    Returns: Passages with `file`, 1-based `page`, relevance `score` and `text`.
+    """,
+)
+@traced_tool
+@client_limited
+async def search_papers_content(query: str, top_k: int = 5, file_name: str = None) -> list:
+    try:
+        if not query or not query.strip():
+            return [{"error": "Query cannot be empty"}]
 
-        pdf_document.close()
+        if top_k <= 0:
+            return [{"error": "top_k must be positive"}]
 
-        return (
-            {"Paper Content": full_text}
-            if full_text.strip()
-            else "Error: No text content found in PDF"
-        )
+        if not DATA_DIR.exists():
+            return [{"error": "Data directory does not exist"}]
 
+        await refresh_passage_index()
+        passages = await run_in_thread(search_passage_index, query, top_k, file_name)
+        return passages
+    except sqlite3.Error as e:
+        return [{"error": f"Passage index error: {str(e)}"}]
     except Exception as e:
-        return f"Error: Failed to extract text - {str(e)}"
+        return [{"error": f"Content search failed: {str(e)}"}]
 
 
 @mcp.tool(
     name="plan_for_paper_search",
     description="This is a tool designed to plan for paper search based on the user query",
 )
+@traced_tool
 def plan_for_paper_search(user_query: str, need_intent_extraction: bool) -> str:
 
     if need_intent_extraction:
@@ -666,6 +4647,102 @@ def analyze_user_query(user_query: str) -> str:
     return prompt
 
 
+TRANSPORTS = ("stdio", "sse", "streamable-http")
+TRANSPORT = os.getenv("SCHOLAI_TRANSPORT", "stdio")
+HTTP_HOST = os.getenv("SCHOLAI_HOST", "127.0.0.1")
+HTTP_PORT = int(os.getenv("SCHOLAI_PORT", "8000"))
+# 监听同一端口的工作进程数；多于一个时 streamable-http 以无状态模式运行
+HTTP_WORKERS = int(os.getenv("SCHOLAI_WORKERS", "1"))
+# 收到 SIGTERM/SIGINT 后等待进行中请求完成的最长秒数
+HTTP_GRACEFUL_TIMEOUT = float(os.getenv("SCHOLAI_GRACEFUL_TIMEOUT", "30"))
+
+
+def create_app(transport: str = None):
+    """
+    Build the ASGI app serving the MCP server over "streamable-http" or "sse".
+
+    Pooled HTTP clients, worker pools and the warm-up live as long as the app
+    instead of one MCP session. uvicorn calls this factory (with no argument,
+    reading SCHOLAI_TRANSPORT) in every worker process.
+    """
+    if transport is None:
+        transport = TRANSPORT if TRANSPORT != "stdio" else "streamable-http"
+    if transport not in TRANSPORTS[1:]:
+        raise ValueError(f"Unsupported HTTP transport: {transport}")
+    _http_app["transport"] = transport
+
+    if transport == "sse":
+        app = mcp.sse_app()
+    else:
+        # 会话保存在单个进程的内存中，多进程时请求可能落到任意进程
+        if HTTP_WORKERS > 1:
+            mcp.settings.stateless_http = True
+        app = mcp.streamable_http_app()
+
+    session_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app):
+        async with shared_resources(), session_lifespan(app):
+            yield
+
+    app.router.lifespan_context = lifespan
+    return app
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="ScholAI MCP server")
+    parser.add_argument("--transport", choices=TRANSPORTS, default=TRANSPORT)
+    parser.add_argument("--host", default=HTTP_HOST)
+    parser.add_argument("--port", type=int, default=HTTP_PORT)
+    parser.add_argument("--workers", type=int, default=HTTP_WORKERS)
+    args = parser.parse_args(argv)
+
+    if args.transport == "stdio":
+        # stdout 是 stdio 传输的协议通道
+        print("Starting MCP server...", file=sys.stderr)
+        mcp.run(transport="stdio")
+        return
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.transport == "sse" and args.workers > 1:
+        parser.error("the sse transport keeps sessions in one process; use streamable-http for several workers")
+
+    import uvicorn
+
+    print(
+        f"Starting MCP server on http://{args.host}:{args.port} "
+        f"({args.transport}, {args.workers} worker{'s' if args.workers > 1 else ''})...",
+        file=sys.stderr,
+    )
+    options = {
+        "host": args.host,
+        "port": args.port,
+        "timeout_graceful_shutdown": HTTP_GRACEFUL_TIMEOUT,
+    }
+    if args.workers == 1:
+        uvicorn.run(create_app(args.transport), **options)
+        return
+    from uvicorn.supervisors import Multiprocess
+
+    # 工作进程重新导入本模块，通过环境变量传递命令行参数
+    os.environ.update(SCHOLAI_TRANSPORT=args.transport, SCHOLAI_WORKERS=str(args.workers))
+    config = uvicorn.Config(
+        "main:create_app",
+        factory=True,
+        workers=args.workers,
+        **options,
+    )
+    # uvicorn 自己创建的共享监听 socket 的 proto 为 0，asyncio 因此不会给连接设置
+    # TCP_NODELAY，每个响应都会多等约 40ms 的延迟确认，这里显式指定 IPPROTO_TCP
+    family = socket.AF_INET6 if ":" in args.host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.set_inheritable(True)
+    Multiprocess(config, target=uvicorn.Server(config).run, sockets=[sock]).run()
+
+
 if __name__ == "__main__":
-    print("Starting MCP server...")
-    mcp.run(transport="stdio")
+    main()
@@ -0,0 +1,62 @@
+"""An interrupted download resumes with Range/If-Range and never splices two versions of a file."""
+
+import asyncio
+import json
+
+import pytest
+
+import benchmark
+import main
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(main, "DOWNLOAD_MANIFEST", tmp_path / ".manifest.json")
+    monkeypatch.setattr(main, "DOWNLOAD_BACKOFF", 0)
+    # 小分块：断开前收到的一半内容已写入部分文件，重试时才需要续传
+    monkeypatch.setattr(main, "DOWNLOAD_CHUNK_SIZE", 1024)
+    with benchmark.StubServer(num_papers=1, pdf_pages=4) as server:
+        yield server
+
+
+def download(title: str, pdf_url: str) -> tuple[str, dict]:
+    async def run():
+        result = {}
+        try:
+            return await main.download_pdf_with_retry(title, pdf_url, result), result
+        finally:
+            await main.close_http_clients()
+
+    return asyncio.run(run())
+
+
+def test_interrupted_download_resumes_with_range(stub, tmp_path):
+    pdf_url = f"{stub.url}/pdf/flaky"
+
+    file_name, result = download("Resumed Paper", pdf_url)
+
+    assert result["attempts"] == 2
+    # 第二次请求从已写入的位置续传（不超过断开前发送的一半），并用首次响应的 ETag 做 If-Range 校验
+    [(_, range_header, if_range)] = stub.range_requests
+    offset = int(range_header.removeprefix("bytes=").removesuffix("-"))
+    assert 0 < offset <= len(stub.pdf) // 2
+    assert if_range.startswith('"')
+    assert (tmp_path / file_name).read_bytes() == stub.pdf
+    assert not list(tmp_path.glob(".*.part")) and not list(tmp_path.glob(".*.validator"))
+
+    entry = json.loads((tmp_path / ".manifest.json").read_text(encoding="utf-8"))[pdf_url]
+    assert entry == {
+        "file": "Resumed Paper.pdf",
+        "size": len(stub.pdf),
+        "sha256": main.pdf_content_hash(tmp_path / file_name),
+    }
+
+
+def test_server_ignoring_if_range_restarts_download(stub, tmp_path):
+    file_name, result = download("Restarted Paper", f"{stub.url}/pdf/ignore-range")
+
+    assert result["attempts"] == 2
+    assert len(stub.range_requests) == 1
+    # 服务器忽略 Range 返回 200 时整文件重写，不追加到已下载的一半后面
+    assert (tmp_path / file_name).read_bytes() == stub.pdf
@@ -0,0 +1,99 @@
+"""
+All HTML parser backends must extract identical papers from papers.cool pages.
+
+The fixtures are trimmed papers.cool search pages (an arXiv query and a venue
+listing) with the edge cases the backends handle differently: comments,
+character references, CDATA, unclosed <p> elements and void tags.
+Backends that are not installed are skipped.
+"""
+
+from pathlib import Path
+
+import pytest
+
+import main
+
+FIXTURES = Path(__file__).parent / "fixtures"
+PAGES = {
+    "arxiv": (FIXTURES / "papers_cool_arxiv.html", False),
+    "venue": (FIXTURES / "papers_cool_venue.html", True),
+}
+BACKENDS = ["bs4", "stream", "lxml", "selectolax"]
+
+
+def parse(page: str, backend: str) -> list:
+    path, venue = PAGES[page]
+    if backend not in main.HTML_PARSER_BACKENDS:
+        pytest.skip(f"{backend} is not installed")
+    return [paper.to_dict() for paper in main.parse_papers_html(path.read_text("utf-8"), venue, backend)]
+
+
+@pytest.mark.parametrize("page", PAGES)
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_backend_matches_bs4(page, backend):
+    assert parse(page, backend) == parse(page, "bs4")
+
+
+@pytest.mark.parametrize("page", PAGES)
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_stream_parser_chunked(page, chunk_size):
+    path, venue = PAGES[page]
+    html_content = path.read_text("utf-8")
+    parser = main.PaperStreamParser(venue)
+    for start in range(0, len(html_content), chunk_size):
+        parser.feed(html_content[start : start + chunk_size])
+    parser.close()
+    assert [paper.to_dict() for paper in parser.papers] == parse(page, "bs4")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_arxiv_page(backend):
+    papers = parse("arxiv", backend)
+    # 注释中的 div.panel.paper 不计入结果
+    assert len(papers) == 3
+    first, unclosed, bare = papers
+
+    assert first["title"] == "Classifier-Free Guidance & ItsDiscontents: Diffusion Models Don't Need It"
+    assert first["pdf_url"] == "https://arxiv.org/pdf/2406.11831"
+    assert first["first_author"] == "Renée Müller"
+    assert "TODO" not in first["abstract"]
+    assert "w > 1" in first["abstract"]
+    assert first["publication_time"] == "2024-06-17 17:59:58 UTC"
+
+    # 未闭合的 <p> 由下一个 <p> 隐式结束，摘要不包含发布时间
+    assert unclosed["first_author"] == "Ana Lima"
+    assert unclosed["abstract"] == "Discrete diffusion closes the gap with autoregressive models on perplexity <= 5%."
+    assert unclosed["publication_time"] == "2024-06-17 17:59:51 UTC"
+
+    assert bare == {"title": "A Paper Without PDF Link Or Authors", "abstract": "Abstract “quoted” text."}
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_venue_page(backend):
+    papers = parse("venue", backend)
+    assert len(papers) == 3
+    oral, poster, arxiv = papers
+
+    assert oral["title"] == "Scaling Laws forMoE– Revisited"
+    # 包装的 /pdf?url= 链接中 &amp; 之后的参数被丢弃
+    assert oral["pdf_url"] == "https://openreview.net/pdf?id=f3KoPr6Dfr"
+    assert oral["first_author"] == "José Álvarez"
+    assert oral["abstract"] == "Mixture-of-experts models obey a different <scaling> law.Wefit it."
+    assert oral["subjects"] == ["ICML.2024", "Oral"]
+    assert oral["publication_time"] == 2024
+
+    # 没有作者链接时从文本中取第一作者；未闭合的段落互不包含
+    assert poster["first_author"] == "Müller"
+    assert poster["abstract"] == "Randomized smoothing at 1/10 the cost…"
+    assert poster["subjects"] == ["ICML.2024", "Poster"]
+
+    assert "first_author" not in arxiv
+    assert arxiv["pdf_url"] == "https://arxiv.org/pdf/2402.01234"
+    assert arxiv["abstract"] == "Agents & tools.Second line."
+
+
+def test_auto_prefers_stream_over_bs4(monkeypatch):
+    # 未安装 selectolax 和 lxml 时，auto 使用纯标准库的流式解析器而不是较慢的 bs4
+    backends = {name: main.HTML_PARSER_BACKENDS[name] for name in ("bs4", "stream")}
+    monkeypatch.setattr(main, "HTML_PARSER_BACKENDS", backends)
+    assert main.html_parser_backend("auto") == "stream"
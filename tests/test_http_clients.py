@@ -0,0 +1,63 @@
+"""A pooled client replaced because it belongs to another event loop releases its connections."""
+
+import asyncio
+import threading
+
+import benchmark
+import main
+
+
+def open_client_on(loop_runner, url: str):
+    async def connect():
+        client = main.get_http_client(url)
+        await client.get(url)
+        [connection] = client._transport._pool.connections
+        return client, connection._connection._network_stream.get_extra_info("socket")
+
+    return loop_runner(connect())
+
+
+def test_client_of_finished_loop_has_its_sockets_closed():
+    with benchmark.StubServer(num_papers=1) as stub:
+        url = f"{stub.url}/pdf/x"
+        old_client, sock = open_client_on(asyncio.run, url)
+        assert sock.fileno() != -1
+
+        async def replace():
+            try:
+                return main.get_http_client(url)
+            finally:
+                await main.close_http_clients()
+
+        assert asyncio.run(replace()) is not old_client
+        assert sock.fileno() == -1
+
+
+def test_client_of_running_loop_is_closed_on_that_loop():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        with benchmark.StubServer(num_papers=1) as stub:
+            url = f"{stub.url}/pdf/x"
+            old_client, _ = open_client_on(
+                lambda coro: asyncio.run_coroutine_threadsafe(coro, loop).result(), url
+            )
+
+            async def replace():
+                try:
+                    main.get_http_client(url)
+                    # aclose() 在原事件循环的线程中执行
+                    for _ in range(100):
+                        if old_client.is_closed:
+                            break
+                        await asyncio.sleep(0.01)
+                finally:
+                    await main.close_http_clients()
+
+            asyncio.run(replace())
+            assert old_client.is_closed
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
@@ -0,0 +1,64 @@
+"""Hybrid read_paper only sends pages with real tables, figures or broken text to LlamaParse."""
+
+import fitz
+
+import main
+
+BODY = (
+    "We evaluate the proposed method on three public benchmarks and compare it with strong "
+    "baselines under the same training budget. All numbers are averaged over five seeds, and "
+    "the standard deviation is reported where it exceeds half a point. "
+) * 4
+
+
+def classify(tmp_path, build_page) -> str | None:
+    pdf_path = tmp_path / "paper.pdf"
+    with fitz.open() as doc:
+        page = doc.new_page()
+        build_page(page)
+        doc.save(pdf_path)
+    [(_, reason)] = main.classify_pdf_pages(str(pdf_path))
+    return reason
+
+
+def test_table_mentioned_in_prose_is_plain_text(tmp_path):
+    def build(page):
+        page.insert_textbox(fitz.Rect(50, 50, 550, 300), BODY, fontsize=9)
+        # 正文中以表格引用开头的行，编号后没有标题标点
+        page.insert_textbox(
+            fitz.Rect(50, 320, 550, 420),
+            "Table 1 shows that our method improves accuracy on every dataset, and\n"
+            "Table 2 lists the hyper-parameters used in all experiments.",
+            fontsize=9,
+        )
+
+    assert classify(tmp_path, build) is None
+
+
+def test_table_caption_marks_table_page(tmp_path):
+    def build(page):
+        page.insert_textbox(fitz.Rect(50, 50, 550, 300), BODY, fontsize=9)
+        page.insert_textbox(fitz.Rect(50, 320, 550, 360), "Table 2: Results on the benchmark datasets.", fontsize=9)
+
+    assert classify(tmp_path, build) == "table"
+
+
+def test_small_figure_is_plain_text(tmp_path):
+    def build(page):
+        page.insert_textbox(fitz.Rect(50, 50, 550, 300), BODY, fontsize=9)
+        pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 64, 64), False)
+        pixmap.clear_with(128)
+        # 约占页面 20% 的插图
+        page.insert_image(fitz.Rect(100, 350, 420, 670), pixmap=pixmap)
+
+    assert classify(tmp_path, build) is None
+
+
+def test_full_page_image_marks_image_page(tmp_path):
+    def build(page):
+        page.insert_textbox(fitz.Rect(50, 20, 550, 90), BODY[:300], fontsize=9)
+        pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 64, 64), False)
+        pixmap.clear_with(128)
+        page.insert_image(fitz.Rect(30, 100, 565, 820), pixmap=pixmap)
+
+    assert classify(tmp_path, build) == "image"
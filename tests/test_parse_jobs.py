@@ -0,0 +1,135 @@
+"""LlamaParse job manager: submit, poll with backoff and fetch results, and adopt handles from other workers."""
+
+import asyncio
+
+import httpx
+import pytest
+
+import benchmark
+import main
+
+JOB_ID = "0b4c3a52-7f1e-4d8a-9c2b-5e6f7a8b9c0d"
+
+
+def test_malformed_handle_is_unknown_without_network(monkeypatch):
+    async def get_job_status(job_id, token):
+        raise AssertionError("no request expected")
+
+    monkeypatch.setenv("LLAMAINDEX_API_KEY", "token")
+    monkeypatch.setattr(main, "get_job_status", get_job_status)
+
+    info = asyncio.run(main.get_parse_result("../../etc/passwd"))
+
+    assert info["status"] == "UNKNOWN"
+    assert "../../etc/passwd" not in main._parse_jobs
+
+
+def test_failed_adoption_is_not_cached(monkeypatch):
+    calls = []
+
+    async def get_job_status(job_id, token):
+        calls.append(job_id)
+        request = httpx.Request("GET", f"https://llamaparse.test/{job_id}")
+        raise httpx.HTTPStatusError("not found", request=request, response=httpx.Response(404, request=request))
+
+    monkeypatch.setenv("LLAMAINDEX_API_KEY", "token")
+    monkeypatch.setattr(main, "get_job_status", get_job_status)
+
+    first = asyncio.run(main.get_parse_result(JOB_ID))
+    second = asyncio.run(main.get_parse_result(JOB_ID))
+
+    assert first["status"] == second["status"] == "UNKNOWN"
+    assert JOB_ID not in main._parse_jobs
+    assert calls == [JOB_ID, JOB_ID]
+
+
+def test_adopted_job_that_failed_upstream_reports_its_error(monkeypatch):
+    job_id = "1c5d4b63-8a2f-4e9b-8d3c-6f7a8b9c0d1e"
+
+    async def get_job_status(job_id, token):
+        request = httpx.Request("GET", f"https://llamaparse.test/{job_id}")
+        return httpx.Response(
+            200, json={"id": job_id, "status": "ERROR", "error_message": "PDF is encrypted"}, request=request
+        )
+
+    monkeypatch.setenv("LLAMAINDEX_API_KEY", "token")
+    monkeypatch.setattr(main, "get_job_status", get_job_status)
+
+    info = asyncio.run(main.get_parse_result(job_id))
+
+    assert info["status"] == "ERROR"
+    assert info["error"] == "LlamaParse job error - PDF is encrypted"
+    assert job_id in main._parse_jobs
+
+
+@pytest.fixture
+def llamaparse(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLAMAINDEX_API_KEY", "token")
+    monkeypatch.setattr(main, "TEXT_CACHE_DIR", tmp_path / "text")
+    monkeypatch.setattr(main, "LLAMAPARSE_POLL_INITIAL", 0.05)
+    with benchmark.StubServer(num_papers=1, parse_seconds=(0.3, 0.3)) as stub:
+        yield stub
+
+
+def write_pdf(tmp_path, seed: int) -> str:
+    path = tmp_path / f"paper-{seed}.pdf"
+    path.write_bytes(benchmark.make_pdf(2, seed=seed))
+    return str(path)
+
+
+def run(coro):
+    async def with_cleanup():
+        try:
+            return await coro
+        finally:
+            await main.close_http_clients()
+
+    return asyncio.run(with_cleanup())
+
+
+def test_submit_poll_and_fetch_result(llamaparse, tmp_path):
+    pdf_path = write_pdf(tmp_path, seed=101)
+
+    async def submit_and_wait():
+        [submitted] = await main.submit_parse([pdf_path])
+        return submitted, await main.get_parse_result(submitted["job_id"], wait_seconds=10)
+
+    submitted, result = run(submit_and_wait())
+    job_id = submitted["job_id"]
+
+    assert submitted["status"] == "PENDING"
+    assert result["status"] == "SUCCESS"
+    assert result["markdown"] == f"# Job {job_id}"
+    # 轮询间隔按退避增长：0.3 秒的任务用不到按初始间隔轮询的次数
+    polls = llamaparse.hits[f"/api/v1/parsing/job/{job_id}"]
+    assert 2 <= polls < 0.3 / main.LLAMAPARSE_POLL_INITIAL
+    assert main._parse_jobs[job_id]["interval"] > main.LLAMAPARSE_POLL_INITIAL
+
+
+def test_duplicate_submissions_share_one_upload(llamaparse, tmp_path):
+    pdf_path = write_pdf(tmp_path, seed=102)
+
+    async def submit_twice():
+        concurrent = await asyncio.gather(main.submit_parse([pdf_path, pdf_path]), main.submit_parse([pdf_path]))
+        again = await main.submit_parse([pdf_path])
+        return [entry["job_id"] for batch in (*concurrent, again) for entry in batch]
+
+    handles = run(submit_twice())
+
+    assert len(set(handles)) == 1
+    assert len(llamaparse.uploads) == 1
+
+
+def test_upstream_error_reaches_get_parse_result(llamaparse, tmp_path):
+    llamaparse.parse_error = "Unsupported file"
+    pdf_path = write_pdf(tmp_path, seed=103)
+
+    async def submit_and_wait():
+        [submitted] = await main.submit_parse([pdf_path])
+        return await main.get_parse_result(submitted["job_id"], wait_seconds=10)
+
+    result = run(submit_and_wait())
+
+    assert result["status"] == "ERROR"
+    assert result["error"] == "LlamaParse job error - Unsupported file"
+    assert "markdown" not in result
@@ -0,0 +1,25 @@
+"""search_papers_content finds passages in downloaded PDFs that contain any query term."""
+
+import asyncio
+
+import fitz
+
+import main
+
+
+def test_search_papers_content_matches_any_term(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    with fitz.open() as doc:
+        doc.new_page().insert_text((72, 72), "Differential privacy for federated learning.", fontsize=11)
+        doc.save(data_dir / "privacy.pdf")
+    monkeypatch.setattr(main, "DATA_DIR", data_dir)
+    monkeypatch.setattr(main, "PASSAGE_INDEX_PATH", tmp_path / "passages.sqlite3")
+    monkeypatch.setitem(main._passage_index_db, "conn", None)
+
+    try:
+        passages = asyncio.run(main.search_papers_content("privacy quantum"))
+    finally:
+        main._passage_index_db["conn"].close()
+
+    assert [(p["file"], p["page"]) for p in passages] == [("privacy.pdf", 1)]
@@ -0,0 +1,89 @@
+"""Concurrent identical calls share one upstream request, and each caller gets its own copy of the result."""
+
+import asyncio
+
+import pytest
+
+import benchmark
+import main
+
+
+def test_coalesced_callers_get_separate_copies():
+    async def run():
+        async def fetch():
+            await asyncio.sleep(0.01)
+            return [{"title": "A"}, {"title": "B"}]
+
+        first, second = await asyncio.gather(
+            main.single_flight("test", "same", fetch),
+            main.single_flight("test", "same", fetch),
+        )
+        first.reverse()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert [p["title"] for p in first] == ["B", "A"]
+    assert [p["title"] for p in second] == ["A", "B"]
+
+
+def test_single_caller_gets_result_itself():
+    shared = ["cached"]
+
+    async def fetch():
+        return shared
+
+    assert asyncio.run(main.single_flight("test", "alone", fetch)) is shared
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(main, "TEXT_CACHE_DIR", tmp_path / "cache" / "text")
+    monkeypatch.setattr(main, "PAPER_INDEX_PATH", tmp_path / "cache" / "papers.sqlite3")
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path / "data")
+    monkeypatch.setattr(main, "DOWNLOAD_MANIFEST", tmp_path / "data" / ".manifest.json")
+    monkeypatch.setitem(main._search_cache_db, "conn", None)
+    monkeypatch.setitem(main._paper_index_db, "conn", None)
+    main._search_cache_memory.clear()
+    with benchmark.StubServer(num_papers=50, pdf_pages=2) as server:
+        yield server
+    for db in (main._search_cache_db, main._paper_index_db):
+        if db["conn"] is not None:
+            db["conn"].close()
+    main._search_cache_memory.clear()
+
+
+def test_concurrent_identical_calls_reach_upstream_once(stub, monkeypatch):
+    calls = 8
+    extractions = []
+    read_pdf_text = main.read_pdf_text
+
+    async def counting_read_pdf_text(pdf_path):
+        extractions.append(pdf_path)
+        return await read_pdf_text(pdf_path)
+
+    monkeypatch.setattr(main, "read_pdf_text", counting_read_pdf_text)
+    pdf_url = f"{stub.url}/pdf/shared?delay=0.2"
+
+    async def run():
+        try:
+            # 查询只在空白上不同，规范化后是同一个键
+            searches = await asyncio.gather(
+                *(main.search_on_venue(f"  Graph   Learning{' ' * i}", 20) for i in range(calls))
+            )
+            files = await asyncio.gather(*(main.download_paper_pdf("Shared paper", pdf_url) for _ in range(calls)))
+            texts = await asyncio.gather(*(main.read_paper(files[0]) for _ in range(calls)))
+            await asyncio.gather(*main._paper_index_tasks)
+            return searches, files, texts
+        finally:
+            await main.close_http_clients()
+            main.shutdown_executors()
+
+    searches, files, texts = asyncio.run(run())
+
+    assert stub.hits["/venue/search"] == 1
+    assert stub.hits["/pdf/shared"] == 1
+    assert len(extractions) == 1
+    assert all(result == searches[0] for result in searches)
+    assert set(files) == {"Shared paper.pdf"}
+    assert all(text == texts[0] for text in texts)
@@ -0,0 +1,98 @@
+"""Tool traces are finished after FastMCP serializes the result and are not changed by shared background work."""
+
+import asyncio
+from pathlib import Path
+
+import benchmark
+import main
+
+
+def counter(tool: str, name: str) -> float:
+    return main._metrics["counters"].get((tool, name), 0)
+
+
+def test_call_tool_records_serialized_response_size():
+    before = counter("get_ccf_rank", "response_bytes")
+    content = asyncio.run(main.mcp.call_tool("get_ccf_rank", {"venue": " "}))
+    [item] = content
+    assert item.text == "Error: Venue name cannot be empty"
+    assert counter("get_ccf_rank", "response_bytes") - before == len(item.text)
+    assert main._metrics["histograms"][("get_ccf_rank", "serialize")]["count"] >= 1
+
+
+def test_direct_call_skips_response_size():
+    before = counter("get_ccf_rank", "response_bytes")
+    assert asyncio.run(main.get_ccf_rank(" ")) == "Error: Venue name cannot be empty"
+    assert counter("get_ccf_rank", "response_bytes") == before
+
+
+def test_shared_task_does_not_change_finished_trace():
+    async def run():
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            main.mark("late_mark")
+            return "done"
+
+        trace = {"tool": "test_tool", "stages": {}, "marks": {}}
+        token = main._current_trace.set(trace)
+        try:
+            caller = asyncio.ensure_future(main.single_flight("test_trace", "key", work))
+            await asyncio.sleep(0)
+            caller.cancel()
+            await asyncio.gather(caller, return_exceptions=True)
+        finally:
+            main._current_trace.reset(token)
+        release.set()
+        await asyncio.sleep(0.01)
+        return trace
+
+    assert asyncio.run(run())["marks"] == {}
+
+
+def test_owner_trace_includes_shared_task_marks():
+    async def run():
+        async def work():
+            main.mark("shared_mark", 3)
+            return "done"
+
+        trace = {"tool": "test_tool", "stages": {}, "marks": {}}
+        token = main._current_trace.set(trace)
+        try:
+            await main.single_flight("test_trace", "owner", work)
+        finally:
+            main._current_trace.reset(token)
+        return trace
+
+    assert asyncio.run(run())["marks"] == {"shared_mark": 3}
+
+
+def test_content_bytes_handles_both_call_tool_shapes():
+    blocks = [main.TextContent(type="text", text="héllo")]
+    assert main._content_bytes(blocks) == 6
+    # 新版 mcp 的 call_tool 返回 (content, structured)
+    assert main._content_bytes((blocks, {"result": "héllo"})) == 6
+    assert main._content_bytes({"result": "héllo"}) is None
+
+
+def test_streamed_search_counts_raw_bytes():
+    page = (Path(__file__).parent / "fixtures" / "papers_cool_venue.html").read_bytes()
+    page = page.replace(b"</body>", "<!-- 多字节字符 -->\n</body>".encode("utf-8"))
+
+    async def run():
+        trace = {"tool": "test_tool", "stages": {}, "marks": {}}
+        token = main._current_trace.set(trace)
+        try:
+            papers, complete = await main._stream_search_page("venue", "graph", 1000)
+        finally:
+            main._current_trace.reset(token)
+            await main.close_http_clients()
+        return trace, papers, complete
+
+    with benchmark.StubServer(num_papers=1, pages={"venue": page}):
+        trace, papers, complete = asyncio.run(run())
+
+    assert complete and len(papers) == 3
+    # 页面含多字节字符：按字节而不是解码后的字符数计数
+    assert trace["marks"]["upstream_bytes"] == len(page) > len(page.decode("utf-8"))